@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Helpers shared by the benchmarks: source paths, a lab of simulated hdc
+devices and the JSON result file.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _path in ["src", os.path.join("src", "xdevice"),
+              os.path.join("plugins", "ohos", "src")]:
+    _path = os.path.join(ROOT_PATH, _path)
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+# the monitor creates the devices it reports with this plugin
+import ohos.environment.device  # noqa: E402,F401
+from ohos.environment.dmlib import DeviceConnector  # noqa: E402
+from ohos.environment.dmlib import HdcConnectionPool  # noqa: E402
+from ohos.environment.dmlib import HdcMonitor  # noqa: E402
+from ohos.environment.hdc_simulator import HdcSimulator  # noqa: E402
+
+HOST = "127.0.0.1"
+
+
+class _Log:
+
+    def debug(self, *args, **kwargs):
+        pass
+
+    info = warning = error = debug
+
+
+class BenchDevice:
+    """
+    The attributes of a device that dmlib uses
+    """
+
+    def __init__(self, device_sn, host, port):
+        self.device_sn = device_sn
+        self.host = host
+        self.port = port
+        self.log = _Log()
+
+
+class DeviceEvents:
+    """
+    Device listener which records when the monitor reports each device
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.events = []
+
+    def device_connected(self, device):
+        self._add("connected", device)
+
+    def device_disconnected(self, device):
+        self._add("disconnected", device)
+
+    def device_changed(self, device):
+        self._add("changed", device)
+
+    def _add(self, event, device):
+        with self.condition:
+            self.events.append((event, device.device_sn, time.perf_counter()))
+            self.condition.notify_all()
+
+    def wait_for(self, event, device_sn, timeout):
+        """
+        Returns the time the event came, None when it does not in timeout
+        """
+        deadline = time.perf_counter() + timeout
+        with self.condition:
+            while True:
+                for item in self.events:
+                    if item[0] == event and item[1] == device_sn:
+                        return item[2]
+                remain = deadline - time.perf_counter()
+                if remain <= 0:
+                    return None
+                self.condition.wait(remain)
+
+
+class SimulatedLab:
+    """
+    Starts a hdc simulator and a hdc monitor connected to it, which is what
+    dmlib needs to talk to a device, no hdc server or device is used.
+    """
+
+    def __init__(self, latency=0, device_count=0, bandwidth=None):
+        self.simulator = HdcSimulator(latency=latency)
+        self.device_count = device_count
+        self.bandwidth = bandwidth
+        self.connector = None
+        self.monitor = None
+        self.events = DeviceEvents()
+
+    def __enter__(self):
+        self.simulator.start()
+        for index in range(self.device_count):
+            self.add_device(index)
+        self.connector = DeviceConnector(HOST, self.simulator.port)
+        self.connector.add_device_change_listener(self.events)
+        self.monitor = HdcMonitor.get_instance(
+            HOST, self.simulator.port, device_connector=self.connector)
+        # connect the monitor here, so that no hdc binary is looked for
+        self.monitor.main_hdc_connection = self.monitor.open_hdc_connection()
+        return self
+
+    def __exit__(self, *args):
+        self.monitor.stop()
+        HdcConnectionPool.clear_all()
+        self.simulator.stop()
+
+    def add_device(self, index):
+        device_sn = get_device_sn(index)
+        self.simulator.add_device(device_sn, bandwidth=self.bandwidth)
+        return self.get_device(index)
+
+    def get_device(self, index):
+        return BenchDevice(get_device_sn(index), HOST, self.simulator.port)
+
+    def start_monitor(self):
+        self.monitor.start()
+
+
+def get_device_sn(index):
+    return "bench{:04d}".format(index)
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(values, scale=1.0, digits=3):
+    """
+    Returns the count, min, median, p95 and max of the values, scaled
+    """
+    if not values:
+        return {"count": 0}
+    return {"count": len(values),
+            "min": round(min(values) * scale, digits),
+            "p50": round(percentile(values, 50) * scale, digits),
+            "p95": round(percentile(values, 95) * scale, digits),
+            "max": round(max(values) * scale, digits)}
+
+
+def get_arg_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("-o", "--output", default="",
+                        help="write the JSON results to this file, "
+                             "they are printed otherwise")
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller workloads, for a smoke run")
+    return parser
+
+
+def write_results(name, params, results, output=""):
+    """
+    Writes the results with what they depend on, so that two runs on the
+    same host can be compared key by key
+    """
+    content = {
+        "benchmark": name,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"platform": platform.platform(),
+                 "python": platform.python_version(),
+                 "cpu_count": os.cpu_count()},
+        "params": params,
+        "results": results
+    }
+    text = json.dumps(content, indent=2, sort_keys=True)
+    if not output:
+        print(text)
+        return
+    with open(output, "w", encoding="utf-8") as json_file:
+        json_file.write(text)
+        json_file.write("\n")
+    print("Results written to {}".format(output))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Measures the fan-out of DeviceBroadcast against the hdc simulator: the time
+to run a shell command and a push on 1 to 64 devices, one device after the
+other and broadcast, and the time a broadcast takes when one device hangs.
+
+    python3 benchmarks/device_broadcast.py -o device_broadcast.json
+"""
+
+import os
+import tempfile
+import time
+
+import common
+from ohos.environment.broadcast import DeviceBroadcast
+from ohos.environment.dmlib import CollectingOutputReceiver
+from ohos.environment.dmlib import HdcHelper
+from ohos.environment.dmlib import SyncService
+
+
+def run_shell(device, command="echo bench"):
+    receiver = CollectingOutputReceiver()
+    HdcHelper.execute_shell_command(device, command, receiver=receiver,
+                                    output_flag=False)
+    return receiver.output
+
+
+def push_file(device, local, sync_port):
+    service = SyncService(device, common.HOST, sync_port)
+    service.open_sync()
+    try:
+        service.do_push_file(local, "/data/local/tmp/broadcast.bin")
+    finally:
+        service.close()
+
+
+def measure(devices, func, rounds):
+    """
+    Returns the seconds per round to call func on the devices serially and
+    broadcast
+    """
+    serial, broadcast = [], []
+    for _ in range(rounds):
+        start_time = time.perf_counter()
+        for device in devices:
+            func(device)
+        serial.append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        DeviceBroadcast(devices).run(func).raise_on_failure()
+        broadcast.append(time.perf_counter() - start_time)
+    serial_time = sum(serial) / rounds
+    broadcast_time = sum(broadcast) / rounds
+    return {"serial_ms": round(serial_time * 1000, 1),
+            "broadcast_ms": round(broadcast_time * 1000, 1),
+            "speedup": round(serial_time / broadcast_time, 2)}
+
+
+def bench_fan_out(device_counts, rounds, latency, file_kb):
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        local = os.path.join(temp_dir, "broadcast.bin")
+        with open(local, "wb") as local_file:
+            local_file.write(os.urandom(file_kb * 1024))
+        for count in device_counts:
+            with common.SimulatedLab(latency=latency,
+                                     device_count=count) as lab:
+                devices = [lab.get_device(index) for index in range(count)]
+                sync_port = lab.simulator.sync_port
+                results.append({
+                    "devices": count,
+                    "shell": measure(devices, run_shell, rounds),
+                    "push": measure(devices, lambda device: push_file(
+                        device, local, sync_port), rounds)})
+    return results
+
+
+def bench_hung_device(device_count, timeout, latency):
+    """
+    One device takes timeout * 3 to answer, the broadcast returns after
+    timeout with the other results
+    """
+    with common.SimulatedLab(latency=latency,
+                             device_count=device_count) as lab:
+        devices = [lab.get_device(index) for index in range(device_count)]
+        hung_sn = devices[0].device_sn
+
+        def func(device):
+            if device.device_sn == hung_sn:
+                time.sleep(timeout * 3)
+            return run_shell(device)
+
+        start_time = time.perf_counter()
+        results = DeviceBroadcast(devices, timeout=timeout).run(func)
+        cost_time = time.perf_counter() - start_time
+        # the hung call finishing late must not change the results
+        time.sleep(timeout * 3)
+    return {"devices": device_count, "timeout_seconds": timeout,
+            "broadcast_seconds": round(cost_time, 3),
+            "succeeded": len(results.succeeded),
+            "timed_out": len([item for item in results.failed
+                              if isinstance(item.error, TimeoutError)])}
+
+
+def main():
+    parser = common.get_arg_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="simulated delay before every reply (s)")
+    args = parser.parse_args()
+    params = {
+        "latency": args.latency,
+        "devices": [1, 4, 16] if args.quick else [1, 4, 16, 64],
+        "rounds": 2 if args.quick else 5,
+        "file_kb": 256,
+        "hung_timeout_seconds": 0.5 if args.quick else 2
+    }
+    results = {
+        "fan_out": bench_fan_out(params["devices"], params["rounds"],
+                                 params["latency"], params["file_kb"]),
+        "hung_device": bench_hung_device(
+            8, params["hung_timeout_seconds"], params["latency"])
+    }
+    common.write_results("device_broadcast", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
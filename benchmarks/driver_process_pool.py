@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Measures how many CPU bound host drivers run per minute in driver threads
+and in the driver process pool, and what the pool adds to a driver which
+does nothing.
+
+    python3 benchmarks/driver_process_pool.py -o driver_process_pool.json
+"""
+
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import common
+from _core.executor.process_pool import DriverProcessPool
+from _core.executor.request import Request
+from _core.interface import IDriver
+from _core.plugin import Config
+
+
+class HostDriver(IDriver):
+    """
+    Host driver which spins the cpu for rounds iterations and keeps a
+    checksum, which has to come back from the worker
+    """
+
+    def __init__(self, rounds):
+        self.rounds = rounds
+        self.checksum = 0
+
+    def __check_environment__(self, device_options):
+        return True
+
+    def __check_config__(self, config):
+        pass
+
+    def __execute__(self, request):
+        checksum = 0
+        for value in range(self.rounds):
+            checksum = (checksum + value * value) % 1000003
+        self.checksum = checksum
+
+    def __result__(self):
+        return ""
+
+
+def get_request():
+    return Request(uuid.uuid1().hex, None, [], Config({"testargs": {}}))
+
+
+def run_in_thread(pool, driver):
+    driver.__execute__(get_request())
+    return driver.checksum
+
+
+def run_in_pool(pool, driver):
+    request = get_request()
+    payload = pool.dump_driver(driver, request)
+    if payload is None:
+        raise RuntimeError("driver can not run in a worker")
+    pool.execute(driver, payload, request.listeners, "bench")
+    return driver.checksum
+
+
+def run_drivers(pool, run, workers, count, rounds):
+    """
+    Runs count drivers, workers at once, and returns the seconds it took
+    """
+    drivers = [HostDriver(rounds) for _ in range(count)]
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(workers) as executor:
+        checksums = list(executor.map(lambda item: run(pool, item), drivers))
+    cost_time = time.perf_counter() - start_time
+    if len(set(checksums)) != 1 or not checksums[0]:
+        raise RuntimeError("driver state did not come back")
+    return cost_time
+
+
+def bench_throughput(worker_counts, count, rounds):
+    results = []
+    for workers in worker_counts:
+        item = {"workers": workers}
+        cost_time = run_drivers(None, run_in_thread, workers, count, rounds)
+        item["threads_modules_per_minute"] = round(count * 60 / cost_time, 1)
+        pool = DriverProcessPool(workers)
+        start_time = time.perf_counter()
+        pool.start()
+        item["pool_start_seconds"] = round(time.perf_counter() - start_time, 3)
+        try:
+            cost_time = run_drivers(pool, run_in_pool, workers, count, rounds)
+        finally:
+            pool.shutdown()
+        item["pool_modules_per_minute"] = round(count * 60 / cost_time, 1)
+        item["speedup"] = round(item["pool_modules_per_minute"] /
+                                item["threads_modules_per_minute"], 2)
+        results.append(item)
+    return results
+
+
+def bench_overhead(count):
+    """
+    Time to dump and run a driver which does nothing in one worker
+    """
+    pool = DriverProcessPool(1)
+    pool.start()
+    dump_times, run_times = [], []
+    try:
+        for _ in range(count):
+            driver, request = HostDriver(1), get_request()
+            start_time = time.perf_counter()
+            payload = pool.dump_driver(driver, request)
+            dump_times.append(time.perf_counter() - start_time)
+            start_time = time.perf_counter()
+            pool.execute(driver, payload, request.listeners, "bench")
+            run_times.append(time.perf_counter() - start_time)
+    finally:
+        pool.shutdown()
+    return {"dump_ms": common.summarize(dump_times, 1000),
+            "execute_ms": common.summarize(run_times, 1000)}
+
+
+def main():
+    parser = common.get_arg_parser(__doc__.strip().splitlines()[0])
+    args = parser.parse_args()
+    cpu_count = os.cpu_count() or 1
+    params = {
+        "worker_counts": sorted({1, min(2, cpu_count), min(4, cpu_count),
+                                 cpu_count}) if not args.quick else [1, 2],
+        "modules": 8 if args.quick else 32,
+        "driver_rounds": 200000 if args.quick else 2000000,
+        "overhead_drivers": 20 if args.quick else 200
+    }
+    results = {
+        "throughput": bench_throughput(params["worker_counts"],
+                                       params["modules"],
+                                       params["driver_rounds"]),
+        "overhead": bench_overhead(params["overhead_drivers"])
+    }
+    common.write_results("driver_process_pool", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Measures shell commands against the hdc simulator with and without the hdc
+connection pool: latency of back to back commands on one device, commands
+per second with one thread per device, pool hits and the refill threads
+started.
+
+    python3 benchmarks/hdc_connection_pool.py -o hdc_connection_pool.json
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import common
+from ohos.environment.dmlib import CollectingOutputReceiver
+from ohos.environment.dmlib import HdcConnectionPool
+from ohos.environment.dmlib import HdcHelper
+
+
+def run_shell(device, use_pool, pause):
+    receiver = CollectingOutputReceiver()
+    HdcHelper.execute_shell_command(device, "echo bench", receiver=receiver,
+                                    output_flag=False, use_pool=use_pool)
+    if pause:
+        # a test case does some work between two commands
+        time.sleep(pause)
+    return receiver.output
+
+
+def get_pool_stats(devices):
+    hits = misses = 0
+    for device in devices:
+        pool = HdcConnectionPool.POOL_MAP.get(
+            (device.host, device.port, device.device_sn))
+        if pool is not None:
+            hits += pool.hits
+            misses += pool.misses
+    return {"hits": hits, "misses": misses}
+
+
+def count_threads(func, *args):
+    """
+    Calls func and counts the pool refill threads started meanwhile
+    """
+    started = [0]
+    original_start = threading.Thread.start
+
+    def start(thread):
+        if thread.name == "HdcConnectionPool":
+            started[0] += 1
+        original_start(thread)
+
+    threading.Thread.start = start
+    try:
+        result = func(*args)
+    finally:
+        threading.Thread.start = original_start
+    return result, started[0]
+
+
+def bench_sequential(latency, commands, pause):
+    results = {}
+    for use_pool in [False, True]:
+        with common.SimulatedLab(latency=latency, device_count=1) as lab:
+            device = lab.get_device(0)
+            run_shell(device, use_pool, 0)
+            latencies = []
+
+            def run():
+                for _ in range(commands):
+                    start_time = time.perf_counter()
+                    run_shell(device, use_pool, 0)
+                    latencies.append(time.perf_counter() - start_time)
+                    time.sleep(pause)
+
+            _, threads = count_threads(run)
+            item = {"latency_ms": common.summarize(latencies, 1000),
+                    "refill_threads": threads}
+            if use_pool:
+                item.update(get_pool_stats([device]))
+            results["pool" if use_pool else "no_pool"] = item
+    return results
+
+
+def bench_devices(latency, device_counts, duration, pause):
+    results = []
+    for count in device_counts:
+        item = {"devices": count}
+        for use_pool in [False, True]:
+            with common.SimulatedLab(latency=latency,
+                                     device_count=count) as lab:
+                devices = [lab.get_device(index) for index in range(count)]
+                done = [0] * count
+                end_time = time.perf_counter() + duration
+
+                def worker(index):
+                    while time.perf_counter() < end_time:
+                        run_shell(devices[index], use_pool, pause)
+                        done[index] += 1
+
+                def run():
+                    with ThreadPoolExecutor(count) as executor:
+                        list(executor.map(worker, range(count)))
+
+                start_time = time.perf_counter()
+                _, threads = count_threads(run)
+                cost_time = time.perf_counter() - start_time
+                name = "pool" if use_pool else "no_pool"
+                item[name] = {"commands_per_second": round(
+                    sum(done) / cost_time, 1), "refill_threads": threads}
+                if use_pool:
+                    item[name].update(get_pool_stats(devices))
+        results.append(item)
+    return results
+
+
+def main():
+    parser = common.get_arg_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.001,
+                        help="simulated delay before every reply (s)")
+    args = parser.parse_args()
+    params = {
+        "latency": args.latency,
+        "sequential_commands": 50 if args.quick else 500,
+        "pause_seconds": 0.01,
+        "devices": [1, 4, 16] if args.quick else [1, 4, 16, 64],
+        "devices_seconds": 1 if args.quick else 5
+    }
+    results = {
+        "sequential": bench_sequential(params["latency"],
+                                       params["sequential_commands"],
+                                       params["pause_seconds"]),
+        "devices": bench_devices(params["latency"], params["devices"],
+                                 params["devices_seconds"],
+                                 params["pause_seconds"])
+    }
+    common.write_results("hdc_connection_pool", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
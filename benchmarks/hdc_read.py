@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Measures how dmlib reads hdc frames: frames per second and MB/s of
+HdcHelper.read and HdcHelper.read_view over a local socket pair, for small
+to large frames, and the time of a shell command with a large output on the
+hdc simulator.
+
+    python3 benchmarks/hdc_read.py -o hdc_read.json
+"""
+
+import socket
+import struct
+import threading
+import time
+
+import common
+from ohos.environment.dmlib import CollectingOutputReceiver
+from ohos.environment.dmlib import HdcHelper
+
+MB = 1024 * 1024
+
+
+def send_frames(sock, frame_size, count):
+    frame = struct.pack("!I", frame_size) + b"x" * frame_size
+    batch = frame * max(1, 64 * 1024 // len(frame))
+    frames_per_batch = len(batch) // len(frame)
+    sent = 0
+    try:
+        while sent + frames_per_batch <= count:
+            sock.sendall(batch)
+            sent += frames_per_batch
+        sock.sendall(frame * (count - sent))
+    finally:
+        sock.shutdown(socket.SHUT_WR)
+
+
+def read_frames(read, sock):
+    frames = 0
+    while True:
+        len_buf = read(sock, 4)
+        if not len_buf:
+            return frames
+        length = struct.unpack("!I", len_buf)[0]
+        if len(read(sock, length)) != length:
+            raise RuntimeError("short frame")
+        frames += 1
+
+
+def bench_frames(frame_sizes, total_mb):
+    results = []
+    for frame_size in frame_sizes:
+        count = max(1000, total_mb * MB // frame_size)
+        item = {"frame_bytes": frame_size, "frames": count}
+        for name, read in [("read", HdcHelper.read),
+                           ("read_view", HdcHelper.read_view)]:
+            reader, writer = socket.socketpair()
+            sender = threading.Thread(target=send_frames,
+                                      args=(writer, frame_size, count))
+            sender.start()
+            start_time = time.perf_counter()
+            frames = read_frames(read, reader)
+            cost_time = time.perf_counter() - start_time
+            sender.join()
+            reader.close()
+            writer.close()
+            if frames != count:
+                raise RuntimeError("{} of {} frames read".format(frames, count))
+            item[name] = {
+                "frames_per_second": round(count / cost_time),
+                "mb_per_second": round(count * frame_size / MB / cost_time, 1)}
+        results.append(item)
+    return results
+
+
+def bench_shell_output(output_mb, rounds):
+    with common.SimulatedLab(device_count=1) as lab:
+        device = lab.get_device(0)
+        virtual_device = lab.simulator.get_device(device.device_sn)
+        virtual_device.files["/data/local/tmp/big.txt"] = \
+            b"0123456789abcdef" * (output_mb * MB // 16)
+        times = []
+        for _ in range(rounds):
+            receiver = CollectingOutputReceiver()
+            start_time = time.perf_counter()
+            HdcHelper.execute_shell_command(
+                device, "cat /data/local/tmp/big.txt", receiver=receiver,
+                output_flag=False)
+            times.append(time.perf_counter() - start_time)
+            if len(receiver.output) != output_mb * MB:
+                raise RuntimeError("shell output size differs")
+    return {"output_mb": output_mb,
+            "mb_per_second": round(output_mb * rounds / sum(times), 1),
+            "seconds": common.summarize(times)}
+
+
+def main():
+    parser = common.get_arg_parser(__doc__.strip().splitlines()[0])
+    args = parser.parse_args()
+    params = {
+        "frame_bytes": [16, 4096, 64 * 1024],
+        "frames_mb": 16 if args.quick else 128,
+        "shell_output_mb": 4 if args.quick else 32,
+        "shell_rounds": 2 if args.quick else 5
+    }
+    results = {
+        "frames": bench_frames(params["frame_bytes"], params["frames_mb"]),
+        "shell_output": bench_shell_output(params["shell_output_mb"],
+                                           params["shell_rounds"])
+    }
+    common.write_results("hdc_read", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
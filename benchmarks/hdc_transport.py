@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Measures the hdc transport of dmlib against the hdc simulator: shell
+commands per second, push and pull throughput, how fast the monitor reports
+a device that connects or disconnects, and how shell commands scale with
+the number of devices.
+
+    python3 benchmarks/hdc_transport.py -o hdc_transport.json
+"""
+
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import common
+from ohos.environment.dmlib import CollectingOutputReceiver
+from ohos.environment.dmlib import HdcHelper
+from ohos.environment.dmlib import SyncService
+
+MB = 1024 * 1024
+
+
+def run_shell(device, command="echo bench"):
+    receiver = CollectingOutputReceiver()
+    HdcHelper.execute_shell_command(device, command, receiver=receiver,
+                                    output_flag=False)
+    return receiver.output
+
+
+def bench_shell(lab, duration):
+    device = lab.get_device(0)
+    latencies = []
+    end_time = time.perf_counter() + duration
+    while time.perf_counter() < end_time:
+        start_time = time.perf_counter()
+        run_shell(device)
+        latencies.append(time.perf_counter() - start_time)
+    return {"commands_per_second": round(len(latencies) / sum(latencies), 1),
+            "latency_ms": common.summarize(latencies, 1000)}
+
+
+def bench_file_transfer(lab, size_mb, rounds):
+    device = lab.get_device(0)
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        local = os.path.join(temp_dir, "push.bin")
+        with open(local, "wb") as local_file:
+            local_file.write(os.urandom(size_mb * MB))
+        pulled = os.path.join(temp_dir, "pull.bin")
+        service = SyncService(device, common.HOST, lab.simulator.sync_port)
+        service.open_sync()
+        try:
+            push_times, pull_times = [], []
+            for _ in range(rounds):
+                start_time = time.perf_counter()
+                service.do_push_file(local, "/data/local/tmp/bench.bin")
+                push_times.append(time.perf_counter() - start_time)
+                if os.path.exists(pulled):
+                    os.remove(pulled)
+                start_time = time.perf_counter()
+                service.do_pull_file("/data/local/tmp/bench.bin", pulled)
+                pull_times.append(time.perf_counter() - start_time)
+        finally:
+            service.close()
+        if os.path.getsize(pulled) != size_mb * MB:
+            raise RuntimeError("pulled file size differs")
+    for name, times in [("push", push_times), ("pull", pull_times)]:
+        results[name] = {
+            "mb_per_second": round(size_mb * len(times) / sum(times), 1),
+            "seconds": common.summarize(times)}
+    return results
+
+
+def bench_monitor(lab, rounds, idle):
+    """
+    The monitor idles for a while before each change, so that the time also
+    covers a poll interval that has backed off
+    """
+    lab.start_monitor()
+    connected, disconnected = [], []
+    for index in range(1, rounds + 1):
+        time.sleep(idle)
+        start_time = time.perf_counter()
+        lab.add_device(index)
+        event_time = lab.events.wait_for(
+            "connected", common.get_device_sn(index), 10)
+        if event_time is not None:
+            connected.append(event_time - start_time)
+        time.sleep(idle)
+        start_time = time.perf_counter()
+        lab.simulator.remove_device(common.get_device_sn(index))
+        event_time = lab.events.wait_for(
+            "disconnected", common.get_device_sn(index), 10)
+        if event_time is not None:
+            disconnected.append(event_time - start_time)
+    return {"idle_seconds": idle,
+            "connect_ms": common.summarize(connected, 1000, 1),
+            "disconnect_ms": common.summarize(disconnected, 1000, 1),
+            "missed": rounds * 2 - len(connected) - len(disconnected)}
+
+
+def bench_scaling(device_counts, duration, latency):
+    """
+    One thread per device runs shell commands for duration seconds
+    """
+    results = []
+    for count in device_counts:
+        with common.SimulatedLab(latency=latency,
+                                 device_count=count) as lab:
+            devices = [lab.get_device(index) for index in range(count)]
+            latencies = [[] for _ in devices]
+            errors = []
+            end_time = time.perf_counter() + duration
+
+            def worker(index):
+                while time.perf_counter() < end_time:
+                    start_time = time.perf_counter()
+                    try:
+                        run_shell(devices[index])
+                    except Exception as error:
+                        errors.append(str(error))
+                        continue
+                    latencies[index].append(time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            with ThreadPoolExecutor(count) as executor:
+                list(executor.map(worker, range(count)))
+            cost_time = time.perf_counter() - start_time
+            all_latencies = [value for values in latencies for value in values]
+            results.append({
+                "devices": count,
+                "commands_per_second": round(len(all_latencies) / cost_time,
+                                             1),
+                "latency_ms": common.summarize(all_latencies, 1000),
+                "errors": len(errors)})
+    return results
+
+
+def main():
+    parser = common.get_arg_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.001,
+                        help="simulated delay before every reply (s)")
+    args = parser.parse_args()
+    params = {
+        "latency": args.latency,
+        "shell_seconds": 1 if args.quick else 5,
+        "file_mb": 4 if args.quick else 32,
+        "file_rounds": 2 if args.quick else 5,
+        "monitor_rounds": 3 if args.quick else 10,
+        "monitor_idle_seconds": 1 if args.quick else 4,
+        "scaling_devices": [1, 4, 16] if args.quick else [1, 4, 16, 64],
+        "scaling_seconds": 1 if args.quick else 5
+    }
+    results = {}
+    with common.SimulatedLab(latency=params["latency"],
+                             device_count=1) as lab:
+        results["shell"] = bench_shell(lab, params["shell_seconds"])
+        results["file_transfer"] = bench_file_transfer(
+            lab, params["file_mb"], params["file_rounds"])
+        results["monitor"] = bench_monitor(
+            lab, params["monitor_rounds"], params["monitor_idle_seconds"])
+    results["scaling"] = bench_scaling(
+        params["scaling_devices"], params["scaling_seconds"],
+        params["latency"])
+    common.write_results("hdc_transport", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Measures the dispatch loop of the scheduler with drivers which do nothing:
+the time from a driver thread freeing its slot to the next driver starting,
+and how many modules are dispatched per second.
+
+    python3 benchmarks/scheduler_latency.py -o scheduler_latency.json
+"""
+
+import bisect
+import threading
+import time
+
+import common
+from _core.executor.concurrent import ExecuteMessage
+from _core.executor.scheduler import Scheduler
+
+
+class BenchTask:
+    """
+    The attributes of a task that the dispatch loop uses
+    """
+
+    def __init__(self, count):
+        self.test_drivers = [("driver{}".format(index), None)
+                             for index in range(count)]
+
+
+class BenchScheduler(Scheduler):
+    """
+    Scheduler whose driver limit is set by the benchmark
+    """
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+
+    def max_driver_threads_size(self):
+        return self.limit
+
+
+class NoopDrivers:
+    """
+    Run function of the dispatch loop: starts a driver thread which holds
+    its slot for work seconds, then reports that it finished the way the
+    driver threads do
+    """
+
+    def __init__(self, work):
+        self.work = work
+        self.lock = threading.Lock()
+        self.starts = []
+        self.finishes = []
+
+    def __call__(self, task, test_drivers, current_driver_threads,
+                 message_queue):
+        thread_name = test_drivers[0][0]
+        thread = threading.Thread(target=self._execute,
+                                  args=(thread_name, message_queue),
+                                  name=thread_name)
+        thread.daemon = True
+        current_driver_threads.setdefault(thread_name, thread)
+        thread.start()
+
+    def _execute(self, thread_name, message_queue):
+        with self.lock:
+            self.starts.append(time.perf_counter())
+        if self.work:
+            time.sleep(self.work)
+        with self.lock:
+            self.finishes.append(time.perf_counter())
+        message_queue.put(ExecuteMessage(ExecuteMessage.DEVICE_FINISH, None,
+                                         None, thread_name))
+
+    def get_latencies(self, limit):
+        """
+        Time from the last slot freed to each start which had to wait for
+        one, the first limit drivers start without waiting
+        """
+        finishes = sorted(self.finishes)
+        latencies = []
+        for start_time in sorted(self.starts)[limit:]:
+            index = bisect.bisect_right(finishes, start_time)
+            if index:
+                latencies.append(start_time - finishes[index - 1])
+        return latencies
+
+
+def bench_dispatch(limits, count, work):
+    results = []
+    for limit in limits:
+        scheduler = BenchScheduler(limit)
+        drivers = NoopDrivers(work)
+        start_time = time.perf_counter()
+        scheduler.run_in_loop(BenchTask(count), drivers)
+        cost_time = time.perf_counter() - start_time
+        if len(drivers.finishes) != count:
+            raise RuntimeError("{} of {} drivers finished".format(
+                len(drivers.finishes), count))
+        results.append({
+            "limit": limit,
+            "seconds": round(cost_time, 3),
+            "modules_per_second": round(count / cost_time, 1),
+            "dispatch_ms": common.summarize(
+                drivers.get_latencies(limit), 1000)})
+    return results
+
+
+def main():
+    parser = common.get_arg_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("--work", type=float, default=0.001,
+                        help="time each driver holds its slot (s)")
+    args = parser.parse_args()
+    params = {
+        "work": args.work,
+        "limits": [1, 4] if args.quick else [1, 2, 4, 8, 16],
+        "modules": 50 if args.quick else 500
+    }
+    results = {
+        "dispatch": bench_dispatch(params["limits"], params["modules"],
+                                   params["work"])
+    }
+    common.write_results("scheduler_latency", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Measures how fast synthetic gtest output is collected by the shell output
+receivers, in memory and spilled to a file, against the string
+concatenation they used before, and how fast ShellHandler hands it to a
+parser line by line as it arrives.
+
+    python3 benchmarks/shell_receiver.py -o shell_receiver.json
+"""
+
+import time
+
+import common
+from _core.driver.parser_lite import ShellHandler
+from _core.interface import IParser
+from ohos.drivers.cpp_driver import _cpp_output_method
+from ohos.environment.dmlib import CollectingOutputReceiver
+
+MB = 1024 * 1024
+
+
+class ConcatReceiver:
+    """
+    The receiver as it was, the output is rebuilt on every read
+    """
+
+    def __init__(self):
+        self.output = ""
+
+    def __read__(self, output):
+        self.output = "%s%s" % (self.output, output)
+
+
+class LineCounter(IParser):
+    """
+    Parser which only counts the lines it gets
+    """
+
+    def __init__(self):
+        self.lines = 0
+
+    def __process__(self, lines):
+        self.lines += len(lines)
+
+    def __done__(self):
+        pass
+
+
+def make_output(size):
+    """
+    Returns gtest output of about size characters
+    """
+    lines = ["[==========] Running tests from 1 test suite."]
+    length, index = 0, 0
+    while length < size:
+        name = "BenchSuite.TestCase{:07d}".format(index)
+        for line in ["[ RUN      ] {}".format(name),
+                     "[       OK ] {} (0 ms)".format(name)]:
+            lines.append(line)
+            length += len(line) + 1
+        index += 1
+    lines.append("[==========] {} tests ran.".format(index))
+    return "\n".join(lines) + "\n"
+
+
+def feed(receiver, output, frame_size):
+    """
+    Hands the output to the receiver in frames, as the shell command does,
+    and returns the seconds it took
+    """
+    start_time = time.perf_counter()
+    for index in range(0, len(output), frame_size):
+        receiver.__read__(output[index:index + frame_size])
+    return time.perf_counter() - start_time
+
+
+def bench_collect(size_mb, frame_size, max_memory):
+    output = make_output(size_mb * MB)
+    results = {}
+    for name, memory in [("memory", None), ("spill", max_memory)]:
+        receiver = CollectingOutputReceiver(max_memory=memory)
+        cost_time = feed(receiver, output, frame_size)
+        start_time = time.perf_counter()
+        if receiver.output != output:
+            raise RuntimeError("collected output differs")
+        join_time = time.perf_counter() - start_time
+        receiver.close()
+        results[name] = {"collect_seconds": round(cost_time, 3),
+                         "output_seconds": round(join_time, 3),
+                         "mb_per_second": round(
+                             size_mb / (cost_time + join_time), 1)}
+    # the line splitting of the cpp driver, which keeps a line cut by a
+    # frame until its end comes
+    parser = LineCounter()
+    handler = ShellHandler([parser])
+    handler.add_process_method(_cpp_output_method)
+    cost_time = feed(handler, output, frame_size)
+    if parser.lines != output.count("\n"):
+        raise RuntimeError("parser got {} lines".format(parser.lines))
+    results["shell_handler"] = {"seconds": round(cost_time, 3),
+                                "lines_per_second": round(
+                                    parser.lines / cost_time)}
+    return results
+
+
+def bench_concat(sizes_mb, frame_size):
+    """
+    Collect times of the concatenating and the chunk list receivers, the
+    first grows with the square of the size
+    """
+    results = []
+    for size_mb in sizes_mb:
+        output = make_output(size_mb * MB)
+        results.append({
+            "mb": size_mb,
+            "concat_seconds": round(feed(ConcatReceiver(), output,
+                                         frame_size), 3),
+            "chunks_seconds": round(feed(CollectingOutputReceiver(), output,
+                                         frame_size), 3)})
+    return results
+
+
+def main():
+    parser = common.get_arg_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("--frame-size", type=int, default=4096,
+                        help="characters handed to the receiver at once")
+    args = parser.parse_args()
+    params = {
+        "frame_size": args.frame_size,
+        "output_mb": 5 if args.quick else 50,
+        "max_memory_mb": 1 if args.quick else 8,
+        "concat_mb": [1, 2] if args.quick else [1, 2, 4, 8]
+    }
+    results = {
+        "collect": bench_collect(params["output_mb"], params["frame_size"],
+                                 params["max_memory_mb"] * MB),
+        "concat": bench_concat(params["concat_mb"], params["frame_size"])
+    }
+    common.write_results("shell_receiver", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -56,6 +56,7 @@ class ParserType:
     build_only_test = "BuildOnlyTestLite"
     jsuit_test_lite = "JSUnitTestLite"
     vulkan_test = "VulkanTest"
+    deqp_test = "DeqpTest"
 
 
 @dataclass
@@ -16,16 +16,30 @@
 # limitations under the License.
 #
 
+import copy
 import os
 import re
+import tempfile
+import threading
+import uuid
 
 from ohos.drivers import *
+from ohos.drivers.sharding import GTEST_FILTER_MAX_LENGTH
+from ohos.drivers.sharding import CaseDurations
+from ohos.drivers.sharding import ShardRecorder
+from ohos.drivers.sharding import apply_shard_devices
+from ohos.drivers.sharding import get_shard_request
+from ohos.drivers.sharding import release_shard_devices
+from ohos.drivers.sharding import split_tests
+from ohos.drivers.sharding import start_shard_log
+from ohos.drivers.sharding import stop_shard_log
 from ohos.error import ErrorMessage
 from ohos.utils import get_ta_class
 from ohos.utils import group_list
 from ohos.utils import print_not_exist_class
 from xdevice import DataHelper
 from xdevice import Request
+from xdevice import convert_serial
 
 __all__ = ["CppTestDriver"]
 LOG = platform_logger("CppTestDriver")
@@ -49,6 +63,9 @@ class CppTestDriver(IDriver):
         self.rerun = True
         self.rerun_all = True
         self.runner = None
+        self.request = None
+        self.kits = []
+        self.shard_count = 1
 
     def __check_environment__(self, device_options):
         pass
@@ -108,6 +125,9 @@ class CppTestDriver(IDriver):
                 listener.device_sn = self.config.device.device_sn
 
             self._get_driver_config(json_config)
+            self.request = request
+            # the shard devices set up the module kits on their own
+            self.kits = list(kits)
             do_module_kit_setup(request, kits)
             self.runner = RemoteCppTestRunner(self.config)
             self.runner.suite_name = request.root.source.test_name
@@ -142,6 +162,9 @@ class CppTestDriver(IDriver):
 
         if not test_to_run:
             self.runner.run(listener)
+        elif self.shard_count > 1 and not filter_class and \
+                len(test_to_run) > 1:
+            self._run_with_shards(listener, test_to_run)
         else:
             self._run_with_rerun(listener, test_to_run)
 
@@ -200,6 +223,129 @@ class CppTestDriver(IDriver):
             self.runner.rerun(listener, test)
             self.runner.remove_instrumentation_arg("gtest_filter")
 
+    def _run_with_shards(self, listener, expected_tests):
+        """
+        Splits the tests into shards and runs each shard on its own device,
+        the device of the module and the idle ones applied for. The results
+        of the shards are merged into the module report in shard order.
+        """
+        devices = apply_shard_devices(
+            self.request, min(self.shard_count, len(expected_tests)) - 1)
+        if not devices:
+            LOG.info("No idle device to shard the tests, run them on one "
+                     "device")
+            self._run_with_rerun(listener, expected_tests)
+            return
+        module_name = self.request.root.source.test_name
+        durations = CaseDurations.from_request(self.request)
+        shards = split_tests(expected_tests, len(devices) + 1, durations,
+                             module_name)
+        devices.insert(0, self.config.device)
+        shard_threads = []
+        not_run_tests = []
+        try:
+            for index, (test_filter, tests, estimate) in enumerate(shards):
+                LOG.info("Shard {}/{}: {} tests, about {:.1f}s, on device "
+                         "{}".format(index + 1, len(shards), len(tests),
+                                     estimate, convert_serial(
+                                         devices[index].device_sn)))
+                shard = {"device": devices[index], "tests": tests,
+                         "filter": test_filter, "recorder": ShardRecorder(),
+                         "error": None}
+                thread = threading.Thread(
+                    target=self._run_shard, args=(shard,),
+                    name="{}-shard{}".format(module_name, index + 1))
+                thread.daemon = True
+                thread.start()
+                shard_threads.append((shard, thread))
+            for shard, thread in shard_threads:
+                thread.join()
+                shard.get("recorder").replay(listener)
+                for test, duration in \
+                        shard.get("recorder").get_case_durations():
+                    if durations is not None:
+                        durations.update(CaseDurations.get_key(
+                            module_name, test), duration)
+                if shard.get("error") is not None:
+                    not_run_tests.extend(TestDescription.remove_test(
+                        list(shard.get("tests")),
+                        shard.get("recorder").get_run_tests()))
+        finally:
+            release_shard_devices(devices[1:])
+        if durations is not None:
+            durations.save()
+        if not_run_tests:
+            LOG.info("Run the {} tests of the failed shards on device "
+                     "{}".format(len(not_run_tests), convert_serial(
+                         self.config.device.device_sn)))
+            self._rerun_all(not_run_tests, listener)
+            self.runner.remove_instrumentation_arg("gtest_filter")
+
+    def _run_shard(self, shard):
+        device = shard.get("device")
+        shard_request = None if device is self.config.device else \
+            get_shard_request(self.request, device)
+        flag_file = None
+        try:
+            if shard_request:
+                start_shard_log(shard_request)
+                do_module_kit_setup(shard_request, list(self.kits))
+            shard_driver = copy.copy(self)
+            if shard_request:
+                shard_driver.config = shard_request.config
+            shard_driver.runner = RemoteCppTestRunner(shard_driver.config)
+            shard_driver.runner.suite_name = self.runner.suite_name
+            shard_driver.runner.arg_list = dict(self.runner.arg_list)
+            flag_file = self._set_shard_filter(shard_driver,
+                                               shard.get("filter"))
+            shard_driver._run_with_rerun([shard.get("recorder")],
+                                         list(shard.get("tests")))
+        except Exception as error:
+            shard["error"] = error
+            LOG.warning("Run shard on device {} failed, {}".format(
+                convert_serial(device.device_sn), error))
+        finally:
+            if flag_file:
+                try:
+                    device.execute_shell_command("rm -f %s" % flag_file)
+                except Exception as error:
+                    LOG.debug("Remove {} failed, {}".format(flag_file, error))
+            if shard_request:
+                try:
+                    do_module_kit_teardown(shard_request)
+                except Exception as error:
+                    LOG.warning("Teardown kits on device {} failed, {}".format(
+                        convert_serial(device.device_sn), error))
+                failed = shard.get("error") is not None or \
+                    shard.get("recorder").has_failure()
+                stop_shard_log(shard_request, failed)
+
+    @staticmethod
+    def _set_shard_filter(shard_driver, test_filter):
+        """
+        Passes the filter of a shard on the command line, or in a gtest flag
+        file on the device when it is too long for the device shell.
+        Return the flag file, None when the filter is on the command line
+        """
+        if len(test_filter) <= GTEST_FILTER_MAX_LENGTH:
+            shard_driver.runner.add_instrumentation_arg(
+                "gtest_filter", test_filter)
+            return None
+        config = shard_driver.config
+        flag_file = "{}/{}_{}.flags".format(
+            config.target_test_path.rstrip("/"), config.module_name,
+            uuid.uuid4().hex[:8])
+        with tempfile.TemporaryDirectory() as temp_dir:
+            local_file = os.path.join(temp_dir, "gtest.flags")
+            with open(local_file, "w", encoding="utf-8") as flags:
+                flags.write("--gtest_filter={}\n".format(test_filter))
+            config.device.push_file(local_file, flag_file)
+        LOG.debug("Pass the filter of {} characters in {}".format(
+            len(test_filter), flag_file))
+        shard_driver.runner.add_instrumentation_arg("gtest_flagfile",
+                                                    flag_file)
+        return flag_file
+
     def _get_driver_config(self, json_config):
         target_test_path = get_config_value('native-test-device-path',
                                             json_config.get_driver(), False)
@@ -218,6 +364,11 @@ class CppTestDriver(IDriver):
         else:
             self.config.timeout = TIME_OUT
 
+        shard_count = get_config_value('shard-count',
+                                       json_config.get_driver(), False)
+        self.shard_count = int(shard_count) if str(shard_count).isdigit() \
+            else 1
+
         rerun = get_config_value('rerun', json_config.get_driver(), False)
         if isinstance(rerun, bool):
             self.rerun = rerun
@@ -306,11 +457,19 @@ class RemoteCppTestRunner:
                 if not test_tracker.get_current_run_results():
                     LOG.debug("No test case is obtained finally")
                     self.rerun_attempt -= 1
-                    handler.parsers[0].mark_test_as_blocked(test)
+                    self._mark_test_as_blocked(handler, test)
         else:
             LOG.debug("Not execute and mark as blocked finally")
             handler = self._get_shell_handler(listener)
-            handler.parsers[0].mark_test_as_blocked(test)
+            self._mark_test_as_blocked(handler, test)
+
+    @staticmethod
+    def _mark_test_as_blocked(handler, test):
+        if not handler.parsers:
+            LOG.warning("No cpptest parser to mark {}.{} as blocked".format(
+                test.class_name, test.test_name))
+            return
+        handler.parsers[0].mark_test_as_blocked(test)
 
     def add_instrumentation_arg(self, name, value):
         if not name or not value:
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import copy
+import heapq
+import os
+import threading
+
+from xdevice import Binder
+from xdevice import ConfigConst
+from xdevice import DeviceSelectionOption
+from xdevice import Environment
+from xdevice import IListener
+from xdevice import LifeCycle
+from xdevice import ModuleDurations
+from xdevice import TestDescription
+from xdevice import convert_serial
+from xdevice import platform_logger
+
+__all__ = ["CaseDurations", "ShardRecorder", "split_tests",
+           "apply_shard_devices", "release_shard_devices",
+           "get_shard_request", "start_shard_log", "stop_shard_log",
+           "GTEST_FILTER_MAX_LENGTH"]
+
+LOG = platform_logger("Sharding")
+# estimated duration (s) of a case when no case has a duration yet
+DEFAULT_CASE_DURATION = 1
+# longest gtest filter (characters) put in a shard's shell command, longer
+# filters are passed in a flag file
+GTEST_FILTER_MAX_LENGTH = 4096
+
+
+class CaseDurations(ModuleDurations):
+    """
+    Test case durations (s) from the past tasks, keyed by
+    'module.class.test'. Several modules may save the file at the same
+    time, so the recorded durations of the others are kept on save.
+    """
+    file_name = "case_durations.json"
+    file_lock = threading.Lock()
+
+    @classmethod
+    def from_request(cls, request):
+        report_path = request.get(ConfigConst.report_path, "")
+        if not report_path:
+            return None
+        durations = cls(os.path.join(
+            os.path.dirname(os.path.abspath(report_path)), cls.file_name))
+        durations.load()
+        return durations
+
+    @staticmethod
+    def get_key(module_name, test):
+        return "{}.{}.{}".format(module_name, test.class_name, test.test_name)
+
+    def save(self):
+        with self.file_lock:
+            recorded = CaseDurations(self.file_path)
+            recorded.load()
+            with self.lock:
+                for name, value in recorded.durations.items():
+                    self.durations.setdefault(name, value)
+            super().save()
+
+
+class ShardRecorder(IListener):
+    """
+    Records the events of one shard, which are replayed into the module
+    listeners once the shard is done. The shards run in parallel, and
+    the listeners expect the events of one run at a time.
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def __started__(self, lifecycle, test_result):
+        self.events.append(("__started__", lifecycle, test_result, {}))
+
+    def __ended__(self, lifecycle, test_result=None, **kwargs):
+        self.events.append(("__ended__", lifecycle, test_result, kwargs))
+
+    def __skipped__(self, lifecycle, test_result, **kwargs):
+        self.events.append(("__skipped__", lifecycle, test_result, {}))
+
+    def __failed__(self, lifecycle, test_result, **kwargs):
+        self.events.append(("__failed__", lifecycle, test_result, {}))
+
+    def replay(self, listeners):
+        for name, lifecycle, test_result, kwargs in self.events:
+            for listener in listeners:
+                getattr(listener, name)(lifecycle, copy.copy(test_result),
+                                        **kwargs)
+
+    def has_failure(self):
+        return any(name == "__failed__" for name, _, _, _ in self.events)
+
+    def get_run_tests(self):
+        return [TestDescription(test_result.test_class, test_result.test_name)
+                for name, lifecycle, test_result, _ in self.events
+                if name == "__started__" and lifecycle == LifeCycle.TestCase]
+
+    def get_case_durations(self):
+        """
+        Returns the duration (s) of the ended cases, by TestDescription
+        """
+        return [(TestDescription(test_result.test_class,
+                                 test_result.test_name),
+                 test_result.run_time / 1000)
+                for name, lifecycle, test_result, _ in self.events
+                if name == "__ended__" and lifecycle == LifeCycle.TestCase]
+
+
+def split_tests(tests, shard_count, durations=None, module_name="",
+                max_filter_length=GTEST_FILTER_MAX_LENGTH):
+    """
+    Splits the tests into at most shard_count shards of about the same
+    estimated duration, longest first. A test class goes whole into one
+    shard unless it is longer than half a shard, so that the shard
+    filters stay short. A filter longer than max_filter_length selects
+    a split class with 'Class.*' and excludes the tests of the class in
+    the other shards, when that is shorter than listing them.
+    Return a list of (gtest filter, tests, estimated duration) per shard.
+    """
+    known = [durations.get(CaseDurations.get_key(module_name, test))
+             if durations else None for test in tests]
+    known_values = [value for value in known if value is not None]
+    mean = sum(known_values) / len(known_values) if known_values else \
+        DEFAULT_CASE_DURATION
+    estimates = [mean if value is None else value for value in known]
+    target = sum(estimates) / max(shard_count, 1)
+
+    classes = {}
+    for index, test in enumerate(tests):
+        classes.setdefault(test.class_name, []).append(index)
+    # unit: (estimate, first test index, filter, test indexes)
+    units = []
+    for class_name, indexes in classes.items():
+        class_estimate = sum(estimates[index] for index in indexes)
+        if class_estimate <= target / 2 or len(indexes) == 1:
+            units.append((class_estimate, indexes[0],
+                          "{}.*".format(class_name), indexes))
+            continue
+        for index in indexes:
+            units.append((estimates[index], index, "{}.{}".format(
+                class_name, tests[index].test_name), [index]))
+    units.sort(key=lambda unit: (-unit[0], unit[1]))
+
+    shards = [(0, shard_index, []) for shard_index in range(shard_count)]
+    heapq.heapify(shards)
+    for unit in units:
+        load, shard_index, shard_units = heapq.heappop(shards)
+        shard_units.append(unit)
+        heapq.heappush(shards, (load + unit[0], shard_index, shard_units))
+
+    results = []
+    for load, _, shard_units in sorted(shards, key=lambda item: item[1]):
+        if not shard_units:
+            continue
+        shard_units.sort(key=lambda unit: unit[1])
+        test_filter = ":".join(unit[2] for unit in shard_units)
+        if len(test_filter) > max_filter_length:
+            test_filter = _get_short_filter(tests, classes, shard_units)
+        shard_tests = [tests[index] for unit in shard_units
+                       for index in unit[3]]
+        results.append((test_filter, shard_tests, load))
+    return results
+
+
+def _get_short_filter(tests, classes, shard_units):
+    positives, negatives, split_tests_of = [], [], {}
+    for unit in shard_units:
+        if unit[2].endswith(".*"):
+            positives.append(unit[2])
+            continue
+        class_name = tests[unit[3][0]].class_name
+        if class_name not in split_tests_of:
+            split_tests_of[class_name] = []
+            positives.append(class_name)
+        split_tests_of[class_name].extend(unit[3])
+
+    def get_names(indexes):
+        return ["{}.{}".format(tests[index].class_name,
+                               tests[index].test_name) for index in indexes]
+
+    for index, item in enumerate(positives):
+        if item not in split_tests_of:
+            continue
+        included = get_names(split_tests_of[item])
+        excluded = get_names(sorted(set(classes[item]) -
+                                    set(split_tests_of[item])))
+        if len(":".join(excluded)) + len(item) + 2 < len(":".join(included)):
+            positives[index] = "{}.*".format(item)
+            negatives.extend(excluded)
+        else:
+            positives[index] = ":".join(included)
+    test_filter = ":".join(positives)
+    if negatives:
+        test_filter = "{}-{}".format(test_filter, ":".join(negatives))
+    return test_filter
+
+
+def apply_shard_devices(request, count):
+    """
+    Applies for up to count more devices like the device of the request,
+    through the scheduler, taking only the ones which are idle now.
+    """
+    devices = request.get_devices()
+    if not devices or count < 1:
+        return []
+    options = {ConfigConst.device_sn:
+               request.get(ConfigConst.device_sn, "") or ""}
+    device_options = []
+    for _ in range(count):
+        device_option = DeviceSelectionOption(options, devices[0].label,
+                                              request.root.source)
+        device_option.required_manager = "device"
+        device_options.append(device_option)
+    environment = Binder.allocate_idle_environment(device_options)
+    return list(environment.devices) if environment else []
+
+
+def release_shard_devices(devices):
+    if not devices:
+        return
+    environment = Environment()
+    environment.devices.extend(devices)
+    Binder.free_environment(environment)
+
+
+def get_shard_request(request, device):
+    """
+    Returns a copy of the request which runs on the device
+    """
+    config = copy.copy(request.config)
+    config.environment = Environment()
+    config.environment.devices.append(device)
+    config.device = device
+    shard_request = copy.copy(request)
+    shard_request.config = config
+    return shard_request
+
+
+def start_shard_log(shard_request):
+    """
+    Captures the device log of a shard device, as the module device's is
+    captured by the driver
+    """
+    log_collector = shard_request.config.device.device_log_collector
+    if hasattr(log_collector, "start_catch_log"):
+        log_collector.start_catch_log(shard_request)
+
+
+def stop_shard_log(shard_request, failed):
+    """
+    Stops capturing the device log of a shard device, the log is kept when
+    the shard failed
+    """
+    device = shard_request.config.device
+    setattr(device, "_test_result", "Failed" if failed else "")
+    try:
+        if hasattr(device.device_log_collector, "stop_catch_log"):
+            device.device_log_collector.stop_catch_log(shard_request)
+    except Exception as error:
+        LOG.warning("Stop catching log of device {} failed, {}".format(
+            convert_serial(device.device_sn), error))
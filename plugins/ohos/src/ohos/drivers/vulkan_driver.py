@@ -17,10 +17,21 @@
 #
 
 import os
+import queue
+import tempfile
+import threading
+import time
 
 from ohos.constants import ParserType
 from ohos.drivers import *
+from ohos.drivers.sharding import ShardRecorder
+from ohos.drivers.sharding import apply_shard_devices
+from ohos.drivers.sharding import get_shard_request
+from ohos.drivers.sharding import release_shard_devices
+from ohos.drivers.sharding import start_shard_log
+from ohos.drivers.sharding import stop_shard_log
 from ohos.error import ErrorMessage
+from xdevice import convert_serial
 
 __all__ = ["VulkanTestDriver"]
 LOG = platform_logger("VulkanTestDriver")
@@ -28,6 +39,9 @@ DEFAULT_TEST_PATH = "/%s/%s/" % ("data", "test")
 
 FAILED_RUN_TEST_ATTEMPTS = 3
 TIME_OUT = 900 * 1000
+# dEQP caselist batches per device, so that the devices finish together
+DEQP_BATCHES_PER_DEVICE = 4
+DEQP_MAX_BATCH_SIZE = 5000
 
 @Plugin(type=Plugin.DRIVER, id = ParserType.vulkan_test)
 class VulkanTestDriver(IDriver):
@@ -43,7 +57,10 @@ class VulkanTestDriver(IDriver):
         self.hilog = None
         self.log_proc = None
         self.hilog_proc = None
-
+        self.request = None
+        self.kits = []
+        self.shard_count = 1
+        self.deqp_caselist = ""
 
     def __check_environment__(self, device_options):
         pass
@@ -123,6 +140,9 @@ class VulkanTestDriver(IDriver):
                 listener.device_sn = self.config.device.device_sn
 
             self._get_driver_config(json_config)
+            self.request = request
+            # the shard devices set up the module kits on their own
+            self.kits = list(kits)
             do_module_kit_setup(request, kits)
             self.runner = RemoteVulkanTestRunner(self.config)
             self.runner.suite_name = request.root.source.test_name
@@ -147,6 +167,9 @@ class VulkanTestDriver(IDriver):
             self.runner.run(listener)
 
     def _do_test_run(self, listener):
+        if self.deqp_caselist:
+            self._run_deqp_shards(listener)
+            return
         test_to_run = self._collect_test_to_run()
         LOG.info("Collected test count is: %s" % (len(test_to_run)
                                                   if test_to_run else 0))
@@ -211,6 +234,164 @@ class VulkanTestDriver(IDriver):
             self.runner.rerun(listener, test)
             self.runner.remove_instrumentation_arg("gtest_filter")
 
+    def _run_deqp_shards(self, listener):
+        """
+        Runs the dEQP caselist in batches, each with its own
+        --deqp-caselist-file, on the device of the module and on up to
+        shard-count - 1 idle devices. Every device takes the next batch when
+        it is done with one, and the cases a batch did not reach, after a
+        crash, go back to the queue as one batch.
+        """
+        cases = self._load_deqp_caselist()
+        if not cases:
+            LOG.warning("No case in caselist {}".format(self.deqp_caselist))
+            return
+        devices = [self.config.device] + apply_shard_devices(
+            self.request, self.shard_count - 1)
+        batch_size = max(1, min(DEQP_MAX_BATCH_SIZE, -(-len(cases) // (
+            len(devices) * DEQP_BATCHES_PER_DEVICE))))
+        batches = queue.Queue()
+        for index in range(0, len(cases), batch_size):
+            batches.put((cases[index:index + batch_size], 0))
+        LOG.info("Run {} dEQP cases in {} batches on {} devices".format(
+            len(cases), batches.qsize(), len(devices)))
+
+        results = queue.Queue()
+        shards = []
+        start_time = time.time()
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                for index, device in enumerate(devices):
+                    shard = {"device": device, "index": index, "cases": 0,
+                             "batches": 0, "cost_time": 0}
+                    thread = threading.Thread(
+                        target=self._run_deqp_shard,
+                        args=(shard, batches, results, temp_dir),
+                        name="{}-shard{}".format(self.runner.suite_name,
+                                                 index + 1))
+                    thread.daemon = True
+                    thread.start()
+                    shards.append((shard, thread))
+                while any(thread.is_alive() for _, thread in shards) or \
+                        not results.empty():
+                    try:
+                        recorder = results.get(timeout=1)
+                    except queue.Empty:
+                        continue
+                    recorder.replay(listener)
+        finally:
+            release_shard_devices(devices[1:])
+        while not batches.empty():
+            batch, _ = batches.get_nowait()
+            LOG.warning("No device left to run {} dEQP cases".format(
+                len(batch)))
+            recorder = ShardRecorder()
+            self._mark_deqp_blocked(self.runner, recorder, batch)
+            recorder.replay(listener)
+        for shard, _ in shards:
+            LOG.info("dEQP shard {} on device {}: {} cases in {} batches, "
+                     "{:.1f}s, {:.1f} cases/s".format(
+                         shard.get("index") + 1,
+                         convert_serial(shard.get("device").device_sn),
+                         shard.get("cases"), shard.get("batches"),
+                         shard.get("cost_time"), shard.get("cases") / max(
+                             shard.get("cost_time"), 0.001)))
+        cost_time = time.time() - start_time
+        LOG.info("Run {} dEQP cases in {:.1f}s, {:.1f} cases/s".format(
+            len(cases), cost_time, len(cases) / max(cost_time, 0.001)))
+
+    def _run_deqp_shard(self, shard, batches, results, temp_dir):
+        device = shard.get("device")
+        shard_request = None if device is self.config.device else \
+            get_shard_request(self.request, device)
+        start_time = time.time()
+        failed = False
+        try:
+            if shard_request:
+                start_shard_log(shard_request)
+                do_module_kit_setup(shard_request, list(self.kits))
+            runner = RemoteVulkanTestRunner(
+                shard_request.config if shard_request else self.config)
+            runner.suite_name = self.runner.suite_name
+            while True:
+                try:
+                    batch, attempt = batches.get_nowait()
+                except queue.Empty:
+                    break
+                recorder = ShardRecorder()
+                try:
+                    not_run = self._run_deqp_batch(runner, recorder, batch,
+                                                   shard, temp_dir)
+                except Exception:
+                    # leave the batch to the other devices
+                    batches.put((batch, attempt + 1))
+                    raise
+                shard["batches"] += 1
+                shard["cases"] += len(batch) - len(not_run)
+                if not_run and len(not_run) == len(batch):
+                    attempt += 1
+                if not_run and attempt < FAILED_RUN_TEST_ATTEMPTS:
+                    batches.put((not_run, attempt))
+                elif not_run:
+                    self._mark_deqp_blocked(runner, recorder, not_run)
+                failed = failed or bool(not_run) or recorder.has_failure()
+                results.put(recorder)
+        except Exception as error:
+            failed = True
+            LOG.warning("Run dEQP shard on device {} failed, {}".format(
+                convert_serial(device.device_sn), error))
+        finally:
+            shard["cost_time"] = time.time() - start_time
+            if shard_request:
+                try:
+                    do_module_kit_teardown(shard_request)
+                except Exception as error:
+                    LOG.warning("Teardown kits on device {} failed, {}".format(
+                        convert_serial(device.device_sn), error))
+                stop_shard_log(shard_request, failed)
+
+    def _run_deqp_batch(self, runner, recorder, batch, shard, temp_dir):
+        """
+        Runs a batch of cases, returns the cases that did not run
+        """
+        file_name = "{}_caselist_{}.txt".format(
+            self.runner.suite_name, shard.get("index"))
+        local_file = os.path.join(temp_dir, file_name)
+        with open(local_file, "w", encoding="utf-8") as caselist_file:
+            caselist_file.write("\n".join(batch))
+            caselist_file.write("\n")
+        remote_file = "{}/{}".format(
+            runner.config.target_test_path.rstrip("/"), file_name)
+        runner.config.device.push_file(local_file, remote_file)
+        runner.arg_list = {"deqp-caselist-file": remote_file}
+        try:
+            runner.run_deqp([recorder], len(batch))
+        except ShellCommandUnresponsiveException as _:
+            LOG.debug("Exception: ShellCommandUnresponsiveException")
+        finally:
+            runner.config.device.execute_shell_command(
+                "rm -f {}".format(remote_file))
+        run_cases = {"{}.{}".format(test.class_name, test.test_name)
+                     for test in recorder.get_run_tests()}
+        return [case for case in batch if case not in run_cases]
+
+    @staticmethod
+    def _mark_deqp_blocked(runner, recorder, cases):
+        handler = runner.get_shell_handler([recorder], ParserType.deqp_test)
+        for case in cases:
+            test_class, _, test_name = case.rpartition(".")
+            handler.parsers[0].mark_test_as_blocked(
+                TestDescription(test_class, test_name))
+        handler.parsers[0].__done__()
+
+    def _load_deqp_caselist(self):
+        caselist_file = get_file_absolute_path(
+            self.deqp_caselist, [self.config.resource_path,
+                                 self.config.testcases_path])
+        with open(caselist_file, encoding="utf-8") as caselist:
+            return [line.strip() for line in caselist
+                    if line.strip() and not line.startswith("#")]
+
     def _get_driver_config(self, json_config):
         target_test_path = get_config_value('native-test-device-path',
                                             json_config.get_driver(), False)
@@ -229,6 +410,13 @@ class VulkanTestDriver(IDriver):
         else:
             self.config.timeout = TIME_OUT
 
+        self.deqp_caselist = get_config_value(
+            'deqp-caselist', json_config.get_driver(), False)
+        shard_count = get_config_value('shard-count',
+                                       json_config.get_driver(), False)
+        self.shard_count = int(shard_count) if str(shard_count).isdigit() \
+            else 1
+
         rerun = get_config_value('rerun', json_config.get_driver(), False)
         if isinstance(rerun, bool):
             self.rerun = rerun
@@ -289,6 +477,22 @@ class RemoteVulkanTestRunner:
         self.config.device.execute_shell_command(
             command, timeout=self.config.timeout, receiver=handler, retry=0)
 
+    def run_deqp(self, listener, test_num):
+        handler = self.get_shell_handler(listener, ParserType.deqp_test)
+        for parser in handler.parsers:
+            parser.test_num = test_num
+        command = "cd %s; chmod +x *; ./%s %s" \
+                  % (self.config.target_test_path, self.config.module_name,
+                     self.get_args_command())
+        if self.ohca:
+            bin_path = "{}/{}".format(self.config.target_test_path,
+                                      self.config.module_name)
+            command = "ohsh toybox chmod a+x {}; ohsh {} {}".format(
+                bin_path, bin_path, self.get_args_command())
+
+        self.config.device.execute_shell_command(
+            command, timeout=self.config.timeout, receiver=handler, retry=0)
+
     def rerun(self, listener, test):
         if self.rerun_attempt:
             test_tracker = CollectingTestListener()
@@ -343,7 +547,10 @@ class RemoteVulkanTestRunner:
         return args_commands
 
     def _get_shell_handler(self, listener):
-        parsers = get_plugin(Plugin.PARSER, ParserType.vulkan_test)
+        return self.get_shell_handler(listener, ParserType.vulkan_test)
+
+    def get_shell_handler(self, listener, parser_type):
+        parsers = get_plugin(Plugin.PARSER, parser_type)
         if parsers:
             parsers = parsers[:1]
         parser_instances = []
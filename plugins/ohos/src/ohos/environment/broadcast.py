@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from xdevice import Concurrent
+from xdevice import DeviceError
+from xdevice import convert_serial
+from xdevice import platform_logger
+
+__all__ = ["DeviceBroadcast", "BroadcastResult", "BroadcastResults"]
+
+LOG = platform_logger("Broadcast")
+MAX_BROADCAST_WORKERS = 32
+
+
+@dataclass
+class BroadcastResult:
+    device: Any
+    result: Any = None
+    error: Exception = None
+    cost_time: float = 0
+
+    @property
+    def succeeded(self):
+        return self.error is None
+
+
+class BroadcastResults(list):
+    """
+    Results of a broadcast, one BroadcastResult per device, in the order
+    of the devices.
+    """
+
+    @property
+    def succeeded(self):
+        return [item for item in self if item.succeeded]
+
+    @property
+    def failed(self):
+        return [item for item in self if not item.succeeded]
+
+    def raise_on_failure(self):
+        failed = self.failed
+        if failed:
+            raise DeviceError("{} of {} devices failed: {}".format(
+                len(failed), len(self), ", ".join(
+                    "{}: {}".format(convert_serial(item.device.device_sn),
+                                    item.error) for item in failed)))
+        return self
+
+
+class DeviceBroadcast:
+    """
+    Runs the same operation on a set of devices concurrently. Each device
+    gets its own timeout (s). A failure or timeout on one device does not
+    stop the others, it is reported in the device's result.
+    """
+
+    def __init__(self, devices, timeout=None, max_workers=MAX_BROADCAST_WORKERS):
+        self.devices = list(devices)
+        self.timeout = timeout
+        self.max_workers = max_workers
+
+    def execute_shell_command(self, command, **kwargs):
+        return self.run(lambda device: device.execute_shell_command(
+            command, **kwargs), "shell {}".format(command))
+
+    def push_file(self, local, remote, **kwargs):
+        return self.run(lambda device: device.push_file(
+            local, remote, **kwargs), "push {} to {}".format(local, remote))
+
+    def install_package(self, package_path, command=""):
+        return self.run(lambda device: device.install_package(
+            package_path, command), "install {}".format(package_path))
+
+    def install_app(self, remote_path, command=""):
+        return self.run(lambda device: device.install_app(
+            remote_path, command), "install {}".format(remote_path))
+
+    def run(self, func, name=""):
+        """
+        Calls func(device) for every device and collects the results.
+        A device that times out gets a result with the TimeoutError, what
+        its call does after it is not seen in the results.
+        """
+        results = BroadcastResults(
+            BroadcastResult(device) for device in self.devices)
+        if not results:
+            return results
+        start_time = time.time()
+        for result, params, error in Concurrent.concurrent_execute_stream(
+                self._call, [(func, index, device) for index, device in
+                             enumerate(self.devices)],
+                max_size=min(self.max_workers, len(results)),
+                timeout=self.timeout):
+            index = params[1]
+            if error is None:
+                results[index] = result
+            else:
+                results[index].error = error
+                if isinstance(error, TimeoutError):
+                    results[index].cost_time = self.timeout
+        LOG.info("Broadcast {} to {} devices in {:.3f}s, {} succeeded, {} "
+                 "failed".format(name, len(results), time.time() - start_time,
+                                 len(results.succeeded), len(results.failed)))
+        for item in results.failed:
+            LOG.warning("Broadcast {} on device {} failed: {}".format(
+                name, convert_serial(item.device.device_sn), item.error))
+        return results
+
+    @staticmethod
+    def _call(func, index, device):
+        """
+        Returns a new result, so that a call which finishes after its
+        timeout does not change the results returned. The index of the
+        device is only there for run to find it in the params.
+        """
+        item = BroadcastResult(device)
+        start_time = time.time()
+        try:
+            item.result = func(device)
+        except Exception as error:
+            item.error = error
+        finally:
+            item.cost_time = time.time() - start_time
+        return item
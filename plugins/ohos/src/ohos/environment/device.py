@@ -25,10 +25,13 @@ import threading
 import copy
 import platform
 import subprocess
+import tarfile
 import tempfile
+import uuid
 from datetime import datetime
 from typing import Tuple
 
+from xdevice import Concurrent
 from xdevice import DeviceOsType
 from xdevice import FilePermission
 from xdevice import ParamError
@@ -55,8 +58,17 @@ from xdevice import Platform
 from xdevice import AgentMode
 from xdevice import ShellCommandUnresponsiveException
 from xdevice import Variables
+from xdevice import clear_setup
+from xdevice import traced
 from ohos.environment.dmlib import HdcHelper
+from ohos.environment.dmlib import HdcConnectionPool
+from ohos.environment.dmlib import HdcMonitor
+from ohos.environment.dmlib import SyncService
 from ohos.environment.dmlib import CollectingOutputReceiver
+from ohos.environment.dmlib import create_local_link
+from ohos.environment.dmlib import select_pull_entries
+from ohos.environment.param_cache import ParamCache
+from ohos.environment.push_cache import PushCache
 from ohos.utils import parse_strings_key_value
 from ohos.error import ErrorMessage
 from ohos.constants import ConnectType
@@ -75,6 +87,8 @@ ROOT_PATH = "/data/log/faultlog"
 KINGKONG_PATH = "/data/local/tmp/kingkongDir"
 LOGLEVEL = ["DEBUG", "INFO", "WARN", "ERROR", "FATAL"]
 HILOG_PATH = "/data/log/hilog"
+# max length of the file paths archived by one tar command in pull_dir
+PULL_ARCHIVE_MAX_PATHS_LENGTH = 16 * 1024
 
 
 class CaptureMode:
@@ -82,6 +96,15 @@ class CaptureMode:
     HAP = "hap"          # hap
 
 
+def _get_trace_args(device, *args, **kwargs):
+    return {"device": convert_serial(device.device_sn),
+            "args": " ".join(str(arg) for arg in args)}
+
+
+def _get_log_trace_args(collector, *args, **kwargs):
+    return {"device": convert_serial(collector.device.device_sn)}
+
+
 def perform_device_action(func):
     def callback_to_outer(device, msg):
         # callback to decc ui
@@ -176,6 +199,8 @@ class Device(IDevice):
     device_state_monitor = None
     reboot_timeout = 2 * 60 * 1000
     _device_log_collector = None
+    _push_cache = None
+    _param_cache = None
 
     _agent_mode = AgentMode.bin
     is_oh = True
@@ -363,6 +388,11 @@ class Device(IDevice):
         # tcpip类型的设备，需要connect成功后，才能被hdc list targets命令查询到
         self.reconnect_tcpip_device()
 
+        # files and params on the device may be changed after it recovers
+        self.push_cache.clear()
+        self.param_cache.invalidate()
+        clear_setup(self)
+        self._wake_up_monitor()
         result = self.device_state_monitor.wait_for_device_available(self.reboot_timeout)
         if result:
             self.device_log_collector.restart_catch_device_log()
@@ -416,12 +446,19 @@ class Device(IDevice):
         return self.label
 
     def get_property(self, prop_name, retry=RETRY_ATTEMPTS,
-                     abort_on_exception=False):
+                     abort_on_exception=False, use_cache=True):
         """
         Hdc command, dmlib function.
+        With use_cache False the value is read from the device even when
+        the parameter cache has it.
         """
         if not self.get_recover_state():
             return ""
+        value = self.param_cache.get(
+            prop_name, retry=retry,
+            abort_on_exception=abort_on_exception) if use_cache else None
+        if value is not None:
+            return value
         command = "param get %s" % prop_name
         stdout = self.execute_shell_command(command, timeout=5 * 1000,
                                             output_flag=False,
@@ -432,12 +469,19 @@ class Device(IDevice):
         return stdout
 
     def get_property_value(self, prop_name, retry=RETRY_ATTEMPTS,
-                           abort_on_exception=False):
+                           abort_on_exception=False, use_cache=True):
         """
         Hdc command, ddmlib function.
+        With use_cache False the value is read from the device even when
+        the parameter cache has it.
         """
         if not self.get_recover_state():
             return ""
+        value = self.param_cache.get(
+            prop_name, retry=retry,
+            abort_on_exception=abort_on_exception) if use_cache else None
+        if value is not None:
+            return value
         command = "param get %s" % prop_name
         stdout = self.execute_shell_command(command, timeout=5 * 1000,
                                             output_flag=False,
@@ -447,6 +491,12 @@ class Device(IDevice):
             return ""
         return stdout
 
+    @property
+    def param_cache(self):
+        if self._param_cache is None:
+            self._param_cache = ParamCache(self)
+        return self._param_cache
+
     @perform_device_action
     def connector_command(self, command, **kwargs):
         timeout = int(kwargs.get("timeout", TIMEOUT)) / 1000
@@ -476,9 +526,13 @@ class Device(IDevice):
                     LOG.debug(line.strip())
         return result
 
+    @traced("shell", "device", _get_trace_args)
     @perform_device_action
     def execute_shell_command(self, command, timeout=TIMEOUT,
                               receiver=None, **kwargs):
+        kwargs.setdefault("use_pool", Variables.config.get_hdc_connection_pool())
+        if isinstance(command, str) and "param set" in command:
+            self.param_cache.invalidate()
         if not receiver:
             collect_receiver = CollectingOutputReceiver()
             HdcHelper.execute_shell_command(
@@ -493,6 +547,17 @@ class Device(IDevice):
                 self, command, timeout=timeout,
                 receiver=receiver, **kwargs)
 
+    def probe_latency(self):
+        """
+        Returns the time (s) a trivial shell command takes. It is the same
+        command every time, so the time only changes with how congested the
+        device connection is.
+        """
+        start_time = time.time()
+        self.execute_shell_command("echo", timeout=5 * 1000,
+                                   output_flag=False, retry=0)
+        return time.time() - start_time
+
     def execute_shell_cmd_background(self, command, timeout=TIMEOUT,
                                      receiver=None):
         status = HdcHelper.execute_shell_command(self, command,
@@ -507,14 +572,29 @@ class Device(IDevice):
         return status
 
     def wait_for_device_not_available(self, wait_time):
+        self._wake_up_monitor()
         return self.device_state_monitor.wait_for_device_not_available(
             wait_time)
 
     def _wait_for_device_online(self, wait_time=None):
+        self._wake_up_monitor()
         return self.device_state_monitor.wait_for_device_online(wait_time)
 
+    def _wake_up_monitor(self):
+        """
+        The monitor polls slowly on a quiet host, it polls fast for a while
+        when a state change of the device is waited for
+        """
+        monitor = HdcMonitor.MONITOR_MAP.get(self.host)
+        if monitor is not None:
+            monitor.wake_up()
+
     def _do_reboot(self):
         HdcHelper.reboot(self)
+        HdcConnectionPool.clear_device(self.host, self.port, self.device_sn)
+        self.push_cache.clear()
+        self.param_cache.invalidate()
+        clear_setup(self)
         self.recover_device()
 
     def _reboot_until_online(self):
@@ -533,13 +613,16 @@ class Device(IDevice):
     def uninstall_package(self, package_name):
         return HdcHelper.uninstall_package(self, package_name)
 
+    @traced("push", "device", _get_trace_args)
     @perform_device_action
     def push_file(self, local, remote, **kwargs):
         """
         Push a single file.
         The top directory won't be created if is_create is False (by default)
-        and vice versa
+        and vice versa. With compress or resumable, the file goes over a sync
+        session, see _sync_file.
         """
+        local_path, remote_path = local, remote
         local = "\"{}\"".format(local)
         remote = "\"{}\"".format(remote)
         if local is None:
@@ -552,25 +635,155 @@ class Device(IDevice):
                     str(ret).split()[0] == "0"):
                 self.execute_shell_command("mkdir -p %s" % remote, retry=0)
 
-        self.connector_command("file send {} {}".format(local, remote), retry=0)
+        if not self._sync_file("push", local_path, remote_path, **kwargs):
+            self.connector_command("file send {} {}".format(local, remote), retry=0)
 
         if not self.is_file_exist(remote):
             err_msg = ErrorMessage.Device.Code_0303004.format(local, remote)
             LOG.error(err_msg)
             raise HdcError(err_msg)
 
+    @traced("pull", "device", _get_trace_args)
     @perform_device_action
     def pull_file(self, remote, local, **kwargs):
         """
         Pull a single file.
         The top directory won't be created if is_create is False (by default)
-        and vice versa
+        and vice versa. With compress or resumable, the file goes over a sync
+        session, see _sync_file.
         """
+        if self._sync_file("pull", local, remote, **kwargs):
+            return
         local = "\"{}\"".format(local)
         remote = "\"{}\"".format(remote)
         # 改成走socket方式拉文件，hdc回应拉取成功，实际文件没有被拉下来，而使用命令方式，没有问题
         self.connector_command("file recv {} {}".format(remote, local), retry=0)
 
+    def _sync_file(self, action, local, remote, **kwargs):
+        """
+        Pushes or pulls a file over a sync session when compressed or
+        resumable transfers are asked for, by the compress and resumable
+        kwargs or else the transfer_compress and transfer_resumable task
+        args. A resumable transfer that fails is continued by the retry of
+        the device action. Returns False when neither is asked for or the
+        hdc server refuses the sync session, the hdc command is used then.
+        """
+        compress = kwargs.get("compress",
+                              Variables.config.get_transfer_compress())
+        resumable = kwargs.get("resumable",
+                               Variables.config.get_transfer_resumable())
+        if not compress and not resumable:
+            return False
+        sync_service = SyncService(self, self.host, self.port)
+        try:
+            sync_service.open_sync()
+        except Exception as error:
+            sync_service.close()
+            LOG.debug("Open sync session on {} failed, {} file with {}: "
+                      "{}".format(convert_serial(self.device_sn), action,
+                                  HdcHelper.CONNECTOR_NAME, error))
+            return False
+        try:
+            if action == "push":
+                sync_service.push_file(local, remote, compress=compress,
+                                       resumable=resumable)
+            else:
+                sync_service.pull_file(remote, local, compress=compress,
+                                       resumable=resumable)
+        finally:
+            sync_service.close()
+        return True
+
+    def pull_dir(self, remote, local, includes=None, excludes=None,
+                 file_filter=None, max_workers=1):
+        """
+        Pull the files under a remote directory that pass the filters, keeping
+        the directory layout, the empty directories and the symbolic links.
+        The tree is listed with one remote command, so files that are not
+        wanted are never pulled, and the files are pulled in tar archives,
+        one transfer for many files. Where tar fails on the device the files
+        are pulled one by one, by max_workers at once.
+        Return False if nothing could be listed under the remote directory.
+        """
+        remote = remote.rstrip("/")
+        entries = select_pull_entries(self, remote, local, includes, excludes,
+                                      file_filter)
+        if entries is None:
+            return False
+        files, links = entries
+        LOG.debug("Pull {} files and {} links under {}".format(
+            len(files), len(links), remote))
+        for target, local_link in links:
+            create_local_link(target, local_link)
+        files = self._pull_dir_archives(remote, local, files)
+        if not files:
+            return True
+        if max_workers <= 1:
+            for remote_file, local_file in files:
+                self._pull_dir_file(remote_file, local_file)
+            return True
+        for _, _, error in Concurrent.concurrent_execute_stream(
+                self._pull_dir_file, files, max_size=max_workers):
+            if error is not None:
+                raise error
+        return True
+
+    def _pull_dir_file(self, remote_file, local_file):
+        self.pull_file(remote_file, os.path.dirname(local_file), retry=0)
+
+    def _pull_dir_archives(self, remote, local, files):
+        """
+        Pulls the (remote, local) files under remote into local in tar
+        archives of up to PULL_ARCHIVE_MAX_PATHS_LENGTH of paths each.
+        Return the files left to pull one by one, when tar fails.
+        """
+        chunks, length = [[]], 0
+        for item in files:
+            path = shlex.quote(item[0][len(remote):].lstrip("/"))
+            if chunks[-1] and length + len(path) > \
+                    PULL_ARCHIVE_MAX_PATHS_LENGTH:
+                chunks.append([])
+                length = 0
+            chunks[-1].append((item, path))
+            length += len(path) + 1
+        for index, chunk in enumerate(chunks):
+            if chunk and not self._pull_dir_archive(
+                    remote, local, [path for _, path in chunk]):
+                return [item for chunk in chunks[index:] for item, _ in chunk]
+        return []
+
+    def _pull_dir_archive(self, remote, local, paths):
+        remote_archive = "{}/xdevice_pull_{}.tar".format(
+            self.tmp_path, uuid.uuid4().hex)
+        output = self.execute_shell_command(
+            "cd {} && tar -cf {} {}; echo $?".format(
+                shlex.quote(remote), remote_archive, " ".join(paths)),
+            output_flag=False, retry=0)
+        lines = str(output).strip().splitlines()
+        try:
+            if not lines or lines[-1].strip() != "0":
+                LOG.debug("Archive the files under {} failed, pull them one "
+                          "by one. {}".format(remote, output))
+                return False
+            with tempfile.TemporaryDirectory(prefix="xdevice_pull_") \
+                    as temp_dir:
+                self.pull_file(remote_archive, temp_dir, retry=0)
+                local_archive = os.path.join(
+                    temp_dir, os.path.basename(remote_archive))
+                if not os.path.isfile(local_archive):
+                    return False
+                # only the members asked for, their names come from the
+                # listing of remote, so none of them leaves local
+                names = {shlex.split(path)[0] for path in paths}
+                with tarfile.open(local_archive) as archive:
+                    members = [member for member in archive.getmembers()
+                               if member.isfile() and member.name in names]
+                    archive.extractall(local, members=members)
+            return True
+        finally:
+            self.execute_shell_command("rm -f {}".format(remote_archive),
+                                       output_flag=False, retry=0)
+
     @property
     def is_root(self):
         if self._is_root is None:
@@ -631,6 +844,12 @@ class Device(IDevice):
             self._device_log_collector = DeviceLogCollector(self)
         return self._device_log_collector
 
+    @property
+    def push_cache(self):
+        if self._push_cache is None:
+            self._push_cache = PushCache(self)
+        return self._push_cache
+
     def close(self):
         self.reconnecttimes = 0
 
@@ -991,6 +1210,7 @@ class DeviceLogCollector:
         if not self._hilog_begin_time:
             self._hilog_begin_time = time.time()
 
+    @traced("start catch device log", "device log", _get_log_trace_args)
     def start_catch_device_log(self, log_file_pipe=None, hilog_file_pipe=None, **kwargs):
         """
         Starts hdc log for each device in separate subprocesses and save
@@ -1015,6 +1235,7 @@ class DeviceLogCollector:
         self.device_hilog_proc = device_hilog_proc
         return None, device_hilog_proc
 
+    @traced("stop catch device log", "device log", _get_log_trace_args)
     def stop_catch_device_log(self, proc):
         """
         Stops all hdc log subprocesses.
@@ -1026,6 +1247,7 @@ class DeviceLogCollector:
             self.pull_hdc_log(self.hdc_module_name)
             self.hdc_module_name = None
 
+    @traced("start hilog task", "device log", _get_log_trace_args)
     def start_hilog_task(self, **kwargs):
         """启动日志抓取任务。若设备没有在抓取日志，则设置启动抓取（不删除历史日志，以免影响其他组件运行）"""
         log_size = (kwargs.get("log_size") or "4M").upper()
@@ -1076,6 +1298,7 @@ class DeviceLogCollector:
             r = self.device.execute_shell_command('hilog -w start -t kmsg -l {} -n 100'.format(log_size))
             LOG.debug(r)
 
+    @traced("stop hilog task", "device log", _get_log_trace_args)
     def stop_hilog_task(self, log_name, repeat=1, repeat_round=1, **kwargs):
         module_name = kwargs.get("module_name", "")
         round_folder = f"round{repeat_round}" if repeat > 1 else ""
@@ -1109,6 +1332,7 @@ class DeviceLogCollector:
         # 获取hdc日志
         self.pull_hdc_log(module_name, round_folder=round_folder)
 
+    @traced("pull hdc log", "device log", _get_log_trace_args)
     def pull_hdc_log(self, module_name, round_folder=""):
         if not self.need_pull_hdc_log:
             return
@@ -1155,6 +1379,10 @@ class DeviceLogCollector:
             return
         # 非root场景获取日志
         remote = "/data/log/faultlog"
+        # 只拉取用例运行期间产生的日志文件
+        if self._hilog_begin_time and self.device.pull_dir(
+                remote, crash_path, file_filter=self._is_period_crash_log):
+            return
         self.device.pull_file(remote, crash_path, retry=0)
         if not os.path.exists(crash_path) or not self._hilog_begin_time:
             return
@@ -1163,21 +1391,9 @@ class DeviceLogCollector:
             try:
                 for f in nondirs:
                     filepath = os.path.join(top, f)
-                    # 文件名含unix时间戳。如：cppcrash-1924-1765391997031
-                    r1 = re.match(r'\S+-(\d+)$', f)
-                    if r1:
-                        if int(r1.group(1)) / 1000 < self._hilog_begin_time:
-                            LOG.debug('remove crash log that do not belong to this case. {}'.format(filepath))
-                            os.remove(filepath)
-                        continue
-                    # 文件名含格式化时间。如：cppcrash-foundation-5523-20251211023957031.log
-                    r2 = re.match(r'\S+-(\d+)\.[a-zA-Z]+$', f)
-                    if r2:
-                        dt = datetime.strptime(r2.group(1)[:-3], '%Y%m%d%H%M%S')
-                        if dt.timestamp() < self._hilog_begin_time:
-                            LOG.debug('remove crash log that do not belong to this case. {}'.format(filepath))
-                            os.remove(filepath)
-                        continue
+                    if not self._is_period_crash_log(f):
+                        LOG.debug('remove crash log that do not belong to this case. {}'.format(filepath))
+                        os.remove(filepath)
             except Exception as e:
                 LOG.warning('remove crash log that do not belong to this case error. {}'.format(e))
         # 删除空文件夹
@@ -1189,6 +1405,23 @@ class DeviceLogCollector:
             except Exception as e:
                 LOG.warning('remove empty dir error. {}'.format(e))
 
+    def _is_period_crash_log(self, file_path):
+        """判断崩溃日志文件是否在用例运行期间产生"""
+        file_name = os.path.basename(file_path)
+        try:
+            # 文件名含unix时间戳。如：cppcrash-1924-1765391997031
+            r1 = re.match(r'\S+-(\d+)$', file_name)
+            if r1:
+                return int(r1.group(1)) / 1000 >= self._hilog_begin_time
+            # 文件名含格式化时间。如：cppcrash-foundation-5523-20251211023957031.log
+            r2 = re.match(r'\S+-(\d+)\.[a-zA-Z]+$', file_name)
+            if r2:
+                dt = datetime.strptime(r2.group(1)[:-3], '%Y%m%d%H%M%S')
+                return dt.timestamp() >= self._hilog_begin_time
+        except Exception as e:
+            LOG.warning('check crash log time error. {}'.format(e))
+        return True
+
     @staticmethod
     def _parse_hilog(log_path, dict_file_name, **kwargs):
         dict_file = os.path.join(log_path, dict_file_name)
@@ -16,14 +16,24 @@
 # limitations under the License.
 #
 
+import fnmatch
+import gzip
+import hashlib
 import os
 import platform
+import select
+import shlex
 import socket
 import struct
 import threading
 import time
 import shutil
 import stat
+import tempfile
+import uuid
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
 from xdevice import ConfigConst
@@ -66,8 +76,17 @@ SOCK_DATA_MAX = 256
 
 INSTALL_TIMEOUT = 2 * 60 * 1000
 DEFAULT_TIMEOUT = 40 * 1000
+POOL_HANDSHAKE_TIMEOUT = 3 * 1000
+POOL_IDLE_TIMEOUT = 30
+POOL_MAX_SIZE = 2
+# an acquire that leaves this many idle channels or fewer refills the pool
+POOL_LOW_WATER = 1
+# initial size of the read buffer of a connection, it grows to the largest read
+READ_BUFFER_SIZE = 4096
 
 MAX_CONNECT_ATTEMPT_COUNT = 10
+MONITOR_MIN_POLL_INTERVAL = 0.1
+MONITOR_MAX_POLL_INTERVAL = 2
 DATA_UNIT_LENGTH = 4
 HEXADECIMAL_NUMBER = 16
 SPECIAL_FILE_MODE = 41471
@@ -79,6 +98,21 @@ DEFAULT_STD_PORT = 8710
 HDC_NAME = "hdc"
 HDC_STD_NAME = "hdc_std"
 HDC_UDS_ADDRESS = "/data/hdc/hdc_debug/hdc_server"
+DEVICE_TEMP_PATH = "/data/local/tmp"
+COMPRESS_MIN_SIZE = 64 * 1024
+COMPRESS_LEVEL = 6
+# files of these types are compressed already, gzip would not shrink them
+COMPRESSED_FILE_SUFFIXES = (
+    ".gz", ".tgz", ".xz", ".bz2", ".zip", ".7z", ".zst", ".hap", ".hsp",
+    ".hqf", ".apk", ".jar", ".png", ".jpg", ".jpeg", ".webp", ".gif",
+    ".mp3", ".mp4", ".ogg")
+# resumable transfers move files in chunks of whole dd blocks
+RESUME_BLOCK_SIZE = 1024 * 1024
+RESUME_CHUNK_SIZE = 8 * RESUME_BLOCK_SIZE
+RESUME_MAX_RETRIES = 3
+PARTIAL_FILE_SUFFIX = ".xdpart"
+# separates the sections of the remote tree listing
+REMOTE_TREE_MARKER = "==xdevice-tree=="
 LOG = platform_logger("Hdc")
 
 
@@ -101,11 +135,15 @@ class HdcMonitor:
         self.monitoring = False
         self.server = device_connector
         self.devices = []
+        self.devices_lock = threading.Lock()
         self.device_sns = device_sns or []
         self.last_msg_len = 0
         self.changed = True
         self.server_thread = None
         self.last_sock_name = None
+        self.devices_changed = False
+        self.poll_interval = MONITOR_MIN_POLL_INTERVAL
+        self.wake_event = threading.Event()
 
     @staticmethod
     def get_instance(host, port=None, device_connector=None, device_sns=None):
@@ -159,7 +197,8 @@ class HdcMonitor:
         if self.main_hdc_connection is not None:
             return
         # set all devices disconnect
-        devices = [item for item in self.devices]
+        with self.devices_lock:
+            devices = [item for item in self.devices]
         devices.reverse()
         for local_device1 in devices:
             local_device1.device_state = DeviceState.OFFLINE
@@ -204,6 +243,7 @@ class HdcMonitor:
                 except (socket.error, socket.gaierror, socket.timeout) as _:
                     LOG.error("HdcMonitor close socket exception")
             HdcMonitor.MONITOR_MAP.clear()
+            HdcConnectionPool.clear_all()
             LOG.debug("HdcMonitor {} monitor stop!".format(HdcHelper.CONNECTOR_NAME))
             LOG.debug("HdcMonitor map is %s" % HdcMonitor.MONITOR_MAP)
 
@@ -223,11 +263,34 @@ class HdcMonitor:
                             self.main_hdc_connection)
 
                 self.list_targets()
-                time.sleep(2)
+                self.wait_next_poll()
             except (HdcError, Exception) as _:
                 self.handle_exception_monitor_loop()
                 time.sleep(2)
 
+    def wait_next_poll(self):
+        """
+        Waits before the next 'list targets'. The interval drops to the
+        minimum right after a change or a wake up, then doubles on every
+        quiet poll up to the maximum.
+        """
+        if self.devices_changed:
+            self.devices_changed = False
+            self.poll_interval = MONITOR_MIN_POLL_INTERVAL
+        else:
+            self.poll_interval = min(self.poll_interval * 2,
+                                     MONITOR_MAX_POLL_INTERVAL)
+        if self.wake_event.wait(self.poll_interval):
+            self.wake_event.clear()
+            self.poll_interval = MONITOR_MIN_POLL_INTERVAL
+
+    def wake_up(self):
+        """
+        Polls the targets right away and keeps polling fast for a while, for
+        callers that expect a device to connect or disconnect soon.
+        """
+        self.wake_event.set()
+
     def handle_exception_monitor_loop(self):
         LOG.debug("Handle exception monitor loop: %s" %
                   self.main_hdc_connection)
@@ -264,28 +327,42 @@ class HdcMonitor:
         return device_instance
 
     def update_devices(self, param_array_list):
-        devices = [item for item in self.devices]
+        """
+        Diffs the targets with the known devices, then swaps in the new
+        device list and states at once under devices_lock, and reports the
+        changes after, so no reader sees a list half updated.
+        """
+        new_devices = {}
+        for new_device in param_array_list:
+            new_devices.setdefault(
+                (new_device.device_sn, new_device.device_os_type), new_device)
+        with self.devices_lock:
+            local_devices = list(self.devices)
+        devices, disconnected, changed = [], [], []
+        for local_device in reversed(local_devices):
+            new_device = new_devices.pop(
+                (local_device.device_sn, local_device.device_os_type), None)
+            if new_device is None:
+                disconnected.append(local_device)
+                continue
+            if local_device.device_state != new_device.device_state:
+                changed.append((local_device, new_device.device_state))
+            devices.append(local_device)
         devices.reverse()
-        for local_device1 in devices:
-            k = 0
-            for local_device2 in param_array_list:
-                if local_device1.device_sn == local_device2.device_sn and \
-                        local_device1.device_os_type == \
-                        local_device2.device_os_type:
-                    k = 1
-                    if local_device1.device_state != \
-                            local_device2.device_state:
-                        local_device1.device_state = local_device2.device_state
-                        self.server.device_changed(local_device1)
-                    param_array_list.remove(local_device2)
-                    break
-
-            if k == 0:
-                self.devices.remove(local_device1)
-                self.server.device_disconnected(local_device1)
-        for local_device in param_array_list:
-            self.devices.append(local_device)
-            self.server.device_connected(local_device)
+        connected = list(new_devices.values())
+        devices.extend(connected)
+        with self.devices_lock:
+            self.devices = devices
+            for local_device, device_state in changed:
+                local_device.device_state = device_state
+        if disconnected or changed or connected:
+            self.devices_changed = True
+        for local_device in disconnected:
+            self.server.device_disconnected(local_device)
+        for local_device, _ in changed:
+            self.server.device_changed(local_device)
+        for new_device in connected:
+            self.server.device_connected(new_device)
 
     def open_hdc_connection(self):
         """
@@ -342,8 +419,8 @@ class HdcMonitor:
             self.server.monitor_lock.acquire(timeout=1)
             try:
                 self.monitoring_list_targets()
-                len_buf = HdcHelper.read(self.main_hdc_connection,
-                                         DATA_UNIT_LENGTH)
+                len_buf = HdcHelper.read_view(self.main_hdc_connection,
+                                              DATA_UNIT_LENGTH)
                 length = struct.unpack("!I", len_buf)[0]
                 if length >= 0:
                     if self.last_msg_len != length:
@@ -378,7 +455,7 @@ class HdcMonitor:
         HdcHelper.write(self.main_hdc_connection, request)
 
     def process_incoming_target_data(self, length):
-        data_buf = HdcHelper.read(self.main_hdc_connection, length)
+        data_buf = HdcHelper.read_view(self.main_hdc_connection, length)
         if not self.is_need_to_handle():
             return
         local_array_list = []
@@ -429,6 +506,173 @@ class HdcResponse:
     message = ""  # diagnostic string if okay is false
 
 
+class HdcConnectionPool:
+    """
+    Pool of idle hdc channels for one device, keyed by (host, port, sn).
+    The hdc server closes a channel when the shell command on it ends, so
+    a channel carries one request. The pool keeps a bounded number of
+    channels connected and handshaken, so a command takes a ready channel
+    instead of paying for connection setup. The pools are refilled by one
+    long-lived thread shared by all of them, a pool asks for a refill when
+    an acquire takes it below its low-water mark.
+    """
+    POOL_MAP = {}
+    LOCK = threading.RLock()
+    # pools waiting for the refill thread
+    REFILL_CONDITION = threading.Condition()
+    REFILL_POOLS = deque()
+    REFILL_THREAD = None
+
+    def __init__(self, host, port, device_sn, max_size=POOL_MAX_SIZE,
+                 idle_timeout=POOL_IDLE_TIMEOUT,
+                 low_water=POOL_LOW_WATER):
+        self.host = host
+        self.port = port
+        self.device_sn = device_sn
+        self.max_size = max_size
+        self.low_water = min(low_water, max_size - 1)
+        self.idle_timeout = idle_timeout
+        self.idle_channels = deque()
+        self.lock = threading.Lock()
+        self.filling = False
+        self.closed = False
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_instance(host, port, device_sn):
+        key = (host, port, device_sn)
+        with HdcConnectionPool.LOCK:
+            if key not in HdcConnectionPool.POOL_MAP:
+                HdcConnectionPool.POOL_MAP[key] = \
+                    HdcConnectionPool(host, port, device_sn)
+            return HdcConnectionPool.POOL_MAP[key]
+
+    @staticmethod
+    def clear_device(host, port, device_sn):
+        with HdcConnectionPool.LOCK:
+            pool = HdcConnectionPool.POOL_MAP.pop((host, port, device_sn), None)
+        if pool is not None:
+            pool.clear()
+
+    @staticmethod
+    def clear_all():
+        with HdcConnectionPool.LOCK:
+            pools = list(HdcConnectionPool.POOL_MAP.values())
+            HdcConnectionPool.POOL_MAP.clear()
+        for pool in pools:
+            pool.clear()
+
+    def acquire(self, timeout=None):
+        """
+        Returns a handshaken channel, taken from the pool when a healthy
+        one is idle, or opened on demand otherwise.
+        """
+        sock = None
+        with self.lock:
+            while self.idle_channels:
+                channel, created_time = self.idle_channels.popleft()
+                if self._is_healthy(channel, created_time):
+                    sock = channel
+                    break
+                self._close_channel(channel)
+            if sock is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if sock is None:
+            sock = self._open_channel()
+        if timeout is not None:
+            sock.settimeout(timeout / 1000)
+        self._start_fill()
+        return sock
+
+    def clear(self):
+        with self.lock:
+            self.closed = True
+            while self.idle_channels:
+                channel, _ = self.idle_channels.popleft()
+                self._close_channel(channel)
+
+    def _is_healthy(self, sock, created_time):
+        if time.time() - created_time > self.idle_timeout:
+            return False
+        try:
+            # an idle channel must not be readable, otherwise the server
+            # has sent EOF or unexpected data on it
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError) as _:
+            return False
+        return not readable
+
+    def _open_channel(self):
+        sock = HdcHelper.socket(host=self.host, port=self.port,
+                                timeout=POOL_HANDSHAKE_TIMEOUT)
+        try:
+            HdcHelper.handle_shake(sock, self.device_sn)
+        except Exception as error:
+            self._close_channel(sock)
+            raise error
+        return sock
+
+    def _start_fill(self):
+        with self.lock:
+            if self.closed or self.filling or \
+                    len(self.idle_channels) > self.low_water:
+                return
+            self.filling = True
+        with HdcConnectionPool.REFILL_CONDITION:
+            HdcConnectionPool.REFILL_POOLS.append(self)
+            thread = HdcConnectionPool.REFILL_THREAD
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(
+                    target=HdcConnectionPool._refill_pools,
+                    name="HdcConnectionPool")
+                thread.daemon = True
+                HdcConnectionPool.REFILL_THREAD = thread
+                thread.start()
+            HdcConnectionPool.REFILL_CONDITION.notify()
+
+    @staticmethod
+    def _refill_pools():
+        while True:
+            with HdcConnectionPool.REFILL_CONDITION:
+                while not HdcConnectionPool.REFILL_POOLS:
+                    HdcConnectionPool.REFILL_CONDITION.wait()
+                pool = HdcConnectionPool.REFILL_POOLS.popleft()
+            pool._fill()
+
+    def _fill(self):
+        try:
+            while True:
+                with self.lock:
+                    if len(self.idle_channels) >= self.max_size:
+                        return
+                try:
+                    sock = self._open_channel()
+                except Exception as error:
+                    LOG.debug("HdcConnectionPool prepare channel for %s "
+                              "failed: %s" % (convert_serial(self.device_sn),
+                                              error))
+                    return
+                sock.settimeout(None)
+                with self.lock:
+                    if self.closed:
+                        self._close_channel(sock)
+                        return
+                    self.idle_channels.append((sock, time.time()))
+        finally:
+            with self.lock:
+                self.filling = False
+
+    @staticmethod
+    def _close_channel(sock):
+        try:
+            sock.close()
+        except socket.error as _:
+            pass
+
+
 class SyncService:
     """
     Sync service class to push/pull to/from devices/emulators,
@@ -440,6 +684,9 @@ class SyncService:
         self.host = host
         self.port = port
         self.sock = None
+        # resumable transfer metrics
+        self.retry_count = 0
+        self.resumed_size = 0
 
     def open_sync(self, timeout=DEFAULT_TIMEOUT):
         """
@@ -474,13 +721,16 @@ class SyncService:
             finally:
                 self.sock = None
 
-    def pull_file(self, remote, local, is_create=False):
+    def pull_file(self, remote, local, is_create=False, compress=False,
+                  resumable=False, **kwargs):
         """
         Pulls a file.
         The top directory won't be created if is_create is False (by default)
-        and vice versa
+        and vice versa. With compress, files worth it are gzipped on the
+        device before the transfer. With resumable, a file is pulled in
+        verified chunks and a retry continues from the last good chunk.
         """
-        mode = self.read_mode(remote)
+        mode, size = self.read_stat(remote)
         self.device.log.debug("Remote file %s mode is %d" % (remote, mode))
         if mode == 0:
             raise HdcError(ErrorMessage.Device.Code_0303003.format(remote))
@@ -494,21 +744,82 @@ class SyncService:
                 create_dir(new_local)
             else:
                 new_local = local
-
-            collect_receiver = CollectingOutputReceiver()
-            HdcHelper.execute_shell_command(self.device, "ls %s" % remote,
-                                            receiver=collect_receiver)
-            files = collect_receiver.output.split()
-            for file_name in files:
-                self.pull_file("%s/%s" % (remote, file_name),
-                               new_local, is_create=True)
+            self.pull_dir(remote, new_local, compress=compress, **kwargs)
         elif mode == SPECIAL_FILE_MODE:
             self.device.log.info("skipping special file '%s'" % remote)
         else:
             if os.path.isdir(local):
                 local = os.path.join(local, os.path.basename(remote))
 
-            self.do_pull_file(remote, local)
+            if resumable:
+                self.do_pull_file_resumable(remote, local)
+            elif compress and is_compressible(remote, size):
+                self.do_pull_file_compressed(remote, local)
+            else:
+                self.do_pull_file(remote, local)
+
+    def pull_dir(self, remote, local, includes=None, excludes=None,
+                 file_filter=None, max_workers=1, compress=False):
+        """
+        Pulls the files under a remote directory into local, keeping the
+        directory layout, the empty directories and the symbolic links. The
+        tree is listed with one remote command and the files are pulled over
+        this sync session, or over max_workers sessions when more than one
+        worker is asked for.
+        Return False if nothing could be listed under the remote directory.
+
+        Args:
+        ------------
+        includes : list
+            glob patterns, only files whose path relative to remote matches
+            one of them are pulled
+        excludes : list
+            glob patterns, files whose relative path matches one of them
+            are not pulled
+        file_filter : callable
+            called with the remote file path, the file is pulled only if it
+            returns True
+        compress : bool
+            gzip the files worth it on the device before pulling them
+        """
+        entries = select_pull_entries(self.device, remote, local, includes,
+                                      excludes, file_filter)
+        if entries is None:
+            return False
+        files, links = entries
+        self.device.log.debug("Pull %s files and %s links under %s" % (
+            len(files), len(links), remote))
+        for target, local_link in links:
+            create_local_link(target, local_link)
+
+        workers = min(max_workers, len(files))
+        if workers <= 1:
+            self._pull_files(files, compress)
+            return True
+        with ThreadPoolExecutor(workers) as executor:
+            futures = [executor.submit(self._pull_files_in_session,
+                                       files[index::workers], compress)
+                       for index in range(workers)]
+            for future in futures:
+                future.result()
+        return True
+
+    def _pull_files(self, files, compress=False):
+        for remote_file, local_file in files:
+            if compress:
+                _, size = self.read_stat(remote_file)
+                if is_compressible(remote_file, size):
+                    self.do_pull_file_compressed(remote_file, local_file)
+                    continue
+            self.do_pull_file(remote_file, local_file)
+
+    def _pull_files_in_session(self, files, compress=False):
+        sync_service = SyncService(self.device, self.host, self.port)
+        try:
+            sync_service.open_sync()
+            sync_service._pull_files(files, compress)
+        finally:
+            sync_service.close()
 
     def do_pull_file(self, remote, local):
         """
@@ -558,11 +869,11 @@ class SyncService:
                 if length > SYNC_DATA_MAX:
                     raise HdcError(ErrorMessage.Hdc.Code_0304004)
 
-                pulled_file.write(HdcHelper.read(self.sock, length))
+                pulled_file.write(HdcHelper.read_view(self.sock, length))
                 pulled_file.flush()
                 pull_result = self.sock.recv(DATA_UNIT_LENGTH * 2)
 
-    def push_file(self, local, remote, is_create=False):
+    def push_file(self, local, remote, is_create=False, **kwargs):
         """
         Push a single file.
         The top directory won't be created if is_create is False (by default)
@@ -586,13 +897,24 @@ class SyncService:
                 if os.path.isdir(file_path):
                     self.push_file(
                         file_path, "%s/%s" % (remote, child),
-                        is_create=False)
+                        is_create=False, **kwargs)
                 else:
-                    self.do_push_file(file_path, "%s/%s" % (remote, child))
+                    self._push_one_file(file_path, "%s/%s" % (remote, child),
+                                        **kwargs)
         else:
-            self.do_push_file(local, remote)
+            self._push_one_file(local, remote, **kwargs)
+
+    def _push_one_file(self, local, remote, compress=False, resumable=False,
+                       **kwargs):
+        if resumable:
+            self.do_push_file_resumable(local, remote, **kwargs)
+        elif compress and is_compressible(local, os.path.getsize(local)):
+            self.do_push_file_compressed(local, remote, **kwargs)
+        else:
+            self.do_push_file(local, remote, **kwargs)
 
-    def do_push_file(self, local, remote):
+    def do_push_file(self, local, remote, progress_callback=None,
+                     throughput_callback=None):
         """
         Push a single file
 
@@ -602,6 +924,12 @@ class SyncService:
             the local file to push
         remote : string
             the remote file (length max is 1024)
+        progress_callback : callable
+            called as progress_callback(pushed_size, total_size) after
+            each data frame
+        throughput_callback : callable
+            called as throughput_callback(total_size, cost_time) once the
+            device has acknowledged the file, cost_time in seconds
         """
         mode = self.read_mode(remote)
         self.device.log.debug("Remote file %s mode is %d" % (remote, mode))
@@ -610,6 +938,8 @@ class SyncService:
         if str(mode).startswith("168"):
             remote = "%s/%s" % (remote, os.path.basename(local))
 
+        start_time = time.time()
+        total_size = os.path.getsize(local)
         try:
             try:
                 remote_path_content = remote.encode(DEFAULT_ENCODING)
@@ -627,21 +957,23 @@ class SyncService:
             HdcHelper.write(self.sock, msg)
             flags = os.O_RDONLY
             modes = stat.S_IWUSR | stat.S_IRUSR
+            # one data frame is reused for the whole file: 4 bytes id,
+            # 4 bytes length and up to SYNC_DATA_MAX bytes of payload
+            header = bytearray(ID_DATA + bytes(FORMAT_BYTES_LENGTH))
+            data = bytearray(SYNC_DATA_MAX)
+            data_view = memoryview(data)
+            pushed_size = 0
             with os.fdopen(os.open(local, flags, modes), "rb") as test_file:
                 while True:
-                    if platform.system() == "Windows":
-                        data = test_file.read(SYNC_DATA_MAX)
-                    else:
-                        data = test_file.read(1024 * 4)
-
-                    if not data:
+                    size = test_file.readinto(data)
+                    if not size:
                         break
 
-                    buf = struct.pack(
-                        "%ds%ds%ds" % (len(ID_DATA), FORMAT_BYTES_LENGTH,
-                                       len(data)), ID_DATA,
-                        self.swap32bits_to_bytes(len(data)), data)
-                    self.sock.send(buf)
+                    header[len(ID_DATA):] = self.swap32bits_to_bytes(size)
+                    self.send_frame(header, data_view[:size])
+                    pushed_size += size
+                    if progress_callback:
+                        progress_callback(pushed_size, total_size)
         except Exception as exception:
             self.device.log.error("exception %s" % exception)
             raise exception
@@ -653,20 +985,316 @@ class SyncService:
             self.device.log.error("exception %s" % result)
             raise HdcError(self.read_error_message(result))
 
+        cost_time = time.time() - start_time
+        self.device.log.debug("Push %s bytes in %.3fs" % (total_size, cost_time))
+        if throughput_callback:
+            throughput_callback(total_size, cost_time)
+
+    def do_push_file_compressed(self, local, remote, throughput_callback=None,
+                                **kwargs):
+        """
+        Pushes a gzip copy of the local file and unpacks it on the device,
+        falling back to a plain push if the device cannot unpack it.
+        """
+        if str(self.read_mode(remote)).startswith("168"):
+            remote = "%s/%s" % (remote, os.path.basename(local))
+        start_time = time.time()
+        total_size = os.path.getsize(local)
+        remote_gz = "%s.gz" % remote
+        with tempfile.TemporaryDirectory() as temp_dir:
+            local_gz = os.path.join(temp_dir, "%s.gz" % os.path.basename(local))
+            with open(local, "rb") as src_file, gzip.open(
+                    local_gz, "wb", compresslevel=COMPRESS_LEVEL) as gz_file:
+                shutil.copyfileobj(src_file, gz_file, SYNC_DATA_MAX)
+            compressed_size = os.path.getsize(local_gz)
+            self.do_push_file(local_gz, remote_gz, **kwargs)
+        if not self._run_remote_command("gzip -d -f '%s'" % remote_gz):
+            self.device.log.debug("Unpack %s failed on device, push it "
+                                  "uncompressed" % remote_gz)
+            self._run_remote_command("rm -f '%s'" % remote_gz)
+            self.do_push_file(local, remote,
+                              throughput_callback=throughput_callback,
+                              **kwargs)
+            return
+        self._report_compressed_transfer(
+            "Push", local, total_size, compressed_size, start_time,
+            throughput_callback)
+
+    def do_pull_file_compressed(self, remote, local, throughput_callback=None):
+        """
+        Gzips the remote file into a device temp file, pulls that and unpacks
+        it locally, falling back to a plain pull if the device cannot gzip.
+        """
+        start_time = time.time()
+        remote_gz = "%s/%s.gz" % (DEVICE_TEMP_PATH, uuid.uuid4().hex)
+        try:
+            if not self._run_remote_command(
+                    "gzip -c '%s' > '%s'" % (remote, remote_gz)):
+                self.device.log.debug("Gzip %s failed on device, pull it "
+                                      "uncompressed" % remote)
+                self.do_pull_file(remote, local)
+                return
+            with tempfile.TemporaryDirectory() as temp_dir:
+                local_gz = os.path.join(temp_dir, os.path.basename(remote_gz))
+                self.do_pull_file(remote_gz, local_gz)
+                compressed_size = os.path.getsize(local_gz)
+                with gzip.open(local_gz, "rb") as gz_file, \
+                        open(local, "wb") as dst_file:
+                    shutil.copyfileobj(gz_file, dst_file, SYNC_DATA_MAX)
+        finally:
+            self._run_remote_command("rm -f '%s'" % remote_gz)
+        self._report_compressed_transfer(
+            "Pull", remote, os.path.getsize(local), compressed_size,
+            start_time, throughput_callback)
+
+    def do_push_file_resumable(self, local, remote, progress_callback=None,
+                               throughput_callback=None,
+                               max_retries=RESUME_MAX_RETRIES):
+        """
+        Pushes a file in chunks appended to a partial file on the device.
+        Each chunk is checked with md5 before it is appended and the whole
+        file before the partial file is renamed to remote. The partial file
+        is the checkpoint: a failed chunk is retried on a new sync session,
+        and a later push of the same file, such as a retry of the device
+        action, continues after the chunks already on the device.
+        """
+        if str(self.read_mode(remote)).startswith("168"):
+            remote = "%s/%s" % (remote, os.path.basename(local))
+        total_size = os.path.getsize(local)
+        if total_size == 0:
+            self.do_push_file(local, remote)
+            return
+        start_time = time.time()
+        partial = "%s%s" % (remote, PARTIAL_FILE_SUFFIX)
+        retries = 0
+        while True:
+            try:
+                offset = self._get_push_offset(local, partial, total_size)
+                self._push_chunks(local, partial, offset, total_size,
+                                  progress_callback)
+                break
+            except (OSError, HdcError) as error:
+                if retries >= max_retries:
+                    raise error
+                retries += 1
+                self.retry_count += 1
+                self.device.log.debug("Push %s failed: %s, retry %s" % (
+                    local, error, retries))
+                self._reopen_sync()
+
+        if self._remote_md5(partial) != _local_md5(local):
+            self._run_remote_command("rm -f '%s'" % partial)
+            raise HdcError(ErrorMessage.Hdc.Code_0304009.format(remote))
+        if not self._run_remote_command("mv -f '%s' '%s'" % (partial, remote)):
+            raise HdcError(ErrorMessage.Hdc.Code_0304008.format(
+                "rename %s failed" % partial))
+        cost_time = time.time() - start_time
+        self.device.log.debug(
+            "Push %s bytes in %.3fs, retries: %s, resumed bytes: %s" % (
+                total_size, cost_time, self.retry_count, self.resumed_size))
+        if throughput_callback:
+            throughput_callback(total_size, cost_time)
+
+    def _get_push_offset(self, local, partial, total_size):
+        mode, size = self.read_stat(partial)
+        if mode in (0, INVALID_MODE_CODE) or size == 0:
+            return 0
+        if size > total_size or (size % RESUME_CHUNK_SIZE and
+                                 size != total_size) or \
+                self._remote_md5(partial) != _local_md5(local, size):
+            self.device.log.debug("Discard partial file %s" % partial)
+            self._run_remote_command("rm -f '%s'" % partial)
+            return 0
+        self.device.log.debug("Resume push to %s at %s" % (partial, size))
+        self.resumed_size += size
+        return size
+
+    def _push_chunks(self, local, partial, offset, total_size,
+                     progress_callback=None):
+        chunk_remote = "%s.chunk" % partial
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                open(local, "rb") as local_file:
+            chunk_local = os.path.join(temp_dir, "chunk")
+            local_file.seek(offset)
+            while offset < total_size:
+                data = local_file.read(RESUME_CHUNK_SIZE)
+                with open(chunk_local, "wb") as chunk_file:
+                    chunk_file.write(data)
+                self.do_push_file(chunk_local, chunk_remote)
+                if self._remote_md5(chunk_remote) != \
+                        hashlib.md5(data).hexdigest():
+                    raise HdcError(ErrorMessage.Hdc.Code_0304009.format(
+                        "%s at %s" % (chunk_remote, offset)))
+                if not self._run_remote_command(
+                        "cat '%s' >> '%s' && rm -f '%s'" % (
+                            chunk_remote, partial, chunk_remote)):
+                    raise HdcError(ErrorMessage.Hdc.Code_0304008.format(
+                        "append to %s failed" % partial))
+                offset += len(data)
+                if progress_callback:
+                    progress_callback(offset, total_size)
+
+    def do_pull_file_resumable(self, remote, local, throughput_callback=None,
+                               max_retries=RESUME_MAX_RETRIES):
+        """
+        Pulls a file in chunks cut on the device with dd and appended to a
+        local partial file once their md5 is checked. The whole file is
+        checked before the partial file is renamed to local. A failed chunk
+        is retried on a new sync session, and a later pull of the same file
+        continues after the chunks already in the partial file.
+        """
+        _, total_size = self.read_stat(remote)
+        remote_digest = self._remote_md5(remote)
+        if remote_digest is None:
+            self.device.log.debug("Md5 of %s unavailable, pull it in one "
+                                  "piece" % remote)
+            self.do_pull_file(remote, local)
+            return
+        start_time = time.time()
+        partial = "%s%s" % (local, PARTIAL_FILE_SUFFIX)
+        retries = 0
+        while True:
+            try:
+                offset = self._get_pull_offset(partial)
+                self._pull_chunks(remote, partial, offset, total_size)
+                break
+            except (OSError, HdcError) as error:
+                if retries >= max_retries:
+                    raise error
+                retries += 1
+                self.retry_count += 1
+                self.device.log.debug("Pull %s failed: %s, retry %s" % (
+                    remote, error, retries))
+                self._reopen_sync()
+
+        if _local_md5(partial) != remote_digest:
+            os.remove(partial)
+            raise HdcError(ErrorMessage.Hdc.Code_0304009.format(local))
+        os.replace(partial, local)
+        cost_time = time.time() - start_time
+        self.device.log.debug(
+            "Pull %s bytes in %.3fs, retries: %s, resumed bytes: %s" % (
+                total_size, cost_time, self.retry_count, self.resumed_size))
+        if throughput_callback:
+            throughput_callback(total_size, cost_time)
+
+    def _get_pull_offset(self, partial):
+        if not os.path.exists(partial):
+            with open(partial, "wb"):
+                return 0
+        size = os.path.getsize(partial)
+        # drop a chunk that was only partly written
+        offset = size - size % RESUME_CHUNK_SIZE
+        if offset != size:
+            with open(partial, "r+b") as partial_file:
+                partial_file.truncate(offset)
+        if offset:
+            self.device.log.debug("Resume pull to %s at %s" % (partial, offset))
+            self.resumed_size += offset
+        return offset
+
+    def _pull_chunks(self, remote, partial, offset, total_size):
+        chunk_remote = "%s/%s.chunk" % (DEVICE_TEMP_PATH, uuid.uuid4().hex)
+        blocks = RESUME_CHUNK_SIZE // RESUME_BLOCK_SIZE
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                chunk_local = os.path.join(temp_dir, "chunk")
+                while offset < total_size:
+                    if not self._run_remote_command(
+                            "dd if='%s' of='%s' bs=%s skip=%s count=%s "
+                            "2>/dev/null" % (
+                                remote, chunk_remote, RESUME_BLOCK_SIZE,
+                                offset // RESUME_BLOCK_SIZE, blocks)):
+                        raise HdcError(ErrorMessage.Hdc.Code_0304008.format(
+                            "cut %s at %s failed" % (remote, offset)))
+                    chunk_digest = self._remote_md5(chunk_remote)
+                    if os.path.exists(chunk_local):
+                        os.remove(chunk_local)
+                    self.do_pull_file(chunk_remote, chunk_local)
+                    if _local_md5(chunk_local) != chunk_digest:
+                        raise HdcError(ErrorMessage.Hdc.Code_0304009.format(
+                            "%s at %s" % (chunk_local, offset)))
+                    with open(chunk_local, "rb") as chunk_file, \
+                            open(partial, "ab") as partial_file:
+                        shutil.copyfileobj(chunk_file, partial_file,
+                                           SYNC_DATA_MAX)
+                    offset += os.path.getsize(chunk_local)
+        finally:
+            self._run_remote_command("rm -f '%s'" % chunk_remote)
+
+    def _remote_md5(self, remote):
+        receiver = CollectingOutputReceiver()
+        HdcHelper.execute_shell_command(
+            self.device, "md5sum '%s' 2>/dev/null" % remote,
+            receiver=receiver, output_flag=False)
+        items = receiver.output.strip().split()
+        return items[0].lower() if items else None
+
+    def _reopen_sync(self):
+        self.close()
+        self.open_sync()
+
+    def _run_remote_command(self, command):
+        receiver = CollectingOutputReceiver()
+        HdcHelper.execute_shell_command(
+            self.device, "%s; echo $?" % command, receiver=receiver,
+            output_flag=False)
+        lines = receiver.output.strip().split("\n")
+        return lines[-1].strip() == "0"
+
+    def _report_compressed_transfer(self, action, path, total_size,
+                                    compressed_size, start_time,
+                                    throughput_callback):
+        cost_time = time.time() - start_time
+        ratio = compressed_size / total_size if total_size else 1
+        self.device.log.debug(
+            "%s %s compressed, %s bytes as %s bytes (ratio %.2f) in %.3fs, "
+            "effective throughput %.2f KB/s" % (
+                action, path, total_size, compressed_size, ratio, cost_time,
+                total_size / max(cost_time, 0.001) / 1024))
+        if throughput_callback:
+            throughput_callback(total_size, cost_time)
+
+    def send_frame(self, header, payload):
+        """
+        Sends a frame header and its payload without joining them, retrying
+        partial writes until the whole frame is on the wire.
+        """
+        if not hasattr(self.sock, "sendmsg"):
+            self.sock.sendall(header)
+            self.sock.sendall(payload)
+            return
+        header_len = len(header)
+        sent_len = self.sock.sendmsg([header, payload])
+        if sent_len < header_len:
+            self.sock.sendall(memoryview(header)[sent_len:])
+            sent_len = header_len
+        if sent_len - header_len < len(payload):
+            self.sock.sendall(payload[sent_len - header_len:])
+
     def read_mode(self, path):
         """
         Returns the mode of the remote file.
         Return an Integer containing the mode if all went well or null
         """
+        return self.read_stat(path)[0]
+
+    def read_stat(self, path):
+        """
+        Returns the mode and the size of the remote file, the mode is
+        INVALID_MODE_CODE if the stat request fails.
+        """
         msg = self.create_file_req(ID_STAT, path)
         HdcHelper.write(self.sock, msg)
 
         # read the result, in a byte array containing 4 ints
         stat_result = HdcHelper.read(self.sock, DATA_UNIT_LENGTH * 4)
         if not self.check_result(stat_result, ID_STAT):
-            return INVALID_MODE_CODE
+            return INVALID_MODE_CODE, 0
 
-        return self.swap32bit_from_array(stat_result, DEFAULT_OFFSET_OF_INT)
+        return (self.swap32bit_from_array(stat_result, DEFAULT_OFFSET_OF_INT),
+                self.swap32bit_from_array(stat_result,
+                                          DEFAULT_OFFSET_OF_INT * 2))
 
     def create_file_req(self, command, path):
         """
@@ -792,6 +1420,9 @@ class SyncService:
 
 class HdcHelper:
     CONNECTOR_NAME = ""
+    # read buffer of each connection, kept while the socket lives
+    READ_BUFFERS = weakref.WeakKeyDictionary()
+    READ_BUFFERS_LOCK = threading.Lock()
 
     @staticmethod
     def check_if_hdc_running(timeout=30):
@@ -877,13 +1508,16 @@ class HdcHelper:
             max time between command output. If more time passes between
             command output, the method will throw
             ShellCommandUnresponsiveException (ms).
+        use_pool : bool
+            take a handshaken channel from the device's HdcConnectionPool
+            instead of opening a new one.
         """
         try:
             if not timeout:
                 timeout = DEFAULT_TIMEOUT
 
-            with HdcHelper.socket(host=device.host, port=device.port,
-                                  timeout=timeout) as sock:
+            with HdcHelper.shell_socket(device, timeout,
+                                        kwargs.get("use_pool", False)) as sock:
                 output_flag = kwargs.get("output_flag", True)
                 timeout_msg = " with timeout %ss" % str(timeout / 1000)
                 message = "{} execute command: {} shell {}{}".format(convert_serial(device.device_sn),
@@ -894,21 +1528,17 @@ class HdcHelper:
                 else:
                     LOG.debug(message)
                 from xdevice import Binder
-                HdcHelper.handle_shake(sock, device.device_sn)
                 request = HdcHelper.form_hdc_request("shell {}".format(command))
                 HdcHelper.write(sock, request)
                 resp = HdcResponse()
                 resp.okay = True
                 while True:
-                    len_buf = HdcHelper.read(sock, DATA_UNIT_LENGTH)
+                    len_buf = HdcHelper.read_view(sock, DATA_UNIT_LENGTH)
                     if len_buf:
                         length = struct.unpack("!I", len_buf)[0]
                     else:
                         break
-                    data = sock.recv(length)
-                    recv_length = len(data)
-                    if recv_length < length:
-                        data += HdcHelper.read(sock, length - recv_length)
+                    data = HdcHelper.read_view(sock, length)
                     ret = HdcHelper.reply_to_string(data)
                     if ret:
                         if receiver:
@@ -927,6 +1557,60 @@ class HdcHelper:
             if receiver:
                 receiver.__done__()
 
+    @staticmethod
+    def list_remote_tree(device, remote):
+        """
+        Lists the directories, regular files and symbolic links under a
+        remote directory, recursively, with one shell command.
+        Return (dirs, files, links), links are (path, target) pairs.
+        """
+        remote = remote.rstrip("/")
+        command = "find {0} -mindepth 1 -type d; echo {1}; " \
+                  "find {0} -type f; echo {1}; " \
+                  "find {0} -type l -exec ls -ld {{}} +".format(
+                      shlex.quote(remote), REMOTE_TREE_MARKER)
+        receiver = CollectingOutputReceiver()
+        HdcHelper.execute_shell_command(device, command, receiver=receiver,
+                                        output_flag=False)
+        prefix = "%s/" % remote
+        sections = [[]]
+        for line in receiver.output.split("\n"):
+            line = line.strip()
+            if line == REMOTE_TREE_MARKER:
+                sections.append([])
+            elif line:
+                sections[-1].append(line)
+        sections.extend([] for _ in range(3 - len(sections)))
+        dirs = [line for line in sections[0] if line.startswith(prefix)]
+        files = [line for line in sections[1] if line.startswith(prefix)]
+        links = []
+        for line in sections[2]:
+            # lrwxrwxrwx 1 root root 7 2023-01-01 00:00 /path -> target
+            start = line.find(" %s" % prefix)
+            if start < 0 or " -> " not in line[start:]:
+                continue
+            path, target = line[start + 1:].split(" -> ", 1)
+            links.append((path, target))
+        return dirs, files, links
+
+    @staticmethod
+    def shell_socket(device, timeout, use_pool=False):
+        """
+        Returns a handshaken channel to the device, ready for a request.
+        """
+        if use_pool:
+            pool = HdcConnectionPool.get_instance(
+                device.host, device.port, device.device_sn)
+            return pool.acquire(timeout=timeout)
+        sock = HdcHelper.socket(host=device.host, port=device.port,
+                                timeout=timeout)
+        try:
+            HdcHelper.handle_shake(sock, device.device_sn)
+        except Exception as error:
+            sock.close()
+            raise error
+        return sock
+
     @staticmethod
     def set_device(device, sock):
         """
@@ -993,47 +1677,73 @@ class HdcHelper:
         elif isinstance(req, list):
             req = bytes(req)
 
-        start_time = time.time()
-        while req:
-            if time.time() - start_time > timeout:
+        view = memoryview(req)
+        sent_len = 0
+        deadline = time.time() + timeout
+        while sent_len < len(view):
+            if time.time() > deadline:
                 LOG.debug("Socket write timeout, timeout:%ss" % timeout)
                 break
 
-            size = sock.send(req)
+            size = sock.send(view[sent_len:])
             if size < 0:
                 raise DeviceError(ErrorMessage.Device.Code_0303017)
-
-            req = req[size:]
-            time.sleep(5 / 1000)
+            sent_len += size
 
     @staticmethod
     def read(sock, length, timeout=10):
-        data = b''
+        """
+        Reads length bytes like read_view, into bytes the caller may keep.
+        """
+        return bytes(HdcHelper.read_view(sock, length, timeout))
+
+    @staticmethod
+    def read_view(sock, length, timeout=10):
+        """
+        Reads up to length bytes into the read buffer of the connection and
+        returns a memoryview of what was received. The buffer is reused by
+        the next read on the socket, so the view must be consumed before.
+        """
+        with HdcHelper.READ_BUFFERS_LOCK:
+            buf = HdcHelper.READ_BUFFERS.get(sock)
+            if buf is None or len(buf) < length:
+                # a new buffer, the old one may still be viewed by a caller
+                buf = bytearray(max(length, READ_BUFFER_SIZE))
+                HdcHelper.READ_BUFFERS[sock] = buf
+        view = memoryview(buf)[:length]
+        recv_len = HdcHelper.read_into(sock, view, timeout)
+        return view[:recv_len]
+
+    @staticmethod
+    def read_into(sock, view, timeout=10):
+        """
+        Reads from the socket until the buffer view is full, the peer closes
+        the connection or the timeout (s) expires. Waiting for data is left
+        to the socket itself, so data is consumed as soon as it arrives.
+        Return the number of bytes received.
+        """
+        length = len(view)
         recv_len = 0
-        start_time = time.time()
+        deadline = time.time() + timeout
         exc_num = 3
-        while length - recv_len > 0:
-            if time.time() - start_time > timeout:
+        while recv_len < length:
+            if time.time() > deadline:
                 LOG.debug("Socket read timeout, timout:%ss" % timeout)
                 break
             try:
-                recv = sock.recv(length - recv_len)
-                if len(recv) > 0:
-                    time.sleep(5 / 1000)
-                else:
-                    break
+                size = sock.recv_into(view[recv_len:], length - recv_len)
             except ConnectionResetError as error:
                 if exc_num <= 0:
                     raise error
                 exc_num = exc_num - 1
-                recv = b''
                 time.sleep(1)
                 LOG.debug("ConnectionResetError occurs")
+                continue
+            if size == 0:
+                break
+            recv_len += size
 
-            data += recv
-            recv_len += len(recv)
-
-        return data
+        return recv_len
 
     @staticmethod
     def is_okay(reply):
@@ -1170,6 +1880,8 @@ class DeviceConnector(object):
                   "device sn %s" % (self.host, self.port, device.device_sn))
         if device.host != self.host or device.port != self.port:
             LOG.debug("DeviceConnector device error")
+        HdcConnectionPool.clear_device(device.host, device.port,
+                                       device.device_sn)
         for listener in self.device_listeners:
             listener.device_disconnected(device)
 
@@ -1183,11 +1895,68 @@ class DeviceConnector(object):
 
 
 class CollectingOutputReceiver(IShellReceiver):
-    def __init__(self):
-        self.output = ""
+    """
+    Collects shell output as a list of chunks that is joined on demand, so
+    collecting takes linear time in the output size. When max_memory
+    (characters) is set, the output is spilled to a temporary file once it
+    grows past the cap.
+    """
+    def __init__(self, max_memory=None):
+        self.max_memory = max_memory
+        self._chunks = []
+        self._memory_size = 0
+        self._joined = None
+        self._spill_file = None
+
+    @property
+    def output(self):
+        if self._joined is None:
+            self._joined = "".join(self._iter_chunks())
+            if self._spill_file is None:
+                self._chunks = [self._joined] if self._joined else []
+        return self._joined
 
     def __read__(self, output):
-        self.output = "%s%s" % (self.output, output)
+        if not output:
+            return
+        self._joined = None
+        if self._spill_file is not None:
+            self._spill_file.write(output)
+            return
+        self._chunks.append(output)
+        self._memory_size += len(output)
+        if self.max_memory and self._memory_size > self.max_memory:
+            self._spill()
+
+    def close(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        self._chunks = []
+        self._memory_size = 0
+        self._joined = None
+
+    def _spill(self):
+        self._spill_file = tempfile.TemporaryFile(
+            mode="w+", encoding=DEFAULT_ENCODING, errors="replace",
+            prefix="xdevice_shell_")
+        for chunk in self._chunks:
+            self._spill_file.write(chunk)
+        self._chunks = []
+        self._memory_size = 0
+
+    def _iter_chunks(self):
+        if self._spill_file is not None:
+            self._spill_file.flush()
+            self._spill_file.seek(0)
+            while True:
+                chunk = self._spill_file.read(SYNC_DATA_MAX)
+                if not chunk:
+                    break
+                yield chunk
+            self._spill_file.seek(0, os.SEEK_END)
+            return
+        yield from list(self._chunks)
 
     def __error__(self, message):
         pass
@@ -1196,9 +1965,9 @@ class CollectingOutputReceiver(IShellReceiver):
         pass
 
 
-class DisplayOutputReceiver(IShellReceiver):
-    def __init__(self):
-        self.output = ""
+class DisplayOutputReceiver(CollectingOutputReceiver):
+    def __init__(self, max_memory=None):
+        super().__init__(max_memory)
         self.unfinished_line = ""
 
     def _process_output(self, output, end_mark="\n"):
@@ -1217,18 +1986,107 @@ class DisplayOutputReceiver(IShellReceiver):
             return lines[:-1]
 
     def __read__(self, output):
-        self.output = "%s%s" % (self.output, output)
+        super().__read__(output)
         lines = self._process_output(output)
         for line in lines:
             line = line.strip()
             if line:
                 LOG.info(line)
 
-    def __error__(self, message):
-        pass
 
-    def __done__(self, result_code="", message=""):
-        pass
+def match_file_patterns(path, includes=None, excludes=None):
+    """
+    Checks a relative file path against include and exclude glob patterns.
+    A path matches when it matches any include pattern (or there is none)
+    and no exclude pattern.
+    """
+    if includes and not any(fnmatch.fnmatch(path, pattern)
+                            for pattern in includes):
+        return False
+    if excludes and any(fnmatch.fnmatch(path, pattern)
+                        for pattern in excludes):
+        return False
+    return True
+
+
+def select_pull_entries(device, remote, local, includes=None, excludes=None,
+                        file_filter=None):
+    """
+    Lists the tree under a remote directory and selects what a pull of it
+    into local takes: creates the local directories, and returns the
+    (remote, local) pairs of the files and the (target, local) pairs of the
+    symbolic links. Directories are kept when they match the patterns, files
+    and links when they also pass file_filter.
+    Return None when nothing is listed under the remote directory.
+    """
+    remote = remote.rstrip("/")
+    dirs, files, links = HdcHelper.list_remote_tree(device, remote)
+    if not dirs and not files and not links:
+        return None
+
+    def get_relative_path(path):
+        return path[len(remote):].lstrip("/")
+
+    def is_selected(path):
+        return match_file_patterns(get_relative_path(path), includes,
+                                   excludes) and \
+            (not file_filter or file_filter(path))
+
+    local_dirs = set()
+    for remote_dir in dirs:
+        relative_path = get_relative_path(remote_dir)
+        if match_file_patterns(relative_path, includes, excludes):
+            local_dirs.add(os.path.join(local, relative_path))
+    pull_files = [(remote_file, os.path.join(
+        local, get_relative_path(remote_file)))
+        for remote_file in files if is_selected(remote_file)]
+    pull_links = [(target, os.path.join(local, get_relative_path(path)))
+                  for path, target in links if is_selected(path)]
+    for _, local_path in pull_files + pull_links:
+        local_dirs.add(os.path.dirname(local_path))
+    for local_dir in local_dirs:
+        create_dir(local_dir)
+    return pull_files, pull_links
+
+
+def create_local_link(target, local_link):
+    """
+    Creates a symbolic link pulled from a device, with the target it has on
+    the device. Where links can not be created it is logged and skipped.
+    """
+    try:
+        if os.path.lexists(local_link):
+            os.remove(local_link)
+        os.symlink(target, local_link)
+    except (OSError, NotImplementedError) as error:
+        LOG.warning("Create link {} to {} failed, {}".format(
+            local_link, target, error))
+
+
+def _local_md5(file_path, length=None):
+    """
+    Returns the md5 of a local file, or of its first length bytes.
+    """
+    md5 = hashlib.md5()
+    remain = os.path.getsize(file_path) if length is None else length
+    with open(file_path, "rb") as file_obj:
+        while remain > 0:
+            data = file_obj.read(min(SYNC_DATA_MAX, remain))
+            if not data:
+                break
+            md5.update(data)
+            remain -= len(data)
+    return md5.hexdigest()
+
+
+def is_compressible(path, size):
+    """
+    Checks whether a file is worth compressing for a transfer, from its
+    size and its type.
+    """
+    if size < COMPRESS_MIN_SIZE:
+        return False
+    return not path.lower().endswith(COMPRESSED_FILE_SUFFIXES)
 
 
 def process_command_ret(ret, receiver):
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+import platform
+import struct
+import threading
+import weakref
+
+from xdevice import ExecuteTerminate
+from xdevice import HdcError
+from xdevice import ShellCommandUnresponsiveException
+from xdevice import convert_mac
+from xdevice import convert_serial
+from xdevice import platform_logger
+from ohos.environment.dmlib import DATA_UNIT_LENGTH
+from ohos.environment.dmlib import DEFAULT_STD_PORT
+from ohos.environment.dmlib import DEFAULT_TIMEOUT
+from ohos.environment.dmlib import HDC_UDS_ADDRESS
+from ohos.environment.dmlib import HdcHelper
+from ohos.error import ErrorMessage
+
+__all__ = ["AsyncHdcClient", "AsyncHdcHelper", "HdcEventLoop"]
+
+LOG = platform_logger("AsyncHdc")
+HANDSHAKE_BANNER_LENGTH = 48
+HANDSHAKE_TIMEOUT = 3 * 1000
+
+
+class AsyncHdcClient:
+    """
+    asyncio implementation of the hdc host protocol, one instance per hdc
+    server. Every request runs on its own channel, like HdcHelper, but
+    waiting for output does not hold a thread, so many devices can be
+    served from one event loop. max_channels bounds the channels opened
+    at the same time.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_STD_PORT,
+                 max_channels=64):
+        self.host = host
+        self.port = port
+        self.max_channels = max_channels
+        # a semaphore is bound to the loop it is used on, one per loop
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    async def shell(self, device_sn, command, timeout=DEFAULT_TIMEOUT,
+                    receiver=None):
+        """
+        Executes a shell command on the device. The output is passed to the
+        receiver, or returned when there is no receiver. timeout is the
+        max time between command output (ms).
+        """
+        chunks = []
+        try:
+            async for data in self._request(device_sn, "shell {}".format(
+                    command), timeout):
+                if receiver:
+                    receiver.__read__(data)
+                else:
+                    chunks.append(data)
+        finally:
+            if receiver:
+                receiver.__done__()
+        return "".join(chunks)
+
+    async def file_send(self, device_sn, local, remote,
+                        timeout=DEFAULT_TIMEOUT):
+        return await self._file_command("file send", device_sn, local,
+                                        remote, timeout)
+
+    async def file_recv(self, device_sn, remote, local,
+                        timeout=DEFAULT_TIMEOUT):
+        return await self._file_command("file recv", device_sn, remote,
+                                        local, timeout)
+
+    async def list_targets(self, timeout=DEFAULT_TIMEOUT):
+        """
+        Returns the targets known to the hdc server, as the item lists of
+        'list targets -v', such as [sn, USB, Connected, localhost, hdc].
+        """
+        targets = []
+        output = "".join([data async for data in self._request(
+            "", "list targets -v", timeout, single_reply=True)])
+        if "Empty" in output:
+            return targets
+        for line in output.split("\n"):
+            items = line.strip().split("\t")
+            if items[0] and len(items) >= 5:
+                targets.append(items)
+        return targets
+
+    async def _file_command(self, command, device_sn, source, target,
+                            timeout):
+        output = "".join([data async for data in self._request(
+            device_sn, "{} {} {}".format(command, source, target), timeout,
+            single_reply=True)])
+        LOG.debug(output.strip())
+        return output
+
+    async def _request(self, connect_key, request, timeout,
+                       single_reply=False):
+        async with self._get_semaphore():
+            reader, writer = await self._open_channel(connect_key)
+            try:
+                writer.write(HdcHelper.form_hdc_request(request))
+                await writer.drain()
+                while True:
+                    data = await self._read_frame(reader, timeout)
+                    if data is None:
+                        break
+                    yield HdcHelper.reply_to_string(data)
+                    if single_reply:
+                        break
+            finally:
+                writer.close()
+
+    def _get_semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_channels)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def _open_channel(self, connect_key):
+        if self.host == "127.0.0.1" and platform.system() == 'HarmonyOS':
+            reader, writer = await asyncio.open_unix_connection(HDC_UDS_ADDRESS)
+        else:
+            reader, writer = await asyncio.open_connection(
+                self.host, int(self.port))
+        try:
+            banner = await asyncio.wait_for(
+                reader.readexactly(HANDSHAKE_BANNER_LENGTH),
+                HANDSHAKE_TIMEOUT / 1000)
+            struct.unpack(">I12s32s", banner)
+            size = struct.calcsize('12s256s')
+            writer.write(struct.pack("!I12s256s", size, b'OHOS HDC',
+                                     connect_key.encode("utf-8")))
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError) as error:
+            writer.close()
+            raise HdcError(ErrorMessage.Hdc.Code_0304001.format(
+                self.host, self.port)) from error
+        return reader, writer
+
+    @staticmethod
+    async def _read_frame(reader, timeout):
+        try:
+            len_buf = await asyncio.wait_for(
+                reader.readexactly(DATA_UNIT_LENGTH), timeout / 1000)
+            length = struct.unpack("!I", len_buf)[0]
+            return await asyncio.wait_for(reader.readexactly(length),
+                                          timeout / 1000)
+        except asyncio.IncompleteReadError as _:
+            # the server closes the channel when the request is done
+            return None
+
+
+class HdcEventLoop:
+    """
+    Event loop running in a daemon thread, shared by the sync facade.
+    """
+    _loop = None
+    _thread = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_loop(cls):
+        with cls._lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                cls._thread = threading.Thread(
+                    target=cls._loop.run_forever, name="HdcEventLoop")
+                cls._thread.daemon = True
+                cls._thread.start()
+            return cls._loop
+
+    @classmethod
+    def run(cls, coro, timeout=None):
+        """
+        Runs a coroutine on the shared loop and waits for its result.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, cls.get_loop())
+        return future.result(timeout)
+
+    @classmethod
+    def stop(cls):
+        with cls._lock:
+            if cls._loop is not None:
+                cls._loop.call_soon_threadsafe(cls._loop.stop)
+                cls._loop = None
+                cls._thread = None
+
+
+class AsyncHdcHelper:
+    """
+    Sync facade with the shape of HdcHelper, backed by AsyncHdcClient on
+    the shared HdcEventLoop.
+    """
+    CLIENTS = {}
+    LOCK = threading.Lock()
+
+    @staticmethod
+    def get_client(host, port):
+        key = (host, port)
+        with AsyncHdcHelper.LOCK:
+            if key not in AsyncHdcHelper.CLIENTS:
+                AsyncHdcHelper.CLIENTS[key] = AsyncHdcClient(host, port)
+            return AsyncHdcHelper.CLIENTS[key]
+
+    @staticmethod
+    def execute_shell_command(device, command, timeout=DEFAULT_TIMEOUT,
+                              receiver=None, **kwargs):
+        if not timeout:
+            timeout = DEFAULT_TIMEOUT
+        message = "{} execute command: {} shell {} with timeout {}s".format(
+            convert_serial(device.device_sn), HdcHelper.CONNECTOR_NAME,
+            convert_mac(command), str(timeout / 1000))
+        if kwargs.get("output_flag", True):
+            LOG.info(message)
+        else:
+            LOG.debug(message)
+        from xdevice import Binder
+        client = AsyncHdcHelper.get_client(device.host, device.port)
+        try:
+            output = HdcEventLoop.run(client.shell(
+                device.device_sn, command, timeout, receiver))
+        except asyncio.TimeoutError as error:
+            err_msg = ErrorMessage.Device.Code_0303013.format(
+                convert_serial(device.device_sn), convert_mac(command),
+                str(timeout / 1000))
+            device.log.error(err_msg)
+            raise ShellCommandUnresponsiveException() from error
+        if not Binder.is_executing():
+            raise ExecuteTerminate()
+        return output
+
+    @staticmethod
+    def push_file(device, local, remote, timeout=DEFAULT_TIMEOUT):
+        client = AsyncHdcHelper.get_client(device.host, device.port)
+        return HdcEventLoop.run(client.file_send(
+            device.device_sn, local, remote, timeout))
+
+    @staticmethod
+    def pull_file(device, remote, local, timeout=DEFAULT_TIMEOUT):
+        client = AsyncHdcHelper.get_client(device.host, device.port)
+        return HdcEventLoop.run(client.file_recv(
+            device.device_sn, remote, local, timeout))
+
+    @staticmethod
+    def list_targets(host, port, timeout=DEFAULT_TIMEOUT):
+        client = AsyncHdcHelper.get_client(host, port)
+        return HdcEventLoop.run(client.list_targets(timeout))
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import gzip
+import hashlib
+import os
+import shlex
+import socket
+import struct
+import threading
+import time
+
+from xdevice import platform_logger
+from ohos.environment.dmlib import DATA_UNIT_LENGTH
+from ohos.environment.dmlib import ID_DATA
+from ohos.environment.dmlib import ID_DONE
+from ohos.environment.dmlib import ID_FAIL
+from ohos.environment.dmlib import ID_OKAY
+from ohos.environment.dmlib import ID_RECV
+from ohos.environment.dmlib import ID_SEND
+from ohos.environment.dmlib import ID_STAT
+from ohos.environment.dmlib import SYNC_DATA_MAX
+
+__all__ = ["HdcSimulator", "VirtualDevice"]
+
+LOG = platform_logger("HdcSimulator")
+SHELL_FRAME_MAX = 64 * 1024
+FILE_MODE_REGULAR = 0o100644
+FILE_MODE_DIRECTORY = 0o040755
+HANDSHAKE_LENGTH = DATA_UNIT_LENGTH + struct.calcsize("12s256s")
+
+
+class VirtualDevice:
+    """
+    Device served by HdcSimulator. Files pushed to it are kept in memory.
+    Shell commands used by the framework itself (echo, param, md5sum, find,
+    cat, dd, gzip, mv, rm, mkdir) are answered from that state, anything
+    else goes to shell_handler(command), which returns the output.
+    bandwidth: bytes per second shared by all the transfers of the device,
+    None for no limit
+    drop_after: the sync channel is dropped once after this many bytes of
+    one transfer, to simulate a link reset, None to never drop
+    """
+
+    def __init__(self, device_sn, state="Connected", conn_type="USB",
+                 params=None, shell_handler=None, bandwidth=None,
+                 drop_after=None):
+        self.device_sn = device_sn
+        self.state = state
+        self.conn_type = conn_type
+        self.params = dict(params or {})
+        self.params.setdefault("const.product.software.version",
+                               "OpenHarmony 4.0")
+        self.params.setdefault("ohos.boot.sn", device_sn)
+        self.shell_handler = shell_handler
+        self.bandwidth = bandwidth
+        self.drop_after = drop_after
+        self.files = {}
+        self.lock = threading.Lock()
+        self._next_send_time = 0
+
+    def throttle(self, size):
+        """
+        Waits for the time size bytes take at the device bandwidth.
+        """
+        if not self.bandwidth:
+            return
+        with self.lock:
+            now = time.time()
+            self._next_send_time = max(self._next_send_time, now) + \
+                size / self.bandwidth
+            delay = self._next_send_time - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def shell(self, command):
+        outputs, status = [], 0
+        for index, part in enumerate(command.split(";")):
+            for sub_index, sub_part in enumerate(part.split("&&")):
+                if sub_index and status:
+                    break
+                try:
+                    args = shlex.split(sub_part.split("2>")[0])
+                except ValueError as _:
+                    args = sub_part.split()
+                result = self._run_builtin(args, status)
+                if result is None:
+                    if index == 0 and self.shell_handler:
+                        return self.shell_handler(command) or ""
+                    result = ("", 0)
+                output, status = result
+                outputs.append(output)
+        return "".join(outputs)
+
+    def _find(self, remote, file_type):
+        """
+        Lists the files, or the directories above them with -type d, there
+        are no links nor empty directories on a virtual device
+        """
+        prefix = "{}/".format(remote.rstrip("/"))
+        files = [path for path in sorted(self.files) if path.startswith(prefix)]
+        if file_type == "d":
+            dirs = set()
+            for path in files:
+                parent = os.path.dirname(path)
+                while parent.startswith(prefix):
+                    dirs.add(parent)
+                    parent = os.path.dirname(parent)
+            files = sorted(dirs)
+        elif file_type not in ("", "f"):
+            files = []
+        return "".join("{}\n".format(path) for path in files), 0
+
+    def _run_builtin(self, args, last_status):
+        name = args[0] if args else ""
+        if name == "echo":
+            return "{}\n".format(" ".join(
+                str(last_status) if arg == "$?" else arg
+                for arg in args[1:])), 0
+        if name == "param" and args[1:2] == ["get"]:
+            if len(args) > 2:
+                return "{}\n".format(self.params.get(args[2], "")), 0
+            return "".join("{} = {}\n".format(key, value)
+                           for key, value in self.params.items()), 0
+        if name == "param" and args[1:2] == ["set"] and len(args) > 3:
+            self.params[args[2]] = args[3]
+            return "Set parameter {} {} success\n".format(args[2], args[3]), 0
+        if name == "md5sum":
+            return "".join("{}  {}\n".format(
+                hashlib.md5(self.files[path]).hexdigest(), path)
+                for path in args[1:] if path in self.files), 0
+        if name == "find" and len(args) > 1:
+            return self._find(args[1], args[args.index("-type") + 1]
+                              if "-type" in args[:-1] else "")
+        if name == "cat":
+            return self._cat(args[1:])
+        if name == "dd":
+            return self._dd(dict(arg.split("=", 1) for arg in args[1:]
+                                 if "=" in arg))
+        if name == "mv" and len(args) > 2 and args[-2] in self.files:
+            self.files[args[-1]] = self.files.pop(args[-2])
+            return "", 0
+        if name == "gzip":
+            return self._gzip(args[1:])
+        if name == "rm":
+            for path in [arg for arg in args[1:] if not arg.startswith("-")]:
+                prefix = "{}/".format(path.rstrip("/"))
+                for file_path in list(self.files):
+                    if file_path == path or file_path.startswith(prefix):
+                        self.files.pop(file_path)
+            return "", 0
+        if name == "mkdir":
+            return "", 0
+        return None
+
+    def _cat(self, args):
+        target, append = None, False
+        for redirect in (">>", ">"):
+            if redirect in args:
+                index = args.index(redirect)
+                target, append = args[index + 1], redirect == ">>"
+                args = args[:index]
+                break
+        if any(path not in self.files for path in args):
+            return "cat: No such file or directory\n", 1
+        data = b"".join(self.files[path] for path in args)
+        if target is None:
+            return data.decode("utf-8", "replace"), 0
+        self.files[target] = self.files.get(target, b"") + data \
+            if append else data
+        return "", 0
+
+    def _dd(self, options):
+        source = self.files.get(options.get("if"))
+        if source is None or "of" not in options:
+            return "dd: invalid arguments\n", 1
+        block_size = int(options.get("bs", 512))
+        start = int(options.get("skip", 0)) * block_size
+        end = start + int(options["count"]) * block_size \
+            if "count" in options else len(source)
+        self.files[options["of"]] = source[start:end]
+        return "", 0
+
+    def _gzip(self, args):
+        paths = [arg for arg in args if not arg.startswith("-")]
+        if "-c" in args and len(paths) == 3 and paths[1] == ">" and \
+                paths[0] in self.files:
+            self.files[paths[2]] = gzip.compress(self.files[paths[0]])
+            return "", 0
+        if "-d" in args and len(paths) == 1 and paths[0] in self.files and \
+                paths[0].endswith(".gz"):
+            data = self.files.pop(paths[0])
+            self.files[paths[0][:-len(".gz")]] = gzip.decompress(data)
+            return "", 0
+        return "gzip: invalid arguments\n", 1
+
+    def file_mode(self, path):
+        if path in self.files:
+            return FILE_MODE_REGULAR
+        prefix = "{}/".format(path.rstrip("/"))
+        if any(file_path.startswith(prefix) for file_path in self.files):
+            return FILE_MODE_DIRECTORY
+        return 0
+
+
+class HdcSimulator:
+    """
+    In-process hdc server for running dmlib without devices. It speaks the
+    hdc channel protocol on port (banner, handshake, one request per
+    channel, 'alive' monitor channels) and the sync protocol used by
+    SyncService on sync_port.
+    latency: delay before every reply (s)
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, sync_port=0, latency=0):
+        self.host = host
+        self.port = port
+        self.sync_port = sync_port
+        self.latency = latency
+        self.devices = {}
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self._sockets = []
+        self._running = False
+
+    def add_device(self, device_sn, **kwargs):
+        device = VirtualDevice(device_sn, **kwargs)
+        with self.lock:
+            self.devices[device_sn] = device
+        return device
+
+    def remove_device(self, device_sn):
+        with self.lock:
+            return self.devices.pop(device_sn, None)
+
+    def get_device(self, device_sn):
+        with self.lock:
+            return self.devices.get(device_sn)
+
+    def start(self):
+        self._running = True
+        self.port = self._listen(self.port, self._handle_channel)
+        self.sync_port = self._listen(self.sync_port, self._handle_sync)
+        LOG.debug("Hdc simulator listens on {}:{}, sync port {}".format(
+            self.host, self.port, self.sync_port))
+        return self
+
+    def stop(self):
+        self._running = False
+        for sock in self._sockets:
+            try:
+                sock.close()
+            except OSError as _:
+                pass
+        self._sockets = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def list_targets_output(self):
+        with self.lock:
+            devices = list(self.devices.values())
+        if not devices:
+            return "[Empty]\n"
+        return "".join("{}\t{}\t{}\tlocalhost\thdc\n".format(
+            device.device_sn, device.conn_type, device.state)
+            for device in devices)
+
+    def _listen(self, port, handler):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((self.host, port))
+        server.listen(128)
+        self._sockets.append(server)
+        thread = threading.Thread(target=self._accept, args=(server, handler),
+                                  name="HdcSimulator")
+        thread.daemon = True
+        thread.start()
+        return server.getsockname()[1]
+
+    def _accept(self, server, handler):
+        while self._running:
+            try:
+                conn, _ = server.accept()
+            except OSError as _:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            thread = threading.Thread(target=self._serve, args=(conn, handler))
+            thread.daemon = True
+            thread.start()
+
+    def _serve(self, conn, handler):
+        try:
+            handler(conn)
+        except (OSError, EOFError, struct.error) as error:
+            LOG.debug("Hdc simulator channel closed: {}".format(error))
+        finally:
+            conn.close()
+
+    def _handle_channel(self, conn):
+        conn.sendall(struct.pack(">I12s32s", struct.calcsize("12s32s"),
+                                 b"OHOS HDC", b""))
+        handshake = _recv_exactly(conn, HANDSHAKE_LENGTH)
+        connect_key = struct.unpack("!I12s256s", handshake)[2].rstrip(
+            b"\0").decode("utf-8")
+        while True:
+            length = struct.unpack("!I", _recv_exactly(
+                conn, DATA_UNIT_LENGTH))[0]
+            request = _recv_exactly(conn, length).rstrip(b"\0").decode("utf-8")
+            with self.lock:
+                self.request_count += 1
+            if request == "alive":
+                continue
+            if self.latency:
+                time.sleep(self.latency)
+            if request.startswith("list targets"):
+                _send_frame(conn, self.list_targets_output().encode("utf-8"))
+                continue
+            self._handle_device_request(conn, connect_key, request)
+            return
+
+    def _handle_device_request(self, conn, connect_key, request):
+        device = self.get_device(connect_key)
+        if device is None:
+            _send_frame(conn, "[Fail]Device not found or connected\n".encode(
+                "utf-8"))
+            return
+        if request.startswith("shell "):
+            output = device.shell(request[len("shell "):]).encode("utf-8")
+            view = memoryview(output)
+            for index in range(0, len(output), SHELL_FRAME_MAX):
+                frame = view[index:index + SHELL_FRAME_MAX]
+                device.throttle(len(frame))
+                _send_frame(conn, frame)
+            return
+        if request.startswith("file send ") or \
+                request.startswith("file recv "):
+            _send_frame(conn, self._transfer_file(device, request).encode(
+                "utf-8"))
+            return
+        _send_frame(conn, "[Fail]Unknown command: {}\n".format(
+            request).encode("utf-8"))
+
+    @staticmethod
+    def _transfer_file(device, request):
+        args = shlex.split(request)[2:]
+        args = [arg for arg in args if not arg.startswith("-")]
+        if len(args) < 2:
+            return "[Fail]Invalid file command\n"
+        start_time = time.time()
+        size = 0
+        if request.startswith("file send "):
+            local, remote = args[0], args[1]
+            if not os.path.isfile(local):
+                return "[Fail]Error opening file: no such file or " \
+                       "directory, path:{}\n".format(local)
+            if device.file_mode(remote) == FILE_MODE_DIRECTORY:
+                remote = "{}/{}".format(remote.rstrip("/"),
+                                        os.path.basename(local))
+            with open(local, "rb") as local_file:
+                data = local_file.read()
+            device.throttle(len(data))
+            device.files[remote] = data
+            size = len(data)
+        else:
+            remote, local = args[0], args[1]
+            if remote not in device.files:
+                return "[Fail]Error opening file: no such file or " \
+                       "directory, path:{}\n".format(remote)
+            data = device.files[remote]
+            device.throttle(len(data))
+            if os.path.isdir(local):
+                local = os.path.join(local, os.path.basename(remote))
+            with open(local, "wb") as local_file:
+                local_file.write(data)
+            size = len(data)
+        cost_time = max(time.time() - start_time, 0.001)
+        return "FileTransfer finish, Size:{}, File count = 1, time:{}ms " \
+               "rate:{:.2f}kB/s\n".format(size, int(cost_time * 1000),
+                                          size / cost_time / 1000)
+
+    def _handle_sync(self, conn):
+        device, request = None, ""
+        while request != "sync:":
+            length = struct.unpack("!I", _recv_exactly(
+                conn, DATA_UNIT_LENGTH))[0]
+            request = _recv_exactly(conn, length).rstrip(b"\0").decode("utf-8")
+            if request.startswith("host:transport:"):
+                device = self.get_device(request[len("host:transport:"):])
+            if device is None:
+                message = b"device not found"
+                conn.sendall(ID_FAIL + b"%04x" % len(message) + message)
+                return
+            conn.sendall(ID_OKAY)
+        while True:
+            command = _recv_exactly(conn, DATA_UNIT_LENGTH)
+            length = _recv_int(conn)
+            path = _recv_exactly(conn, length).decode("utf-8")
+            if self.latency:
+                time.sleep(self.latency)
+            if command == ID_STAT:
+                size = len(device.files.get(path, b""))
+                conn.sendall(ID_STAT + struct.pack(
+                    "<III", device.file_mode(path), size, int(time.time())))
+            elif command == ID_SEND:
+                self._sync_receive(conn, device, path.rsplit(",", 1)[0])
+            elif command == ID_RECV:
+                self._sync_send(conn, device, path)
+            else:
+                return
+
+    @staticmethod
+    def _sync_receive(conn, device, remote):
+        chunks, size = [], 0
+        while True:
+            command = _recv_exactly(conn, DATA_UNIT_LENGTH)
+            length = _recv_int(conn)
+            if command == ID_DONE:
+                break
+            if command != ID_DATA or length > SYNC_DATA_MAX:
+                raise EOFError("invalid sync data frame")
+            device.throttle(length)
+            chunks.append(_recv_exactly(conn, length))
+            size += length
+            if device.drop_after is not None and size > device.drop_after:
+                device.drop_after = None
+                raise EOFError("channel dropped by simulator")
+        device.files[remote] = b"".join(chunks)
+        conn.sendall(ID_OKAY + struct.pack("<I", 0))
+
+    @staticmethod
+    def _sync_send(conn, device, remote):
+        if remote not in device.files:
+            message = "No such file: {}".format(remote).encode("utf-8")
+            conn.sendall(ID_FAIL + struct.pack("<I", len(message)) + message)
+            return
+        data = memoryview(device.files[remote])
+        for index in range(0, len(data), SYNC_DATA_MAX):
+            chunk = data[index:index + SYNC_DATA_MAX]
+            device.throttle(len(chunk))
+            conn.sendall(ID_DATA + struct.pack("<I", len(chunk)))
+            conn.sendall(chunk)
+        conn.sendall(ID_DONE + struct.pack("<I", 0))
+
+
+def _recv_exactly(conn, length):
+    buf = bytearray(length)
+    view = memoryview(buf)
+    recv_len = 0
+    while recv_len < length:
+        size = conn.recv_into(view[recv_len:])
+        if size == 0:
+            raise EOFError("channel closed by client")
+        recv_len += size
+    return bytes(buf)
+
+
+def _recv_int(conn):
+    return struct.unpack("<I", _recv_exactly(conn, DATA_UNIT_LENGTH))[0]
+
+
+def _send_frame(conn, data):
+    conn.sendall(struct.pack("!I", len(data)))
+    conn.sendall(data)
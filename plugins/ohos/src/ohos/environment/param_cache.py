@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import threading
+import time
+
+from xdevice import convert_serial
+from xdevice import platform_logger
+
+__all__ = ["ParamCache"]
+
+LOG = platform_logger("ParamCache")
+PARAM_CACHE_TTL = 60
+PARAM_QUERY_TIMEOUT = 10 * 1000
+# parameters which do not change while the device runs, the others are
+# always read from the device
+CACHEABLE_PREFIXES = ("const.",)
+
+
+class ParamCache:
+    """
+    Snapshot of the device parameters, fetched with one 'param get' and
+    reused for ttl seconds. Only the read-only const. parameters are served
+    from it, the others can change without a 'param set' from here. The
+    snapshot is dropped when the device reboots or is recovered, when a
+    'param set' runs on it, or on refresh.
+    """
+
+    def __init__(self, device, ttl=PARAM_CACHE_TTL):
+        self.device = device
+        self.ttl = ttl
+        self.params = {}
+        self.snapshot_time = None
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, **kwargs):
+        """
+        Returns the value of a parameter, or None if it is not in the
+        snapshot or is not cacheable. kwargs are passed to
+        execute_shell_command when the snapshot has to be fetched.
+        """
+        if not is_cacheable(key):
+            return None
+        with self.lock:
+            if not self._is_valid():
+                self.misses += 1
+                self._fetch(**kwargs)
+            else:
+                self.hits += 1
+            return self.params.get(key)
+
+    def refresh(self, **kwargs):
+        with self.lock:
+            self._fetch(**kwargs)
+
+    def invalidate(self):
+        with self.lock:
+            self.params = {}
+            self.snapshot_time = None
+
+    def _is_valid(self):
+        return self.snapshot_time is not None and \
+            time.time() - self.snapshot_time < self.ttl
+
+    def _fetch(self, **kwargs):
+        kwargs.setdefault("timeout", PARAM_QUERY_TIMEOUT)
+        kwargs.setdefault("output_flag", False)
+        # a failed or empty query is kept for the ttl as well, the lookups
+        # go to the single parameter query until then
+        self.params = {}
+        self.snapshot_time = time.time()
+        output = self.device.execute_shell_command("param get", **kwargs)
+        params = {}
+        for line in str(output or "").replace("\r", "").split("\n"):
+            key, sep, value = line.partition(" = ")
+            if sep and key.strip():
+                params[key.strip()] = value.strip()
+        self.params = params
+        LOG.debug("Get {} params from device {}, cache hits: {}, misses: "
+                  "{}".format(len(params), convert_serial(self.device.device_sn),
+                              self.hits, self.misses))
+
+
+def is_cacheable(key):
+    return str(key).startswith(CACHEABLE_PREFIXES)
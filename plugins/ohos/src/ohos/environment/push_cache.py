@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import os
+import shlex
+import threading
+
+from xdevice import convert_serial
+from xdevice import platform_logger
+
+__all__ = ["PushCache", "get_file_digest"]
+
+LOG = platform_logger("PushCache")
+HASH_BLOCK_SIZE = 1024 * 1024
+# keep the batched checksum command well under the shell length limit
+MAX_QUERY_COMMAND_LENGTH = 8 * 1024
+
+_digest_lock = threading.Lock()
+_digests = {}
+
+
+def get_file_digest(file_path):
+    """
+    Returns the md5 of a local file. The result is kept for as long as the
+    file size and modification time stay the same.
+    """
+    file_stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), file_stat.st_size, file_stat.st_mtime_ns)
+    with _digest_lock:
+        digest = _digests.get(key)
+    if digest is not None:
+        return digest
+    md5 = hashlib.md5()
+    with open(file_path, "rb") as file_obj:
+        for block in iter(lambda: file_obj.read(HASH_BLOCK_SIZE), b""):
+            md5.update(block)
+    digest = md5.hexdigest()
+    with _digest_lock:
+        _digests[key] = digest
+    return digest
+
+
+class PushCache:
+    """
+    Remembers, per device, the content hash of the file pushed to each
+    remote path, so that pushing the same content again can be skipped.
+    Entries are hints only, a push is skipped after the device confirms the
+    checksum in a batched query. The cache is cleared when the device
+    reboots or is recovered.
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.pushed_size = 0
+        self.skipped_size = 0
+
+    def split_unchanged(self, files):
+        """
+        Splits (local, remote) pairs into the ones that must be pushed and
+        the ones already on the device with the same content.
+        """
+        to_push, candidates = [], {}
+        for local, remote in files:
+            try:
+                digest = get_file_digest(local)
+            except OSError as error:
+                LOG.debug("Get digest of {} failed: {}".format(local, error))
+                to_push.append((local, remote))
+                continue
+            with self.lock:
+                cached = self.entries.get(remote)
+            if cached == digest:
+                candidates[remote] = (local, digest)
+            else:
+                to_push.append((local, remote))
+        if not candidates:
+            return to_push, []
+
+        remote_digests = self._query_remote_digests(list(candidates.keys()))
+        unchanged = []
+        for remote, (local, digest) in candidates.items():
+            if remote_digests.get(remote) == digest:
+                unchanged.append((local, remote))
+            else:
+                self.discard(remote)
+                to_push.append((local, remote))
+        return to_push, unchanged
+
+    def record_pushed(self, local, remote):
+        size = os.path.getsize(local)
+        try:
+            digest = get_file_digest(local)
+        except OSError as _:
+            digest = None
+        with self.lock:
+            self.pushed_size += size
+            if digest is None:
+                self.entries.pop(remote, None)
+            else:
+                self.entries[remote] = digest
+
+    def record_skipped(self, local):
+        with self.lock:
+            self.skipped_size += os.path.getsize(local)
+
+    def discard(self, remote):
+        """
+        Forgets a remote path and everything under it.
+        """
+        remote = remote.rstrip("/")
+        prefix = remote + "/"
+        with self.lock:
+            for path in list(self.entries.keys()):
+                if path == remote or path.startswith(prefix):
+                    self.entries.pop(path)
+
+    def clear(self):
+        with self.lock:
+            if self.entries:
+                LOG.debug("Clear push cache of device {}".format(
+                    convert_serial(self.device.device_sn)))
+            self.entries.clear()
+
+    def _query_remote_digests(self, remotes):
+        digests = {}
+        batch, length = [], 0
+        for remote in remotes:
+            quoted = shlex.quote(remote)
+            if batch and length + len(quoted) > MAX_QUERY_COMMAND_LENGTH:
+                digests.update(self._run_digest_query(batch))
+                batch, length = [], 0
+            batch.append(quoted)
+            length += len(quoted) + 1
+        if batch:
+            digests.update(self._run_digest_query(batch))
+        return digests
+
+    def _run_digest_query(self, quoted_remotes):
+        digests = {}
+        command = "md5sum {} 2>/dev/null".format(" ".join(quoted_remotes))
+        try:
+            output = self.device.execute_shell_command(
+                command, output_flag=False, retry=0)
+        except Exception as error:
+            LOG.debug("Query remote file digests failed: {}".format(error))
+            return digests
+        for line in str(output).replace("\r", "").split("\n"):
+            items = line.strip().split(maxsplit=1)
+            if len(items) == 2:
+                digests[items[1].strip()] = items[0].lower()
+        return digests
@@ -306,6 +306,12 @@ class _HdcErr:
     Code_0304007 = Error(**{"error": "Cannot connect to hdc server",
                             "category": ErrorCategory.Environment,
                             "code": "0304007"})
+    Code_0304008 = Error(**{"error": "File transfer failed, {}",
+                            "category": ErrorCategory.Environment,
+                            "code": "0304008"})
+    Code_0304009 = Error(**{"error": "File is corrupted after transfer, path: {}",
+                            "category": ErrorCategory.Environment,
+                            "code": "0304009"})
 
 
 class ErrorMessage:
@@ -18,6 +18,7 @@
 import re
 import threading
 import platform
+import time
 
 from xdevice import DeviceProperties
 from xdevice import ManagerType
@@ -43,7 +44,11 @@ from xdevice import exec_cmd
 from xdevice import DeviceNode
 from xdevice import DeviceSelector
 from xdevice import Variables
+from xdevice import AFFINITY_MAX_WAIT
+from xdevice import AffinityStats
+from xdevice import score_device
 
+from ohos.environment.broadcast import DeviceBroadcast
 from ohos.environment.dmlib import DeviceConnector
 from ohos.environment.dmlib import HDC_NAME
 from ohos.environment.dmlib import HDC_STD_NAME
@@ -140,23 +145,40 @@ class ManagerDevice(IDeviceManager, IFilter):
     def apply_device(self, device_option, timeout=3):
         cnt = 0
         max_reply_apply_time = 3
+        if hasattr(device_option, "affinity_deadline"):
+            device_option.affinity_deadline = None
         while cnt <= max_reply_apply_time:
             LOG.debug("Apply device: apply lock con lock")
             self.lock_con.acquire()
             try:
-                device = self.allocate_device_option(device_option)
-                if device or cnt == max_reply_apply_time:
+                last_attempt = cnt == max_reply_apply_time or not timeout
+                device = self.allocate_device_option(
+                    device_option, wait_affinity=not last_attempt)
+                if device or last_attempt:
                     return device
                 LOG.debug("Wait for available device founded")
-                self.lock_con.wait(cnt * 2 + 1)
-                cnt += 1
+                wait_time = cnt * 2 + 1
+                # a free device waits for a busy one no longer than the
+                # affinity deadline
+                deadline = getattr(device_option, "affinity_deadline", None)
+                affinity_wait = deadline is not None and \
+                    deadline > time.time()
+                if deadline is not None:
+                    wait_time = min(wait_time, max(deadline - time.time(), 0))
+                self.lock_con.wait(wait_time)
+                # releases that wake up the wait for a device with more
+                # setup done are not attempts
+                if not affinity_wait:
+                    cnt += 1
             finally:
                 LOG.debug("Apply device: release lock con lock")
                 self.lock_con.release()
 
-    def allocate_device_option(self, device_option):
+    def allocate_device_option(self, device_option, wait_affinity=True):
         """
-        Request a device for testing that meets certain criteria.
+        Request a device for testing that meets certain criteria. Without
+        wait_affinity the best free device is taken even when a busy one
+        has more of the setup done.
         """
 
         LOG.debug("Allocate device option: apply list con lock")
@@ -166,19 +188,56 @@ class ManagerDevice(IDeviceManager, IFilter):
         try:
             allocated_device = None
             LOG.debug("Require device label is: %s" % device_option.label)
+            setup_tags = getattr(device_option, "setup_tags", [])
+            best_score = -1
             for device in self.devices_list:
-                if device_option.matches(device):
-                    self.handle_device_event(device,
-                                             DeviceEvent.ALLOCATE_REQUEST)
-                    LOG.debug("Allocate device sn: %s, type: %s" % (
-                        device.__get_serial__(), device.__class__))
-                    return device
+                if not device_option.matches(device):
+                    continue
+                if not setup_tags:
+                    allocated_device = device
+                    break
+                score = score_device(device, setup_tags)
+                if score > best_score:
+                    allocated_device, best_score = device, score
+            if allocated_device is None:
+                return None
+            if setup_tags and wait_affinity and self._wait_for_affinity(
+                    device_option, best_score):
+                return None
+            self.handle_device_event(allocated_device,
+                                     DeviceEvent.ALLOCATE_REQUEST)
+            LOG.debug("Allocate device sn: %s, type: %s" % (
+                allocated_device.__get_serial__(), allocated_device.__class__))
+            if best_score > 0:
+                AffinityStats.add(best_score)
             return allocated_device
 
         finally:
             LOG.debug("Allocate device option: release list con lock")
             self.list_con.release()
 
+    def _wait_for_affinity(self, device_option, best_score):
+        """
+        Whether to wait for a busy device that has more of the setup of the
+        option done than the best free one, for up to AFFINITY_MAX_WAIT
+        seconds in all from the first allocation attempt. A released device
+        wakes the waiting allocation up.
+        """
+        if device_option.affinity_deadline is None:
+            device_option.affinity_deadline = time.time() + AFFINITY_MAX_WAIT
+        if time.time() >= device_option.affinity_deadline:
+            return False
+        for device in self.devices_list:
+            if device.device_allocation_state != \
+                    DeviceAllocationState.allocated or \
+                    not device_option.matches(device, False):
+                continue
+            if score_device(device, device_option.setup_tags) > best_score:
+                LOG.debug("Wait for device %s which has more setup done" %
+                          device.__get_serial__())
+                return True
+        return False
+
     def release_device(self, device):
         LOG.debug("Release device: apply list con lock")
         self.list_con.acquire()
@@ -192,6 +251,8 @@ class ManagerDevice(IDeviceManager, IFilter):
         finally:
             LOG.debug("Release_device: release list con lock")
             self.list_con.release()
+        with self.lock_con:
+            self.lock_con.notify_all()
 
     def lock_device(self, device):
         LOG.debug("Apply device: apply list con lock")
@@ -250,6 +311,23 @@ class ManagerDevice(IDeviceManager, IFilter):
             LOG.debug("Append device: release list con lock")
             self.list_con.release()
 
+    def broadcast(self, device_sns=None, timeout=None):
+        """
+        Returns a DeviceBroadcast over the online devices, or over the
+        online devices in device_sns if it is given.
+        timeout: max time for one device (s)
+        """
+        self.list_con.acquire()
+        try:
+            devices = [device for device in self.devices_list
+                       if device.test_device_state == TestDeviceState.ONLINE
+                       and hasattr(device, "execute_shell_command")
+                       and (device_sns is None or
+                            device.device_sn in device_sns)]
+        finally:
+            self.list_con.release()
+        return DeviceBroadcast(devices, timeout=timeout)
+
     def find_or_create(self, idevice):
         try:
             device = self.find_device(idevice)
@@ -19,9 +19,25 @@
 from ohos.constants import ParserType
 from ohos.parser import *
 
-__all__ = ["VulkanTestParser"]
+__all__ = ["VulkanTestParser", "DeqpTestParser"]
 
 LOG = platform_logger("VulkanParser")
+_DEQP_TEST_CASE = r"^Test case '(.+)'\.\.$"
+_DEQP_RESULT = r"^(\w+) \((.*)\)$"
+_DEQP_RESULT_CODES = {
+    "Pass": ResultCode.PASSED,
+    "QualityWarning": ResultCode.PASSED,
+    "CompatibilityWarning": ResultCode.PASSED,
+    "Waiver": ResultCode.PASSED,
+    "NotSupported": ResultCode.SKIPPED,
+    "Fail": ResultCode.FAILED,
+    "Pending": ResultCode.FAILED,
+    "ResourceError": ResultCode.FAILED,
+    "InternalError": ResultCode.FAILED,
+    "Crash": ResultCode.FAILED,
+    "Timeout": ResultCode.FAILED,
+    "DeviceLost": ResultCode.FAILED
+}
 
 @Plugin(type=Plugin.PARSER, id=ParserType.vulkan_test)
 class VulkanTestParser(IParser):
@@ -47,4 +63,131 @@ class VulkanTestParser(IParser):
         self.cache.clear()
 
     def mark_test_as_blocked(self, test):
-        pass
\ No newline at end of file
+        pass
+
+
+@Plugin(type=Plugin.PARSER, id=ParserType.deqp_test)
+class DeqpTestParser(IParser):
+    """
+    Parses the output of a dEQP run, such as
+    Test case 'dEQP-VK.api.smoke.create_sampler'..
+      Pass (Not validated)
+    A case is reported with the group as class, 'dEQP-VK.api.smoke', and
+    the last part as name. All the runs of a module report into one suite,
+    named after the module. A case which started but has no result when
+    the run ends is reported as blocked, the run crashed on it.
+    """
+
+    def __init__(self):
+        self.state_machine = StateRecorder()
+        self.suite_name = ""
+        self.listeners = []
+        self.test_num = 0
+        self.start_time = get_cst_time()
+        self.suite_start_time = get_cst_time()
+
+    def get_suite_name(self):
+        return self.suite_name
+
+    def get_listeners(self):
+        return self.listeners
+
+    def __process__(self, lines):
+        for line in lines:
+            line = str(line).strip().rstrip("\r")
+            LOG.debug(line)
+            self.parse(line)
+
+    def __done__(self):
+        if not self.state_machine.suites_is_started():
+            return
+        if self.state_machine.test_is_running():
+            test_result = self.state_machine.test()
+            test_result.stacktrace = "error_msg: run crashed"
+            self._end_test(ResultCode.BLOCKED)
+        suite_result = self.state_machine.suite()
+        suite_result.run_time = get_delta_time_ms(self.suite_start_time)
+        suite_result.is_completed = True
+        for listener in self.get_listeners():
+            suite = copy.copy(suite_result)
+            listener.__ended__(LifeCycle.TestSuite, suite, is_clear=True)
+        suites = self.state_machine.get_suites()
+        suites.run_time = suite_result.run_time
+        suites.is_completed = True
+        for listener in self.get_listeners():
+            copy_suites = copy.copy(suites)
+            listener.__ended__(LifeCycle.TestSuites, test_result=copy_suites,
+                               suites_name=suites.suites_name,
+                               product_info=suites.product_info)
+        self.state_machine.current_suites = None
+
+    def parse(self, line):
+        matcher = re.match(_DEQP_TEST_CASE, line)
+        if matcher:
+            if not self.state_machine.suites_is_started():
+                self._start_suites()
+            self._start_test(matcher.group(1))
+            return
+        matcher = re.match(_DEQP_RESULT, line)
+        if matcher and self.state_machine.test_is_running() and \
+                matcher.group(1) in _DEQP_RESULT_CODES:
+            test_result = self.state_machine.test()
+            if matcher.group(2):
+                test_result.stacktrace = matcher.group(2)
+            self._end_test(_DEQP_RESULT_CODES.get(matcher.group(1)))
+
+    def _start_suites(self):
+        test_suites = self.state_machine.get_suites(reset=True)
+        test_suites.suites_name = self.get_suite_name()
+        test_suites.test_num = self.test_num
+        for listener in self.get_listeners():
+            suite_report = copy.copy(test_suites)
+            listener.__started__(LifeCycle.TestSuites, suite_report)
+        test_suite = self.state_machine.suite(reset=True)
+        test_suite.suite_name = self.get_suite_name()
+        test_suite.test_num = self.test_num
+        self.suite_start_time = get_cst_time()
+        for listener in self.get_listeners():
+            suite_report = copy.copy(test_suite)
+            listener.__started__(LifeCycle.TestSuite, suite_report)
+
+    def _start_test(self, case_name):
+        if self.state_machine.test_is_running():
+            self._end_test(ResultCode.BLOCKED)
+        test_class, _, test_name = case_name.rpartition(".")
+        test_result = self.state_machine.test(reset=True)
+        test_result.test_class = test_class
+        test_result.test_name = test_name
+        self.start_time = get_cst_time()
+        for listener in self.get_listeners():
+            result = copy.copy(test_result)
+            listener.__started__(LifeCycle.TestCase, result)
+
+    def _end_test(self, result_code):
+        test_result = self.state_machine.test()
+        test_result.run_time = get_delta_time_ms(self.start_time)
+        test_result.code = result_code.value
+        test_result.current = self.state_machine.running_test_index + 1
+        if result_code == ResultCode.FAILED:
+            for listener in self.get_listeners():
+                listener.__failed__(LifeCycle.TestCase,
+                                    copy.copy(test_result))
+        elif result_code == ResultCode.SKIPPED:
+            for listener in self.get_listeners():
+                listener.__skipped__(LifeCycle.TestCase,
+                                     copy.copy(test_result))
+        test_result.is_completed = True
+        for listener in self.get_listeners():
+            listener.__ended__(LifeCycle.TestCase, copy.copy(test_result))
+        self.state_machine.running_test_index += 1
+
+    def mark_test_as_blocked(self, test):
+        """
+        Reports a case which could not run as blocked, call __done__ after
+        the last one.
+        """
+        if not self.state_machine.suites_is_started():
+            self._start_suites()
+        self._start_test("{}.{}".format(test.class_name, test.test_name))
+        self.state_machine.test().stacktrace = "error_msg: run crashed"
+        self._end_test(ResultCode.BLOCKED)
@@ -21,7 +21,10 @@ import os
 import re
 import stat
 import subprocess
+import tarfile
+import threading
 import time
+import uuid
 import zipfile
 from dataclasses import dataclass
 from multiprocessing import Process
@@ -54,6 +57,7 @@ from ohos.constants import CKit
 from ohos.constants import InstallErrorCode
 from ohos.environment.dmlib import HdcHelper
 from ohos.environment.dmlib import CollectingOutputReceiver
+from ohos.environment.push_cache import get_file_digest
 from ohos.error import ErrorMessage
 
 __all__ = ["STSKit", "CommandKit", "PushKit", "PropertyCheckKit", "ShellKit",
@@ -64,6 +68,12 @@ MAX_WAIT_COUNT = 4
 TARGET_SDK_VERSION = 22
 
 LOG = platform_logger("Kit")
+_tar_support = {}
+_tar_support_lock = threading.Lock()
+# push archives built ahead of the kit setup, by their files
+_prestaged_archives = {}
+_prestaged_lock = threading.Lock()
+MAX_PRESTAGED_ARCHIVES = 4
 
 
 @Plugin(type=Plugin.TEST_KIT, id=CKit.command)
@@ -205,6 +215,11 @@ class PushBase(ITestKit):
         self.pushed_file = []
         self.abort_on_push_failure = True
         self.teardown_push = ""
+        self.use_push_cache = True
+        self.push_mode = PushMode.file
+        self.archive_compress = False
+        self.archive_min_files = Props.archive_min_files
+        self.archive_max_size = Props.archive_max_size
         self.request = None
 
     def __check_config__(self, config):
@@ -220,12 +235,39 @@ class PushBase(ITestKit):
             self.abort_on_push_failure = False if \
                 self.abort_on_push_failure.lower() == "false" else True
 
+        self.use_push_cache = get_config_value(
+            'push-cache', config, is_list=False, default=True)
+        if isinstance(self.use_push_cache, str):
+            self.use_push_cache = False if \
+                self.use_push_cache.lower() == "false" else True
+        self.push_mode = get_config_value(
+            'push-mode', config, is_list=False, default=PushMode.file)
+        self.archive_compress = get_config_value(
+            'push-archive-compress', config, is_list=False, default=False)
+        if isinstance(self.archive_compress, str):
+            self.archive_compress = True if \
+                self.archive_compress.lower() == "true" else False
+        self.archive_min_files = int(get_config_value(
+            'push-archive-min-files', config, is_list=False,
+            default=Props.archive_min_files))
+        self.archive_max_size = int(get_config_value(
+            'push-archive-max-size', config, is_list=False,
+            default=Props.archive_max_size))
+
         self.paths = get_config_value('paths', config)
         self.pushed_file = []
 
     def __setup__(self, device, **kwargs):
         pass
 
+    @property
+    def keeps_setup(self):
+        """
+        Whether the pushed files stay on the device after the teardown, so
+        that the push cache skips them for the next module pushing them
+        """
+        return self.use_push_cache and not self.is_uninstall
+
     def _get_push_list(self, device):
         new_push_list = []
         if getattr(device, 'common_kits', None):
@@ -242,6 +284,7 @@ class PushBase(ITestKit):
 
     def _push_file(self, device, push_list: list) -> list:
         dsts = []
+        push_files = []
         for push_info in push_list:
             files = re.split('->|=>', push_info)
             if len(files) != 2:
@@ -261,20 +304,15 @@ class PushBase(ITestKit):
                         raise error
                     LOG.warning(error, error_no=error.error_no)
                     continue
-            if check_device_ohca(device) and dst.startswith("/data/"):
-                regex = re.compile('^/data/*')
-                dst = regex.sub("/data/ohos_data/", dst)
+            dst = get_device_data_path(device, dst)
             # hdc don't support push directory now
             if os.path.isdir(real_src_path):
                 command = "shell mkdir {}".format(dst)
                 device.connector_command(command)
                 for root, _, files in os.walk(real_src_path):
                     for file in files:
-                        device.push_file("{}".format(os.path.join(root, file)),
-                                         "{}".format(dst))
-                        LOG.debug(
-                            "Push file finished from {} to {}".format(
-                                os.path.join(root, file), dst))
+                        push_files.append((os.path.join(root, file),
+                                           "{}/{}".format(dst.rstrip("/"), file)))
                         self.pushed_file.append(os.path.join(dst, file))
             else:
                 if device.is_directory(dst):
@@ -282,13 +320,140 @@ class PushBase(ITestKit):
                     if dst.find("\\") > -1:
                         dst_paths = dst.split("\\")
                         dst = "/".join(dst_paths)
-                device.push_file("{}".format(real_src_path),
-                                 "{}".format(dst))
-                LOG.debug("Push file finished from {} to {}".format(src, dst))
+                push_files.append((real_src_path, dst))
                 self.pushed_file.append(dst)
             dsts.append(dst)
+        self._push_files(device, push_files)
         return dsts
 
+    def _push_files(self, device, push_files: list):
+        push_cache = getattr(device, "push_cache", None) \
+            if self.use_push_cache else None
+        if push_cache is None:
+            to_push, unchanged = push_files, []
+        else:
+            to_push, unchanged = push_cache.split_unchanged(push_files)
+        pushed_size, skipped_size = 0, 0
+        for local, remote in unchanged:
+            LOG.debug("Skip pushing unchanged file {} to {}".format(local, remote))
+            push_cache.record_skipped(local)
+            skipped_size += os.path.getsize(local)
+        if not self._push_archive(device, to_push):
+            for local, remote in to_push:
+                device.push_file(local, remote)
+                LOG.debug("Push file finished from {} to {}".format(local, remote))
+        for local, _ in to_push:
+            pushed_size += os.path.getsize(local)
+        if push_cache is not None:
+            for local, remote in to_push:
+                push_cache.record_pushed(local, remote)
+        if push_files:
+            LOG.info("Push {} files ({} bytes) to device {}, skip {} unchanged "
+                     "files ({} bytes)".format(
+                         len(to_push), pushed_size, convert_serial(device.device_sn),
+                         len(unchanged), skipped_size))
+
+    def _use_archive_mode(self, files: list) -> bool:
+        if self.push_mode == PushMode.file or not files:
+            return False
+        if self.push_mode == PushMode.archive:
+            return True
+        total_size = sum(os.path.getsize(local) for local, _ in files)
+        return len(files) >= self.archive_min_files and \
+            total_size <= self.archive_max_size
+
+    def _push_archive(self, device, files: list) -> bool:
+        """
+        Pushes the files as one tar archive, which is extracted on the device
+        with a single shell command. Return False if the files should be
+        pushed one by one instead.
+        """
+        if not self._use_archive_mode(files) or not device_support_tar(device):
+            return False
+        suffix = ".tar.gz" if self.archive_compress else ".tar"
+        archive_name = "xdevice_push_{}{}".format(uuid.uuid4().hex, suffix)
+        remote_archive = get_device_data_path(device, "{}/{}".format(
+            Props.archive_temp_path, archive_name))
+        prestaged_dir = take_prestaged_archive(files, self.archive_compress)
+        with prestaged_dir or TemporaryDirectory(
+                prefix="xdevice_push_") as temp_dir:
+            archive = os.path.join(temp_dir, "push{}".format(suffix))
+            if prestaged_dir is None:
+                build_push_archive(files, archive, self.archive_compress)
+            LOG.debug("Push {} files to device {} in archive {}, {} bytes".format(
+                len(files), convert_serial(device.device_sn), archive_name,
+                os.path.getsize(archive)))
+            device.push_file(archive, remote_archive)
+        extract_flag = "-xzf" if self.archive_compress else "-xf"
+        command = "tar {} {} -C /; ret=$?; rm -f {}; echo $ret".format(
+            extract_flag, remote_archive, remote_archive)
+        output = device.execute_shell_command(command)
+        lines = [line.strip() for line in str(output).strip().split("\n")]
+        if lines and lines[-1] == "0":
+            return True
+        LOG.warning("Extract push archive on device {} failed, push files "
+                    "one by one. {}".format(convert_serial(device.device_sn),
+                                            output))
+        return False
+
+    def __prepare__(self, device=None, running_kits=None, bandwidth=0,
+                    should_stop=None):
+        """
+        Prepares the push ahead of the setup. Resolves and hashes the files,
+        and with a device pushes the ones under /data the running kits do
+        not touch, which the push cache then skips at setup. Builds the
+        archive of the files left to push when it would be used.
+        """
+        push_files = self._get_prepare_files(device)
+        for local, _ in push_files:
+            get_file_digest(local)
+        if getattr(device, "push_cache", None) is not None and bandwidth \
+                and self.use_push_cache:
+            running_paths = get_running_push_paths(running_kits)
+            prestage_files = [
+                (local, remote) for local, remote in push_files
+                if remote.startswith("/data/") and
+                not is_conflicting_path(remote, running_paths)]
+            prestage_push_files(device, prestage_files, bandwidth,
+                                should_stop)
+            to_push, _ = device.push_cache.split_unchanged(push_files)
+        else:
+            to_push = push_files
+        if self._use_archive_mode(to_push):
+            prestage_push_archive(to_push, self.archive_compress)
+
+    def _get_prepare_files(self, device=None):
+        """
+        Returns the (local, remote) pairs the setup will push, without
+        touching the device but to check if a remote path is a directory.
+        """
+        push_files = []
+        for push_info in self.push_list:
+            files = re.split('->|=>', push_info)
+            if len(files) != 2:
+                continue
+            src, dst = files[0].strip(), files[1].strip()
+            if not dst.startswith("/"):
+                dst = Props.dest_root + dst
+            try:
+                real_src_path = get_file_absolute_path(src, self.paths)
+            except ParamError as _:
+                continue
+            if device is not None:
+                dst = get_device_data_path(device, dst)
+            if os.path.isdir(real_src_path):
+                for root, _, names in os.walk(real_src_path):
+                    for name in names:
+                        push_files.append((os.path.join(root, name), "{}/{}".format(
+                            dst.rstrip("/"), name)))
+                continue
+            if dst.endswith("/") or (device is not None and
+                                     device.is_directory(dst)):
+                dst = "{}/{}".format(dst.rstrip("/"),
+                                     os.path.basename(real_src_path))
+            push_files.append((real_src_path, dst))
+        return push_files
+
     def __download_web_resource(self, device, file_path):
         """下载OpenHarmony兼容性测试资源文件"""
         # 在命令行配置
@@ -417,6 +582,9 @@ class PushBase(ITestKit):
                                   format(collect_receiver.output))
                 else:
                     LOG.error("Failed to remove file {}".format(file_name))
+                push_cache = getattr(device, "push_cache", None)
+                if push_cache is not None:
+                    push_cache.discard(file_name)
 
     def __add_pushed_file__(self, device, src, dst):
         if device.is_directory(dst):
@@ -460,7 +628,8 @@ class PropertyCheckKit(ITestKit):
         if not self.prop_name:
             LOG.warning("The option of property-name not setting")
             return
-        prop_value = device.get_property(self.prop_name)
+        # the kit checks the value the device has now, not a cached one
+        prop_value = device.get_property(self.prop_name, use_cache=False)
         if not prop_value:
             LOG.warning(
                 "The property {} not found on device, cannot check the value".
@@ -535,6 +704,15 @@ class Props:
                        "'wifiName':'{}'}}}}\"  " \
                        "-w com.xdeviceservice.service.plrdtest/com.xdeviceservice.service.MainInstrumentation"
     security_patch = "ro.build.version.security_patch"
+    archive_temp_path = "/data/local/tmp"
+    archive_min_files = 20
+    archive_max_size = 512 * 1024 * 1024
+
+
+class PushMode:
+    auto = "auto"  # archive when there are many files, one by one otherwise
+    archive = "archive"
+    file = "file"  # one by one, the default
 
 
 @Plugin(type=Plugin.TEST_KIT, id=CKit.config)
@@ -727,6 +905,36 @@ class AppInstallKit(ITestKit):
             self.install_hap(device, app_file)
             self.installed_app.add(app_file)
 
+    def __prepare__(self, device=None, running_kits=None, bandwidth=0,
+                    should_stop=None):
+        """
+        Resolves and hashes the app files ahead of the setup, and with a
+        device pushes the ones the running kits do not push as well.
+        """
+        hap_files = []
+        for app in self.app_list:
+            try:
+                hap_files.append(get_file_absolute_path(
+                    app, self.paths, self.alt_dir or None))
+            except ParamError as _:
+                continue
+        for hap_file in hap_files:
+            get_file_digest(hap_file)
+        if device is None or not bandwidth or self.is_pri_app:
+            return
+        running_paths = get_running_push_paths(running_kits)
+        prestage_files = []
+        for hap_file in hap_files:
+            push_dest = self._get_push_dest(device, hap_file)
+            if not is_conflicting_path(push_dest, running_paths):
+                prestage_files.append((hap_file, push_dest))
+        prestage_push_files(device, prestage_files, bandwidth, should_stop)
+
+    @staticmethod
+    def _get_push_dest(device, hap_file):
+        push_dest = "/data/local/tmp" if hasattr(device, "is_oh") else "/sdcard"
+        return "{}/{}".format(push_dest, os.path.basename(hap_file))
+
     def __teardown__(self, device):
         LOG.debug("AppInstallKit teardown: device:{}".format(device.device_sn))
         if self.is_clean and str(self.is_clean).lower() == "true":
@@ -754,8 +962,11 @@ class AppInstallKit(ITestKit):
                         LOG.warning("Can't find app name for %s" % app)
         if self.is_pri_app:
             remount(device)
+        push_cache = getattr(device, "push_cache", None)
         for pushed_file in self.pushed_hap_file:
             device.execute_shell_command("rm -r %s" % pushed_file)
+            if push_cache is not None:
+                push_cache.discard(pushed_file)
 
     def install_hap(self, device, hap_file):
         if self.is_pri_app:
@@ -783,12 +994,15 @@ class AppInstallKit(ITestKit):
             finally:
                 zif_file.close()
         else:
-            if hasattr(device, "is_oh"):
-                push_dest = "/data/local/tmp"
+            push_dest = self._get_push_dest(device, hap_file)
+            push_cache = getattr(device, "push_cache", None)
+            if push_cache is not None and not push_cache.split_unchanged(
+                    [(hap_file, push_dest)])[0]:
+                LOG.debug("Skip pushing unchanged hap {}".format(push_dest))
             else:
-                push_dest = "/sdcard"
-            push_dest = "{}/{}".format(push_dest, os.path.basename(hap_file))
-            device.push_file(hap_file, push_dest)
+                device.push_file(hap_file, push_dest)
+                if push_cache is not None:
+                    push_cache.record_pushed(hap_file, push_dest)
             self.pushed_hap_file.add(push_dest)
             app_install_cmd = f"bm install -p {push_dest}"
             if self.ex_args:
@@ -1011,6 +1225,160 @@ def run_command(device, command):
     return stdout
 
 
+def get_device_data_path(device, path):
+    """
+    Returns where a path under /data is on the device, which is under
+    /data/ohos_data on ohca devices.
+    """
+    if check_device_ohca(device) and path.startswith("/data/"):
+        return re.sub('^/data/*', "/data/ohos_data/", path)
+    return path
+
+
+def device_support_tar(device):
+    """
+    Checks once per device whether its shell provides tar.
+    """
+    with _tar_support_lock:
+        if device.device_sn in _tar_support:
+            return _tar_support[device.device_sn]
+    output = device.execute_shell_command(
+        "tar --help >/dev/null 2>&1 && echo tar_supported", output_flag=False)
+    supported = "tar_supported" in str(output)
+    if not supported:
+        LOG.debug("Device {} does not support tar".format(
+            convert_serial(device.device_sn)))
+    with _tar_support_lock:
+        _tar_support[device.device_sn] = supported
+    return supported
+
+
+def build_push_archive(files, archive, compress=False):
+    """
+    Builds a tar archive of (local, remote) file pairs. Members are named
+    after their remote paths, so the archive is extracted from /.
+    """
+    def reset_owner(tar_info):
+        tar_info.uid = tar_info.gid = 0
+        tar_info.uname = tar_info.gname = ""
+        return tar_info
+
+    mode = "w:gz" if compress else "w"
+    with tarfile.open(archive, mode, dereference=True) as tar:
+        for local, remote in files:
+            tar.add(local, arcname=remote.lstrip("/"), filter=reset_owner)
+    return archive
+
+
+def _get_archive_key(files, compress):
+    items = []
+    for local, remote in files:
+        file_stat = os.stat(local)
+        items.append((os.path.abspath(local), remote, file_stat.st_size,
+                      file_stat.st_mtime_ns))
+    return tuple(items), bool(compress)
+
+
+def prestage_push_archive(files, compress=False):
+    """
+    Builds the push archive of the files ahead of the kit setup, which
+    takes it with take_prestaged_archive.
+    """
+    key = _get_archive_key(files, compress)
+    with _prestaged_lock:
+        if key in _prestaged_archives:
+            return
+    temp_dir = TemporaryDirectory(prefix="xdevice_push_")
+    suffix = ".tar.gz" if compress else ".tar"
+    try:
+        build_push_archive(files, os.path.join(
+            temp_dir.name, "push{}".format(suffix)), compress)
+    except (OSError, tarfile.TarError) as error:
+        LOG.debug("Prestage push archive failed, {}".format(error))
+        temp_dir.cleanup()
+        return
+    with _prestaged_lock:
+        _prestaged_archives[key] = temp_dir
+        while len(_prestaged_archives) > MAX_PRESTAGED_ARCHIVES:
+            oldest = next(iter(_prestaged_archives))
+            _prestaged_archives.pop(oldest).cleanup()
+
+
+def take_prestaged_archive(files, compress=False):
+    """
+    Returns the TemporaryDirectory holding the push archive of the files
+    built ahead, or None. The caller cleans it up.
+    """
+    try:
+        key = _get_archive_key(files, compress)
+    except OSError as _:
+        return None
+    with _prestaged_lock:
+        return _prestaged_archives.pop(key, None)
+
+
+def get_running_push_paths(running_kits):
+    """
+    Returns the remote paths the kits push to
+    """
+    paths = []
+    for kit in running_kits or []:
+        if isinstance(kit, PushBase):
+            for push_info in kit.push_list:
+                files = re.split('->|=>', push_info)
+                if len(files) != 2:
+                    continue
+                dst = files[1].strip()
+                if not dst.startswith("/"):
+                    dst = Props.dest_root + dst
+                paths.append(dst.rstrip("/"))
+        elif isinstance(kit, AppInstallKit):
+            for app in kit.app_list:
+                paths.append("/data/local/tmp/{}".format(os.path.basename(app)))
+                paths.append("/sdcard/{}".format(os.path.basename(app)))
+    return paths
+
+
+def is_conflicting_path(remote, paths):
+    remote = remote.rstrip("/")
+    for path in paths:
+        if remote == path or remote.startswith(path + "/") or \
+                path.startswith(remote + "/"):
+            return True
+    return False
+
+
+def prestage_push_files(device, files, bandwidth, should_stop=None):
+    """
+    Pushes the files which are not on the device yet, keeping the average
+    rate under bandwidth bytes/s, and records them in the push cache so the
+    kit setup skips them.
+    """
+    push_cache = getattr(device, "push_cache", None)
+    if push_cache is None or not files:
+        return
+    to_push, _ = push_cache.split_unchanged(files)
+    if not to_push:
+        return
+    dirs = sorted({os.path.dirname(remote) for _, remote in to_push})
+    device.execute_shell_command("mkdir -p {}".format(" ".join(dirs)),
+                                 output_flag=False)
+    start_time, pushed_size, pushed_count = time.time(), 0, 0
+    for local, remote in to_push:
+        if callable(should_stop) and should_stop():
+            break
+        device.push_file(local, remote)
+        push_cache.record_pushed(local, remote)
+        pushed_size += os.path.getsize(local)
+        pushed_count += 1
+        delay = pushed_size / bandwidth - (time.time() - start_time)
+        if delay > 0:
+            time.sleep(delay)
+    LOG.info("Prestage {} files ({} bytes) to device {} in {:.1f}s".format(
+        pushed_count, pushed_size, convert_serial(device.device_sn),
+        time.time() - start_time))
+
+
 def get_app_name(hap_app):
     hap_name = os.path.basename(hap_app).replace(".hap", "")
     app_name = ""
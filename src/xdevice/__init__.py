@@ -84,8 +84,13 @@ from _core.executor.bean import SuitesResult
 from _core.executor.bean import StateRecorder
 from _core.executor.listener import TestDescription
 from _core.executor.listener import CollectingTestListener
+from _core.executor.concurrent import Concurrent
+from _core.trace import Tracer
+from _core.trace import trace_span
+from _core.trace import traced
 from _core.executor.request import Request
 from _core.executor.request import Task
+from _core.executor.ordering import ModuleDurations
 from _core.testkit.json_parser import JsonParser
 from _core.testkit.kit import junit_para_parse
 from _core.testkit.kit import gtest_para_parse
@@ -136,7 +141,12 @@ from _core.utils import find_file
 from _core.utils import get_resource_path
 from _core.logger import LogQueue
 from _core.environment.manager_env import DeviceSelectionOption
+from _core.environment.manager_env import Environment
 from _core.environment.manager_env import EnvironmentManager
+from _core.environment.affinity import AFFINITY_MAX_WAIT
+from _core.environment.affinity import AffinityStats
+from _core.environment.affinity import clear_setup
+from _core.environment.affinity import score_device
 from _core.environment.env_pool import EnvPool
 from _core.environment.env_pool import XMLNode
 from _core.environment.env_pool import Selector
@@ -231,6 +241,11 @@ __all__ = [
     "TestDescription",
     "CollectingTestListener",
     "Task",
+    "Concurrent",
+    "Tracer",
+    "trace_span",
+    "traced",
+    "ModuleDurations",
     "CaseStart",
     "CaseEnd",
     "Binder",
@@ -239,7 +254,12 @@ __all__ = [
     "Connector",
     "SuiteReporter",
     "DeviceSelectionOption",
+    "Environment",
     "EnvironmentManager",
+    "AFFINITY_MAX_WAIT",
+    "AffinityStats",
+    "clear_setup",
+    "score_device",
     "EnvPool",
     "XMLNode",
     "Selector",
@@ -464,3 +464,82 @@ class UserConfigManager(object):
             return 8
         value = int(self.taskargs.get("max_driver_threads"))
         return value if value > 0 else 8
+
+    def get_adaptive_driver_threads(self):
+        """是否根据主机负载在上下限之间自动调整并发执行的驱动数（默认false）"""
+        cfg_name = ConfigConst.TaskArgs.adaptive_driver_threads.value
+        value = str(self.taskargs.get(cfg_name, "")).strip().lower()
+        return value == "true"
+
+    def get_min_driver_threads(self):
+        """自动调整并发驱动数时的下限，默认1，上限为max_driver_threads"""
+        cfg_name = ConfigConst.TaskArgs.min_driver_threads.value
+        value = str(self.taskargs.get(cfg_name, "")).strip()
+        return max(int(value), 1) if value.isdigit() else 1
+
+    def get_driver_process_workers(self):
+        """在子进程中执行主机测试驱动的进程数，默认0，表示在线程中执行"""
+        cfg_name = ConfigConst.TaskArgs.driver_process_workers.value
+        value = str(self.taskargs.get(cfg_name, "")).strip()
+        return int(value) if value.isdigit() else 0
+
+    def get_trace(self):
+        """是否记录任务各阶段耗时，并在报告目录生成trace.json（默认false）"""
+        cfg_name = ConfigConst.TaskArgs.trace.value
+        value = str(self.taskargs.get(cfg_name, "")).strip().lower()
+        return value == "true"
+
+    def get_module_order(self):
+        """模块调度顺序，fifo（默认）或lpt（历史耗时长的模块先执行）"""
+        from _core.executor.ordering import ModuleOrder
+        cfg_name = ConfigConst.TaskArgs.module_order.value
+        value = str(self.taskargs.get(cfg_name, "")).strip().lower()
+        return ModuleOrder.lpt if value == ModuleOrder.lpt \
+            else ModuleOrder.fifo
+
+    def get_module_order_unknown(self):
+        """lpt顺序下，无历史耗时的模块排在最前（first）、最后（last）或按平均耗时（mean，默认）"""
+        from _core.executor.ordering import UnknownDuration
+        cfg_name = ConfigConst.TaskArgs.module_order_unknown.value
+        value = str(self.taskargs.get(cfg_name, "")).strip().lower()
+        if value in [UnknownDuration.first, UnknownDuration.last]:
+            return value
+        return UnknownDuration.mean
+
+    def get_device_affinity(self):
+        """是否优先分配已完成模块部分测试套件准备的设备（默认false）"""
+        cfg_name = ConfigConst.TaskArgs.device_affinity.value
+        value = str(self.taskargs.get(cfg_name, "")).strip().lower()
+        return value == "true"
+
+    def get_hdc_connection_pool(self):
+        """是否为设备的shell命令预先建立hdc连接（默认true）"""
+        cfg_name = ConfigConst.TaskArgs.hdc_connection_pool.value
+        value = str(self.taskargs.get(cfg_name, "")).strip().lower()
+        return value != "false"
+
+    def get_transfer_compress(self):
+        """是否通过sync会话压缩传输设备文件，hdc不支持sync会话时使用hdc命令传输（默认false）"""
+        cfg_name = ConfigConst.TaskArgs.transfer_compress.value
+        value = str(self.taskargs.get(cfg_name, "")).strip().lower()
+        return value == "true"
+
+    def get_transfer_resumable(self):
+        """是否通过sync会话分块校验传输设备文件，重试时从已传输的分块继续（默认false）"""
+        cfg_name = ConfigConst.TaskArgs.transfer_resumable.value
+        value = str(self.taskargs.get(cfg_name, "")).strip().lower()
+        return value == "true"
+
+    def get_kit_lookahead(self):
+        """是否在当前模块运行时预先准备下一个模块的测试套件（默认false）"""
+        cfg_name = ConfigConst.TaskArgs.kit_lookahead.value
+        value = str(self.taskargs.get(cfg_name, "")).strip().lower()
+        return value == "true"
+
+    def get_kit_lookahead_bandwidth(self):
+        """预先推送文件到设备的带宽上限，单位KB/s，默认5120，0表示不预先推送"""
+        cfg_name = ConfigConst.TaskArgs.kit_lookahead_bandwidth.value
+        value = str(self.taskargs.get(cfg_name, "")).strip()
+        if not value.isdigit():
+            return 5120 * 1024
+        return int(value) * 1024
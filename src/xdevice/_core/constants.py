@@ -353,16 +353,28 @@ class ConfigConst(object):
     control_service_url = "control_service_url"
 
     class TaskArgs(enum.Enum):
+        adaptive_driver_threads = "adaptive_driver_threads"
         agent_mode = "agent_mode"
         batch_run_size = "batch_run_size"
+        device_affinity = "device_affinity"
+        driver_process_workers = "driver_process_workers"
+        hdc_connection_pool = "hdc_connection_pool"
         install_user0 = "install_user0"
         kill_uitest = "kill_uitest"
+        kit_lookahead = "kit_lookahead"
+        kit_lookahead_bandwidth = "kit_lookahead_bandwidth"
         max_log_line_in_html = "max_log_line_in_html"
         max_driver_threads = "max_driver_threads"
+        min_driver_threads = "min_driver_threads"
+        module_order = "module_order"
+        module_order_unknown = "module_order_unknown"
         pass_through = "pass_through"
         repeat = "repeat"
         screenrecorder = "screenrecorder"
         screenshot = "screenshot"
+        trace = "trace"
+        transfer_compress = "transfer_compress"
+        transfer_resumable = "transfer_resumable"
         ui_adaptive = "ui_adaptive"
         web_resource = "web_resource"
         wifi = "wifi"
@@ -76,7 +76,7 @@ def report_not_executed(report_path, test_drivers, error_message, task=None):
         repeat = task.config.repeat
 
     for test_driver in test_drivers:
-        _, test = test_driver
+        test = test_driver[1]
         module_name = test.source.module_name
         test_name = test.source.test_name
         repeat_round = get_repeat_round(test.unique_id)
@@ -16,7 +16,9 @@
 # limitations under the License.
 #
 
+import os
 import queue
+import threading
 import time
 import uuid
 import copy
@@ -30,7 +32,14 @@ from _core.exception import ExecuteTerminate
 from _core.exception import LiteDeviceError
 from _core.exception import DeviceError
 from _core.context.abs import Sub
+from _core.executor.concurrent import QUEUE_MONITOR_WAIT_TIMEOUT
 from _core.executor.concurrent import QueueMonitorThread
+from _core.environment.affinity import AffinityStats
+from _core.executor.adaptive import ConcurrencyController
+from _core.executor.ordering import ModuleDurations
+from _core.executor.ordering import order_test_drivers
+from _core.executor.ordering import predict_makespan
+from _core.executor.request import RepeatTestDriver
 from _core.logger import platform_logger
 from _core.constants import ModeType
 
@@ -47,6 +56,8 @@ from _core.context.center import Context
 from _core.context.handler import report_not_executed
 from _core.context.life_stage import ILifeStageListener
 from _core.context.life_stage import StageEvent
+from _core.trace import Tracer
+from _core.trace import trace_span
 
 LOG = platform_logger("Impl")
 
@@ -56,6 +67,10 @@ __all__ = ["BaseScheduler"]
 class BaseScheduler(Sub, ABC):
     _auto_retry = -1
     _queue_monitor_thread = None
+    _dispatch_condition = None
+    _module_durations = None
+    _duration_estimates = None
+    _concurrency_controller = None
     _channel = Context.command_queue()
     test_number = 0
     _stage_listeners: List[ILifeStageListener] = []
@@ -136,17 +151,27 @@ class BaseScheduler(Sub, ABC):
         self.set_repeat_index(max_repeat)
         task.config.update({ConfigConst.repeat: max_repeat})
 
+        # the later rounds refer to the first round, a driver template is
+        # copied before the first round runs
+        rounds = []
+        for test_driver in task.test_drivers:
+            driver, test = test_driver
+            actual_repeat = self._get_actual_repeat(test.source.module_name, module_repeat_in_testfile, repeat)
+            template = copy.deepcopy(driver) if actual_repeat > 1 else None
+            test.unique_id = "{}_{}".format(test.unique_id, 1)
+            rounds.append((test_driver, template, actual_repeat))
+
         repeat_drivers = []
         for index in range(1, max_repeat + 1):
-            for test_driver in task.test_drivers:
-                _, test = test_driver
-                actual_repeat = self._get_actual_repeat(test.source.module_name, module_repeat_in_testfile, repeat)
+            for test_driver, template, actual_repeat in rounds:
                 if index > actual_repeat:
                     continue
-                cur_test_driver = test_driver if index == 1 else copy.deepcopy(test_driver)
-                desc = cur_test_driver[1]
-                desc.unique_id = "{}_{}".format(desc.unique_id, index)
-                repeat_drivers.append(cur_test_driver)
+                if index == 1:
+                    repeat_drivers.append(test_driver)
+                    continue
+                test = test_driver[1]
+                repeat_drivers.append(RepeatTestDriver(
+                    template, test, "{}_{}".format(test.unique_id, index)))
         task.test_drivers = repeat_drivers
 
     def __execute__(self, task):
@@ -164,7 +189,9 @@ class BaseScheduler(Sub, ABC):
             available, unavailable = self._check_task(task)
             if available == 0:
                 return
-            self._repeat_test_drivers(task)
+            with trace_span("build plan"):
+                self._repeat_test_drivers(task)
+                self._order_test_drivers(task)
             self.test_number = len(task.test_drivers)
             self._do_execute_(task)
         except (ParamError, ValueError, TypeError, SyntaxError, AttributeError,
@@ -176,49 +203,146 @@ class BaseScheduler(Sub, ABC):
         finally:
             task_info = self.generate_task_report(task)
             listeners = self.__create_listeners__(task)
-            for listener in listeners:
-                listener.__ended__(LifeCycle.TestTask, task_info,
-                                   test_type=task_info.test_type, task=task)
+            with trace_span("task end"):
+                for listener in listeners:
+                    listener.__ended__(LifeCycle.TestTask, task_info,
+                                       test_type=task_info.test_type, task=task)
             finished = ExecuteFinished(unavailable, err_msg)
             self._on_execute_finished_(task, finished)
+            self._stop_tracer(task)
 
     def run_in_loop(self, task, run_func, loop_finally=None):
         try:
             current_driver_threads = {}
             test_drivers = task.test_drivers
             message_queue = queue.Queue()
+            # the queue monitor notifies it when a driver thread finishes,
+            # the loop notifies it when a driver is dispatched
+            self._dispatch_condition = threading.Condition()
             # execute test drivers
             params = message_queue, test_drivers, current_driver_threads
-            self._queue_monitor_thread = self._start_queue_monitor(*params)
+            self._queue_monitor_thread = self._start_queue_monitor(
+                *params, condition=self._dispatch_condition)
+            self._start_concurrency_controller(test_drivers,
+                                               current_driver_threads)
+            start_time, max_running = time.time(), 0
             while test_drivers:
-                if len(current_driver_threads) > self.max_driver_threads_size():
-                    time.sleep(3)
-                    continue
+                with self._dispatch_condition:
+                    while len(current_driver_threads) > \
+                            self.get_driver_threads_limit() and \
+                            self.is_executing():
+                        self._dispatch_condition.wait(
+                            QUEUE_MONITOR_WAIT_TIMEOUT)
                 # clear remaining test drivers when scheduler is terminated
                 if not self.is_executing():
                     LOG.info("Clear test drivers")
-                    self._clear_not_executed(task, test_drivers)
+                    with self._dispatch_condition:
+                        self._clear_not_executed(task, test_drivers)
+                        self._dispatch_condition.notify_all()
                     break
                 # 处理监控线程
                 # get test driver and device
                 self._run(run_func, task, *params)
                 self.peek_monitor(*params)
-                test_drivers.pop(0)
-            while True:
-                if not self._queue_monitor_thread.is_alive():
-                    break
-                time.sleep(3)
+                with self._dispatch_condition:
+                    max_running = max(max_running, len(current_driver_threads))
+                    test_drivers.pop(0)
+                    self._dispatch_condition.notify_all()
+            self._queue_monitor_thread.join()
+            self._report_makespan(time.time() - start_time, max_running)
+            AffinityStats.report_and_reset()
         finally:
+            self._stop_concurrency_controller()
             if callable(loop_finally):
                 loop_finally()
 
+    def get_driver_threads_limit(self):
+        """
+        Returns the live limit of the drivers running at once, which the
+        adaptive concurrency controller adjusts when it is enabled
+        """
+        controller = self._concurrency_controller
+        if controller is not None:
+            return controller.get_limit()
+        return self.max_driver_threads_size()
+
+    def _start_concurrency_controller(self, test_drivers,
+                                      current_driver_threads):
+        from _core.variables import Variables
+        if not Variables.config.get_adaptive_driver_threads():
+            return
+
+        def get_demand():
+            return len(current_driver_threads), len(test_drivers)
+
+        def get_devices():
+            return list(getattr(self, "used_devices", {}).values())
+
+        controller = ConcurrencyController(
+            Variables.config.get_min_driver_threads(),
+            self.max_driver_threads_size(), self._dispatch_condition)
+        controller.start(get_demand, get_devices)
+        self._concurrency_controller = controller
+
+    def _stop_concurrency_controller(self):
+        controller, self._concurrency_controller = \
+            self._concurrency_controller, None
+        if controller is not None:
+            controller.stop()
+
+    def _order_test_drivers(self, task):
+        """
+        Loads the module durations of the past tasks and orders the test
+        drivers as configured by the module_order task arg.
+        """
+        report_path = getattr(task.config, ConfigConst.report_path, "")
+        if not report_path:
+            return
+        report_root = os.path.dirname(os.path.abspath(report_path))
+        durations = ModuleDurations(
+            os.path.join(report_root, ModuleDurations.file_name))
+        if not durations.load():
+            history_report_path = getattr(
+                task.config, ConfigConst.history_report_path, "")
+            if history_report_path:
+                durations.load_summary_report(history_report_path)
+        self._module_durations = durations
+
+        from _core.variables import Variables
+        order = Variables.config.get_module_order()
+        task.test_drivers, self._duration_estimates = order_test_drivers(
+            task.test_drivers, durations, order,
+            Variables.config.get_module_order_unknown())
+        LOG.debug("Order {} test drivers by {}".format(
+            len(task.test_drivers), order))
+
+    def record_module_duration(self, module_name, duration):
+        if self._module_durations is not None:
+            self._module_durations.update(module_name, duration)
+
+    def _report_makespan(self, actual, max_running):
+        if self._module_durations is None:
+            return
+        self._module_durations.save()
+        if self._duration_estimates and \
+                any(value is not None for value in self._duration_estimates):
+            predicted = predict_makespan(self._duration_estimates,
+                                         max(max_running, 1))
+            LOG.info("Makespan predicted: {:.1f}s, actual: {:.1f}s, with {} "
+                     "parallel drivers".format(predicted, actual,
+                                               max(max_running, 1)))
+        self._module_durations = None
+        self._duration_estimates = None
+
     def is_monitor_alive(self):
         return self._queue_monitor_thread and self._queue_monitor_thread.is_alive()
 
     def peek_monitor(self, message_queue, test_drivers, current_driver_threads):
         if self.is_monitor_alive():
             return
-        self._start_queue_monitor(message_queue, test_drivers, current_driver_threads)
+        self._queue_monitor_thread = self._start_queue_monitor(
+            message_queue, test_drivers, current_driver_threads,
+            condition=self._dispatch_condition)
 
     @classmethod
     def _clear_not_executed(cls, task, test_drivers):
@@ -238,10 +362,10 @@ class BaseScheduler(Sub, ABC):
 
     @staticmethod
     def _start_queue_monitor(message_queue, test_drivers,
-                             current_driver_threads):
+                             current_driver_threads, condition=None):
         queue_monitor_thread = QueueMonitorThread(message_queue,
                                                   current_driver_threads,
-                                                  test_drivers)
+                                                  test_drivers, condition)
         queue_monitor_thread.daemon = True
         queue_monitor_thread.start()
         return queue_monitor_thread
@@ -251,10 +375,24 @@ class BaseScheduler(Sub, ABC):
 
     def _on_task_finished_(self):
         from _core.context.log import RuntimeLogs
+        # the tracer is still on when the task failed before it executed,
+        # there is no report to write the trace in then
+        Tracer.stop("")
         self._start_auto_retry()
         RuntimeLogs.stop_task_logcat()
         RuntimeLogs.stop_encrypt_log()
 
+    @staticmethod
+    def _stop_tracer(task):
+        """
+        Writes the trace into the report path, and next to the report in
+        reports/latest, which is copied before the trace is complete
+        """
+        from _core.report.result_reporter import ResultReporter
+        trace_file = Tracer.stop(task.config.report_path)
+        if trace_file:
+            ResultReporter.copy_to_latest(trace_file)
+
     @classmethod
     def __create_listeners__(cls, task) -> list:
         listeners = []
@@ -89,6 +89,7 @@ def get_device_options(options, test_source):
     device_options = []
     config_file = test_source.config_file
     environment_config = []
+    json_config = None
     from _core.testkit.json_parser import JsonParser
     if test_source.source_string and is_config_str(
             test_source.source_string):
@@ -104,6 +105,14 @@ def get_device_options(options, test_source):
 
     device_options = calculate_device_options(
         device_options, environment_config, options, test_source)
+    from _core.variables import Variables
+    if json_config is not None and Variables.config.get_device_affinity():
+        from _core.environment.affinity import get_kit_setup_tags
+        setup_tags = []
+        for kit in json_config.get_kits():
+            setup_tags.extend(get_kit_setup_tags(kit))
+        for device_option in device_options:
+            device_option.setup_tags = setup_tags
 
     if ConfigConst.component_mapper in options.keys():
         required_component = options.get(ConfigConst.component_mapper). \
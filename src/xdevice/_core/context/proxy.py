@@ -72,6 +72,24 @@ class Binder:
         if Context.get_scheduler():
             Context.get_scheduler().notify_stage(stage_event)
 
+    @staticmethod
+    def allocate_idle_environment(device_options):
+        """
+        Applies for the devices of the options which are idle now, for a
+        driver that can use more devices than its module asked for
+        """
+        from _core.context.center import Context
+        scheduler = Context.get_scheduler()
+        if scheduler is None:
+            return None
+        return scheduler.__allocate_idle_environment__(device_options)
+
+    @staticmethod
+    def free_environment(environment):
+        from _core.context.center import Context
+        if Context.get_scheduler():
+            Context.get_scheduler().__free_environment__(environment)
+
     @staticmethod
     def get_tdd_config():
         from _core.context.tdd import TSD
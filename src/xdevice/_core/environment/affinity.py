@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import threading
+
+from _core.logger import platform_logger
+
+__all__ = ["AFFINITY_MAX_WAIT", "AffinityStats", "clear_setup",
+           "discard_setup", "get_kit_setup_tags", "record_setup",
+           "score_device"]
+
+LOG = platform_logger("Affinity")
+# max time (s) in all to wait for a busy device that has more of the setup
+# done, rather than taking a free one
+AFFINITY_MAX_WAIT = 2
+# kit config keys that do not describe what the kit leaves on the device
+_IGNORED_KIT_KEYS = ["type", "paths", "device_name", "env_index"]
+
+
+def get_kit_setup_tags(kit_config):
+    """
+    Returns the tags of what a kit sets up on a device, one per installed
+    app, pushed file, command and so on, such as 'PushKit:push:a.so->/data'.
+    """
+    if not isinstance(kit_config, dict):
+        return []
+    kit_type = kit_config.get("type", "")
+    tags = []
+    for key, value in sorted(kit_config.items()):
+        if key in _IGNORED_KIT_KEYS:
+            continue
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            if not isinstance(item, str):
+                item = json.dumps(item, sort_keys=True)
+            tags.append("{}:{}:{}".format(kit_type, key, item))
+    return tags
+
+
+def record_setup(device, tags):
+    """
+    Records on the device that the tags were set up.
+    """
+    if not tags:
+        return
+    setup_tags = getattr(device, "setup_tags", None)
+    if setup_tags is None:
+        setup_tags = set()
+        setattr(device, "setup_tags", setup_tags)
+    setup_tags.update(tags)
+
+
+def discard_setup(device, tags):
+    """
+    Forgets the tags of a kit whose teardown undid its setup.
+    """
+    setup_tags = getattr(device, "setup_tags", None)
+    if setup_tags and tags:
+        setup_tags.difference_update(tags)
+
+
+def clear_setup(device):
+    """
+    Forgets all the setup of the device, when it is rebooted, flashed or
+    recovered.
+    """
+    setup_tags = getattr(device, "setup_tags", None)
+    if setup_tags:
+        setup_tags.clear()
+
+
+def score_device(device, tags):
+    """
+    Returns how many of the tags are still set up on the device.
+    """
+    setup_tags = getattr(device, "setup_tags", None)
+    if not tags or not setup_tags:
+        return 0
+    return sum(1 for tag in tags if tag in setup_tags)
+
+
+class AffinityStats:
+    """
+    Setup items found on the devices allocated in the current task. The kits
+    see the state left on the device, such as the push cache skipping
+    unchanged files.
+    """
+    lock = threading.Lock()
+    matched_tags = 0
+
+    @classmethod
+    def add(cls, matched_tags):
+        with cls.lock:
+            cls.matched_tags += matched_tags
+
+    @classmethod
+    def report_and_reset(cls):
+        with cls.lock:
+            if cls.matched_tags:
+                LOG.info("Device affinity allocated devices having {} of "
+                         "the setup items of their modules".format(
+                             cls.matched_tags))
+            cls.matched_tags = 0
@@ -161,11 +161,15 @@ class EnvironmentManager(object):
 
         EnvironmentManager.__init_flag = False
 
-    def apply_environment(self, device_options):
+    def apply_environment(self, device_options, timeout=3):
+        """
+        Applies for the devices of the options. With timeout 0 the managers
+        which support it return at once when no device is available.
+        """
         environment = Environment()
         for device_option in device_options:
             LOG.debug("Visit options to find device")
-            device = self.apply_device(device_option)
+            device = self.apply_device(device_option, timeout)
             if device is not None:
                 index = self.get_config_device_index(device)
                 environment.add_device(device, index)
@@ -324,6 +328,10 @@ class DeviceSelectionOption(object):
         self.required_manager = ""
         self.required_component = ""
         self.env_index = None
+        # what the module kits set up, used to prefer devices that have it,
+        # empty unless device_affinity is true
+        self.setup_tags = []
+        self.affinity_deadline = None
 
     def get_label(self):
         return self.label
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import threading
+import time
+from collections import deque
+
+from _core.logger import platform_logger
+
+__all__ = ["HostLoad", "CommandLatency", "ConcurrencyController"]
+
+LOG = platform_logger("Adaptive")
+# interval (s) between two decisions
+ADJUST_INTERVAL = 5
+# host cpu busy (%) above which the limit is lowered, below which it may rise
+CPU_HIGH, CPU_LOW = 90, 70
+# host io wait (%) above which the limit is lowered, below which it may rise
+IOWAIT_HIGH, IOWAIT_LOW = 20, 10
+# ratio of the recent device command latency to its baseline above which
+# the limit is lowered, below which it may rise
+LATENCY_HIGH, LATENCY_LOW = 3, 1.5
+# latency probes kept per device, one is run every ADJUST_INTERVAL
+LATENCY_WINDOW = 6
+# max time (s) the probes of all devices may take in a decision
+PROBE_TIMEOUT = 10
+
+
+class HostLoad:
+    """
+    Samples the host cpu busy and io wait percentages since the last sample,
+    from psutil when it is installed, else from /proc/stat. Where neither is
+    available the sample is None.
+    """
+
+    def __init__(self):
+        self.last_times = None
+
+    def sample(self):
+        times = self._read_cpu_times()
+        if times is None:
+            return None
+        last_times, self.last_times = self.last_times, times
+        if last_times is None:
+            return None
+        deltas = [max(now - last, 0) for now, last in zip(times, last_times)]
+        total = sum(deltas)
+        if total <= 0:
+            return None
+        idle, iowait = deltas[0], deltas[1]
+        return (total - idle - iowait) * 100 / total, iowait * 100 / total
+
+    @staticmethod
+    def _read_cpu_times():
+        """
+        Returns (idle, iowait, others) cpu times of the host
+        """
+        try:
+            import psutil
+            times = psutil.cpu_times()
+            idle, iowait = times.idle, getattr(times, "iowait", 0)
+            return idle, iowait, sum(times) - idle - iowait
+        except ImportError:
+            pass
+        try:
+            with open("/proc/stat", encoding="utf-8") as stat_file:
+                fields = [float(value) for value in
+                          stat_file.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        if len(fields) < 5:
+            return None
+        return fields[3], fields[4], sum(fields) - fields[3] - fields[4]
+
+
+class CommandLatency:
+    """
+    Latency (s) of a fixed trivial command, probed on the devices in use by
+    the controller through their probe_latency method. The baseline of a
+    device is the lowest median seen for it, the ratio of the recent median
+    to the baseline tells how congested the device connections are.
+    """
+    lock = threading.Lock()
+    samples = {}
+    baselines = {}
+
+    @classmethod
+    def record(cls, device_sn, latency):
+        with cls.lock:
+            samples = cls.samples.get(device_sn)
+            if samples is None:
+                samples = cls.samples.setdefault(
+                    device_sn, deque(maxlen=LATENCY_WINDOW))
+            samples.append(latency)
+
+    @classmethod
+    def get_ratio(cls):
+        """
+        Returns the highest recent-to-baseline latency ratio of the devices,
+        None when no device has enough commands yet
+        """
+        ratios = []
+        with cls.lock:
+            for device_sn, samples in cls.samples.items():
+                if len(samples) < LATENCY_WINDOW // 2:
+                    continue
+                median = sorted(samples)[len(samples) // 2]
+                baseline = min(cls.baselines.get(device_sn, median), median)
+                cls.baselines[device_sn] = baseline
+                if baseline > 0:
+                    ratios.append(median / baseline)
+        return max(ratios) if ratios else None
+
+    @classmethod
+    def probe(cls, devices, timeout=PROBE_TIMEOUT):
+        """
+        Probes the devices which support it, until timeout (s) runs out
+        """
+        deadline = time.time() + timeout
+        for device in devices:
+            probe_latency = getattr(device, "probe_latency", None)
+            if not callable(probe_latency) or time.time() > deadline:
+                continue
+            try:
+                cls.record(device.device_sn, probe_latency())
+            except Exception as error:
+                LOG.debug("Probe latency of device failed, {}".format(error))
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.samples.clear()
+            cls.baselines.clear()
+
+
+class ConcurrencyController:
+    """
+    Adjusts the number of drivers running at once between min_size and
+    max_size from the host load. Every ADJUST_INTERVAL seconds the limit is
+    lowered by one when the host cpu, io wait or device command latency is
+    high, raised by one when they are all low and drivers wait for the
+    limit, and kept otherwise. Every decision is logged.
+    """
+
+    def __init__(self, min_size, max_size, condition=None,
+                 interval=ADJUST_INTERVAL):
+        self.min_size = max(1, min(min_size, max_size))
+        self.max_size = max_size
+        self.limit = max(self.min_size,
+                         min(self.max_size, os.cpu_count() or 1))
+        self.condition = condition
+        self.interval = interval
+        self.host_load = HostLoad()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.get_demand = None
+        self.get_devices = None
+
+    def start(self, get_demand, get_devices=None):
+        """
+        Starts adjusting, get_demand returns how many drivers are running
+        and how many wait to be dispatched, get_devices the devices in use
+        whose command latency is probed
+        """
+        self.get_demand = get_demand
+        self.get_devices = get_devices
+        CommandLatency.reset()
+        self.host_load.sample()
+        LOG.info("Adaptive driver concurrency between {} and {}, starts at "
+                 "{}".format(self.min_size, self.max_size, self.limit))
+        self.thread = threading.Thread(target=self._run,
+                                       name="ConcurrencyController")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def get_limit(self):
+        return self.limit
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.adjust()
+            except Exception as error:
+                LOG.debug("Adjust driver concurrency failed, {}".format(error))
+
+    def adjust(self):
+        load = self.host_load.sample()
+        cpu, iowait = load if load else (None, None)
+        if self.get_devices is not None:
+            CommandLatency.probe(self.get_devices())
+        latency = CommandLatency.get_ratio()
+        running, waiting = self.get_demand() if self.get_demand else (0, 0)
+        limit, reason = self.decide(cpu, iowait, latency, running, waiting)
+        measures = "cpu {}, iowait {}, latency ratio {}, running {}, " \
+                   "waiting {}".format(_format(cpu, "%"),
+                                       _format(iowait, "%"),
+                                       _format(latency), running, waiting)
+        if limit == self.limit:
+            LOG.debug("Keep driver concurrency at {}, {} ({})".format(
+                limit, reason, measures))
+            return
+        LOG.info("{} driver concurrency from {} to {}, {} ({})".format(
+            "Raise" if limit > self.limit else "Lower", self.limit, limit,
+            reason, measures))
+        self.limit = limit
+        if self.condition is not None:
+            with self.condition:
+                self.condition.notify_all()
+
+    def decide(self, cpu, iowait, latency, running, waiting):
+        """
+        Returns the new limit and the reason of the decision
+        """
+        if cpu is not None and cpu > CPU_HIGH:
+            reason = "host cpu is high"
+        elif iowait is not None and iowait > IOWAIT_HIGH:
+            reason = "host io wait is high"
+        elif latency is not None and latency > LATENCY_HIGH:
+            reason = "device command latency is high"
+        else:
+            reason = ""
+        if reason:
+            return max(self.min_size, self.limit - 1), reason
+        if cpu is None and latency is None:
+            return self.limit, "no load measure"
+        if (cpu is not None and cpu > CPU_LOW) or \
+                (iowait is not None and iowait > IOWAIT_LOW) or \
+                (latency is not None and latency > LATENCY_LOW):
+            return self.limit, "load is moderate"
+        if not waiting or running < self.limit:
+            return self.limit, "no driver waits for the limit"
+        return min(self.max_size, self.limit + 1), "load is low"
+
+
+def _format(value, unit=""):
+    return "-" if value is None else "{:.1f}{}".format(value, unit)
@@ -21,6 +21,8 @@ import os
 import shutil
 import threading
 import time
+from concurrent.futures import CancelledError
+from concurrent.futures import FIRST_COMPLETED
 from concurrent.futures import ThreadPoolExecutor
 from concurrent.futures import wait
 
@@ -59,8 +61,12 @@ from _core.testkit.json_parser import JsonParser
 from _core.testkit.kit import do_common_module_kit_setup
 from _core.testkit.kit import do_common_module_kit_teardown
 from _core.testkit.kit import get_kit_instances
+from _core.trace import trace_span
 
 LOG = platform_logger("Concurrent")
+QUEUE_MONITOR_WAIT_TIMEOUT = 3
+# end of the params of concurrent_execute_stream, None may be params
+_NO_PARAMS = object()
 
 
 class Concurrent:
@@ -91,6 +97,131 @@ class Concurrent:
                 result_list.append((future.result(), future_params[future]))
             return result_list
 
+    @classmethod
+    def concurrent_execute_stream(cls, func, params_list, max_size=8,
+                                  timeout=None, max_failures=None,
+                                  max_pending=None):
+        """
+        Execute target function concurrently and yield the results as they
+        complete, not in the order of params_list
+        :param func: target function name
+        :param params_list: the iterable of params in these target functions,
+            it is consumed as the functions complete, so it may be a generator
+        :param max_size: the max size of thread in thread pool
+        :param timeout: the max time (s) a function may run, a function that
+            runs longer is yielded with a TimeoutError and left to finish in
+            its thread, which counts against max_pending until it does. When
+            every thread is held so, a function that waits longer than
+            timeout for a thread is cancelled and yielded with a TimeoutError
+        :param max_failures: stop when this many functions failed, the
+            functions not started yet are cancelled and not yielded
+        :param max_pending: the max number of functions submitted and not
+            yielded yet, 2 * max_size by default
+        :return: a generator of (result, params, error), error is None when
+            the function succeeded
+        """
+        max_pending = max_pending or max_size * 2
+        params_iter = iter(params_list)
+        executor = ThreadPoolExecutor(max_size)
+        # future: (params, [start time, or None when not started],
+        #          submit time)
+        pending = {}
+        # futures yielded with a timeout which still hold a thread
+        timed_out = set()
+        exhausted = [False]
+        failures = 0
+
+        def run(func_params, started):
+            started[0] = time.time()
+            return func(*func_params)
+
+        def submit(force=False):
+            """
+            Submits up to the window, with force one function even when
+            timed out functions fill it
+            """
+            timed_out.difference_update(
+                [future for future in timed_out if future.done()])
+            while len(pending) + len(timed_out) < max_pending or \
+                    (force and not pending):
+                params = next(params_iter, _NO_PARAMS)
+                if params is _NO_PARAMS:
+                    exhausted[0] = True
+                    return
+                started = [None]
+                pending[executor.submit(run, params, started)] = \
+                    (params, started, time.time())
+
+        def get_deadline(started, submit_time):
+            if started[0] is not None:
+                return started[0] + timeout
+            if len(timed_out) >= max_size:
+                return submit_time + timeout
+            return None
+
+        def get_timeouts():
+            now = time.time()
+            futures = []
+            for future, (_, started, submit_time) in pending.items():
+                deadline = get_deadline(started, submit_time)
+                if deadline is not None and now > deadline:
+                    futures.append(future)
+            return futures
+
+        try:
+            submit()
+            while pending or (timed_out and not exhausted[0]):
+                if not pending:
+                    # timed out functions fill the window, wait for one of
+                    # them to end, or go on with one more function after
+                    # timeout, which waits in turn for a thread
+                    done, _ = wait(timed_out, timeout=timeout,
+                                   return_when=FIRST_COMPLETED)
+                    submit(force=not done)
+                    continue
+                wait_time = None
+                if timeout is not None:
+                    deadlines = [get_deadline(started, submit_time)
+                                 for _, started, submit_time in
+                                 pending.values()]
+                    deadlines = [item for item in deadlines
+                                 if item is not None]
+                    wait_time = max(0, min(deadlines) - time.time()) \
+                        if deadlines else timeout
+                # a timed out function that ends frees a thread
+                done, _ = wait(list(pending.keys()) + list(timed_out),
+                               timeout=wait_time, return_when=FIRST_COMPLETED)
+                outcomes = []
+                for future in done:
+                    if future not in pending:
+                        continue
+                    params, _, _ = pending.pop(future)
+                    try:
+                        outcomes.append((future.result(), params, None))
+                    except (Exception, CancelledError) as error:
+                        outcomes.append((None, params, error))
+                if timeout is not None:
+                    timed_out.difference_update(done)
+                    for future in get_timeouts():
+                        params, _, _ = pending.pop(future)
+                        if not future.cancel():
+                            timed_out.add(future)
+                        outcomes.append((None, params, TimeoutError(
+                            "no result in {}s".format(timeout))))
+                for outcome in outcomes:
+                    if outcome[2] is not None:
+                        failures += 1
+                    yield outcome
+                if max_failures is not None and failures >= max_failures:
+                    LOG.debug("Stop concurrent execute after {} "
+                              "failures".format(failures))
+                    return
+                submit()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
 
 class DriversThread(threading.Thread):
     def __init__(self, test_driver, task, environment, message_queue):
@@ -139,9 +270,14 @@ class DriversThread(threading.Thread):
                 return
             # setup device
             self._preset_devices(driver_request.config)
-            self._do_task_setup(driver_request)
+            module_name = test.source.module_name
+            self._settle_kit_lookahead(test)
+            with trace_span("task setup", module=module_name):
+                self._do_task_setup(driver_request)
             # driver execute
-            driver.__execute__(driver_request)
+            with trace_span("execute", module=module_name,
+                            driver=driver.__class__.__name__):
+                self._execute_driver(driver, driver_request)
         except Exception as exception:
             error_no = getattr(exception, "error_no", "00000")
             if self.environment is None:
@@ -164,6 +300,17 @@ class DriversThread(threading.Thread):
             self._handle_finally(driver, test, execute_message)
         redirect_driver_log_end(self.name)
 
+    def _execute_driver(self, driver, driver_request):
+        driver.__execute__(driver_request)
+
+    @staticmethod
+    def _settle_kit_lookahead(test):
+        kit_lookahead = getattr(Context.get_scheduler(), "kit_lookahead", None)
+        if kit_lookahead is not None:
+            with trace_span("settle kit lookahead",
+                            module=test.source.module_name):
+                kit_lookahead.settle(test.unique_id)
+
     def _preset_devices(self, config):
         if self.environment is None:
             return
@@ -193,6 +340,8 @@ class DriversThread(threading.Thread):
         end_time = time.time()
         LOG.info("Executed: %s, Execution Time: %s" % (
             source_content, calculate_elapsed_time(self.start_time, end_time)))
+        Context.get_scheduler().record_module_duration(
+            test.source.module_name, end_time - self.start_time)
 
         # inherit history report under retry mode
         if driver and test:
@@ -266,7 +415,8 @@ class DriversThread(threading.Thread):
                 if not Context.is_executing():
                     break
                 try:
-                    kit.__setup__(device, request=driver_request)
+                    with trace_span(kit.__class__.__name__, "kit"):
+                        kit.__setup__(device, request=driver_request)
                 except (ParamError, ExecuteTerminate, DeviceError,
                         LiteDeviceError, ValueError, TypeError,
                         SyntaxError, AttributeError) as exception:
@@ -629,7 +779,8 @@ class DriversDryRunThread(threading.Thread):
                 if not Context.is_executing():
                     break
                 try:
-                    kit.__setup__(device, request=driver_request)
+                    with trace_span(kit.__class__.__name__, "kit"):
+                        kit.__setup__(device, request=driver_request)
                 except (ParamError, ExecuteTerminate, DeviceError,
                         LiteDeviceError, ValueError, TypeError,
                         SyntaxError, AttributeError) as exception:
@@ -664,12 +815,20 @@ class DriversDryRunThread(threading.Thread):
 
 
 class QueueMonitorThread(threading.Thread):
-
-    def __init__(self, message_queue, current_driver_threads, test_drivers):
+    """
+    Collects the messages of finished driver threads. The condition is
+    shared with the dispatch loop: the monitor waits on it while nothing is
+    running and notifies it when a driver thread finishes, so the next
+    driver is dispatched right away.
+    """
+
+    def __init__(self, message_queue, current_driver_threads, test_drivers,
+                 condition=None):
         super().__init__()
         self.message_queue = message_queue
         self.current_driver_threads = current_driver_threads
         self.test_drivers = test_drivers
+        self.condition = condition or threading.Condition()
 
     def check_current_thread_status(self):
         for tid_key in self.current_driver_threads.keys():
@@ -681,13 +840,19 @@ class QueueMonitorThread(threading.Thread):
 
     def run(self):
         LOG.debug("Queue monitor thread start")
-        while self.test_drivers or self.current_driver_threads:
-            if not self.current_driver_threads:
-                time.sleep(3)
-                continue
+        while True:
+            with self.condition:
+                # the timeout only guards against a missed notification
+                while self.test_drivers and not self.current_driver_threads:
+                    self.condition.wait(QUEUE_MONITOR_WAIT_TIMEOUT)
+                if not self.test_drivers and not self.current_driver_threads:
+                    break
             execute_message = self.message_queue.get()
 
-            self.current_driver_threads.pop(execute_message.get_thread_name())
+            with self.condition:
+                self.current_driver_threads.pop(
+                    execute_message.get_thread_name(), None)
+                self.condition.notify_all()
 
             if execute_message.get_state() == ExecuteMessage.DEVICE_FINISH:
                 LOG.debug("Thread %s execute finished" % execute_message.get_thread_name())
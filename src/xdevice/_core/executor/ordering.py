@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import heapq
+import json
+import os
+import threading
+from xml.etree import ElementTree
+
+from _core.constants import FilePermission
+from _core.logger import platform_logger
+from _core.report.reporter_helper import ReportConstant
+
+__all__ = ["ModuleOrder", "UnknownDuration", "ModuleDurations",
+           "order_test_drivers", "predict_makespan"]
+
+LOG = platform_logger("Ordering")
+
+
+class ModuleOrder:
+    fifo = "fifo"
+    # longest processing time first
+    lpt = "lpt"
+
+
+class UnknownDuration:
+    """
+    Where modules without a duration history go in the lpt order
+    """
+    first = "first"
+    last = "last"
+    # estimated as the mean duration of the known modules
+    mean = "mean"
+
+
+class ModuleDurations:
+    """
+    Module durations (s) from the past tasks, kept as a json file in the
+    reports directory. A new duration is blended with the recorded one, so
+    one slow run does not reorder the next task on its own.
+    """
+    file_name = "module_durations.json"
+    smoothing = 0.5
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.durations = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        if not os.path.exists(self.file_path):
+            return False
+        try:
+            with open(self.file_path, encoding="utf-8") as json_file:
+                durations = json.load(json_file)
+        except (OSError, ValueError) as error:
+            LOG.warning("Load module durations from {} failed, {}".format(
+                self.file_path, error))
+            return False
+        with self.lock:
+            self.durations.update({name: float(value)
+                                   for name, value in durations.items()})
+        return True
+
+    def load_summary_report(self, report_path):
+        """
+        Seeds the durations with the suite times of a summary report, for
+        the modules that have no duration yet.
+        """
+        summary_report = os.path.join(report_path,
+                                      ReportConstant.summary_data_report)
+        if not os.path.exists(summary_report):
+            return False
+        try:
+            root = ElementTree.parse(summary_report).getroot()
+        except ElementTree.ParseError as error:
+            LOG.warning("Parse {} failed, {}".format(summary_report, error))
+            return False
+        durations = {}
+        for suite in root.iter(ReportConstant.test_suite):
+            module_name = suite.get(ReportConstant.module_name)
+            if not module_name:
+                continue
+            try:
+                suite_time = float(suite.get(ReportConstant.time, 0))
+            except ValueError:
+                continue
+            durations[module_name] = durations.get(module_name, 0) + \
+                suite_time
+        with self.lock:
+            for module_name, duration in durations.items():
+                self.durations.setdefault(module_name, duration)
+        LOG.debug("Load {} module durations from {}".format(
+            len(durations), summary_report))
+        return bool(durations)
+
+    def get(self, module_name):
+        with self.lock:
+            return self.durations.get(module_name)
+
+    def update(self, module_name, duration):
+        with self.lock:
+            recorded = self.durations.get(module_name)
+            if recorded is not None:
+                duration = recorded * self.smoothing + \
+                    duration * (1 - self.smoothing)
+            self.durations[module_name] = round(duration, 3)
+
+    def save(self):
+        with self.lock:
+            content = json.dumps(self.durations, indent=2, sort_keys=True)
+        try:
+            file_fd = os.open(self.file_path, os.O_CREAT | os.O_WRONLY |
+                              os.O_TRUNC, FilePermission.mode_644)
+            with os.fdopen(file_fd, mode="w", encoding="utf-8") as json_file:
+                json_file.write(content)
+        except OSError as error:
+            LOG.warning("Save module durations to {} failed, {}".format(
+                self.file_path, error))
+
+
+def order_test_drivers(test_drivers, durations, order=ModuleOrder.fifo,
+                       unknown=UnknownDuration.mean):
+    """
+    Orders the test drivers and estimates their durations.
+    Return the ordered test drivers and the estimated duration of each of
+    them, None for the unknown ones when there is no known module at all.
+    """
+    known = [durations.get(test_driver[1].source.module_name)
+             for test_driver in test_drivers]
+    known_values = [value for value in known if value is not None]
+    mean = sum(known_values) / len(known_values) if known_values else None
+    estimates = [mean if value is None else value for value in known]
+    if order != ModuleOrder.lpt or not known_values:
+        return list(test_drivers), estimates
+
+    def sort_key(index):
+        if known[index] is None and unknown == UnknownDuration.first:
+            return 0, 0, index
+        if known[index] is None and unknown == UnknownDuration.last:
+            return 2, 0, index
+        return 1, -estimates[index], index
+
+    indexes = sorted(range(len(test_drivers)), key=sort_key)
+    return [test_drivers[index] for index in indexes], \
+        [estimates[index] for index in indexes]
+
+
+def predict_makespan(estimates, workers):
+    """
+    Predicts the makespan of durations dispatched in order to the first
+    free one of workers slots. Unknown durations count as zero.
+    """
+    if not estimates or workers < 1:
+        return 0
+    slots = [0.0] * workers
+    for estimate in estimates:
+        heapq.heappush(slots, heapq.heappop(slots) + (estimate or 0))
+    return max(slots)
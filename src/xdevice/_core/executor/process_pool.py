@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import itertools
+import multiprocessing
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from _core.context.center import Context
+from _core.exception import ExecuteTerminate
+from _core.executor.concurrent import DriversThread
+from _core.executor.process_worker import EVENT_DONE
+from _core.executor.process_worker import EVENT_LISTENER
+from _core.executor.process_worker import EVENT_LOG
+from _core.executor.process_worker import execute_driver
+from _core.executor.process_worker import init_worker
+from _core.executor.process_worker import ping
+from _core.executor.request import Request
+from _core.logger import platform_logger
+
+__all__ = ["DriverProcessPool", "ProcessDriversThread"]
+
+LOG = platform_logger("ProcessPool")
+# time (s) to wait for the events of a worker that broke
+EVENT_DRAIN_TIMEOUT = 5
+# interval (s) to check if the task is terminated while a driver runs
+TERMINATE_CHECK_INTERVAL = 1
+
+
+class DriverProcessPool:
+    """
+    Runs host drivers in worker processes, so that drivers which are CPU
+    bound do not serialize on the GIL of the scheduler process. The driver
+    and its request are pickled to a worker, the listener events and logs of
+    the driver stream back over a queue and are dispatched to the listeners
+    and driver log of the calling thread. The result file path and the
+    attributes the driver has when it ends come back with the return value
+    and are set on the driver of the scheduler process.
+    The scheduler process runs threads, which fork does not copy safely, so
+    workers come from a fork server, or are spawned where there is none.
+    Either way they start from a fresh interpreter: they import xdevice,
+    which loads the plugins, and the task config only reaches them through
+    the request.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = None
+        self.event_queue = None
+        self.stop_event = None
+        self.channels = {}
+        self.lock = threading.Lock()
+        self.tokens = itertools.count(1)
+        self.dispatch_thread = None
+
+    def start(self):
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            # the fork server loads the plugins once for all the workers
+            context.set_forkserver_preload(["xdevice"])
+        else:
+            context = multiprocessing.get_context("spawn")
+        self.event_queue = context.Queue()
+        self.stop_event = context.Event()
+        self.executor = ProcessPoolExecutor(
+            self.workers, mp_context=context, initializer=init_worker,
+            initargs=(self.event_queue, self.stop_event))
+        self.dispatch_thread = threading.Thread(
+            target=self._dispatch_events, name="ProcessPoolEvents")
+        self.dispatch_thread.daemon = True
+        self.dispatch_thread.start()
+        # start the workers now, so the first drivers do not wait for them
+        warm_up = [self.executor.submit(ping)
+                   for _ in range(self.workers)]
+        for future in warm_up:
+            future.result()
+        LOG.info("Driver process pool started with {} workers".format(
+            self.workers))
+
+    def shutdown(self):
+        if self.executor is None:
+            return
+        self.stop_event.set()
+        self.executor.shutdown(wait=True)
+        self.event_queue.put(None)
+        self.dispatch_thread.join()
+        self.event_queue.close()
+        self.executor = None
+
+    @staticmethod
+    def dump_driver(driver, request):
+        """
+        Returns the driver and its request pickled for a worker, None when
+        the driver can not run in a worker, that is it needs a device or it
+        can not be pickled.
+        """
+        if request.get_devices():
+            return None
+        try:
+            return pickle.dumps((driver, _get_worker_request(request)))
+        except Exception as error:
+            LOG.debug("Driver {} can not run in a worker, {}".format(
+                driver.__class__.__name__, error))
+            return None
+
+    def execute(self, driver, payload, listeners, thread_name):
+        """
+        Executes the driver pickled in payload by dump_driver in a worker,
+        sets the state it ends with on driver and returns its result file
+        path.
+        """
+        token = next(self.tokens)
+        channel = _Channel(listeners, thread_name)
+        with self.lock:
+            self.channels[token] = channel
+        try:
+            future = self.executor.submit(execute_driver, token, payload)
+            while True:
+                try:
+                    result, error, state = future.result(
+                        TERMINATE_CHECK_INTERVAL)
+                    break
+                except FutureTimeoutError:
+                    if not Context.is_executing():
+                        self.stop_event.set()
+            # the events of the driver are all in the queue before the
+            # done event, which follows the return value
+            channel.done.wait()
+        except BrokenProcessPool as error:
+            channel.done.wait(EVENT_DRAIN_TIMEOUT)
+            raise ExecuteTerminate(
+                "Worker of driver {} broke, {}".format(
+                    driver.__class__.__name__, error))
+        finally:
+            with self.lock:
+                self.channels.pop(token, None)
+        for name, value in state.items():
+            setattr(driver, name, value)
+        if error:
+            raise error
+        return result
+
+    def _dispatch_events(self):
+        while True:
+            event = self.event_queue.get()
+            if event is None:
+                break
+            kind, token = event[0], event[1]
+            with self.lock:
+                channel = self.channels.get(token)
+            if channel is None:
+                continue
+            try:
+                channel.dispatch(kind, event[2:])
+            except Exception as error:
+                LOG.error("Dispatch worker event failed, {}".format(error))
+
+
+class ProcessDriversThread(DriversThread):
+    """
+    Driver thread that executes an eligible driver in the process pool, and
+    the others in the thread as usual.
+    """
+
+    def __init__(self, test_driver, task, environment, message_queue,
+                 driver_pool):
+        super().__init__(test_driver, task, environment, message_queue)
+        self.driver_pool = driver_pool
+
+    def _execute_driver(self, driver, driver_request):
+        payload = self.driver_pool.dump_driver(driver, driver_request)
+        if payload is None:
+            super()._execute_driver(driver, driver_request)
+            return
+        result = self.driver_pool.execute(
+            driver, payload, driver_request.listeners, self.name)
+        if result:
+            setattr(driver, "result", result)
+
+
+class _Channel:
+    """
+    Where the events of a driver running in a worker go
+    """
+
+    def __init__(self, listeners, thread_name):
+        self.listeners = listeners or []
+        self.thread_name = thread_name
+        self.done = threading.Event()
+
+    def dispatch(self, kind, args):
+        if kind == EVENT_DONE:
+            self.done.set()
+        elif kind == EVENT_LOG:
+            record = args[0]
+            # the driver log of the thread takes the records by thread name
+            record.threadName = self.thread_name
+            logger = platform_logger(record.name)
+            getattr(logger, "platform_log", logger).handle(record)
+        elif kind == EVENT_LISTENER:
+            name, lifecycle, test_result, kwargs = args
+            for listener in self.listeners:
+                getattr(listener, name)(lifecycle, test_result, **kwargs)
+
+
+def _get_worker_request(request):
+    return Request(request.uuid, request.root, [], request.config)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+import pickle
+import threading
+from logging.handlers import QueueHandler
+
+from _core.constants import LogType
+from _core.context.center import Context
+from _core.exception import ExecuteTerminate
+from _core.interface import IListener
+from _core.plugin import Plugin
+from _core.plugin import get_plugin
+
+__all__ = ["EVENT_LOG", "EVENT_LISTENER", "EVENT_DONE", "init_worker",
+           "ping", "execute_driver"]
+
+# this module is the entry of the workers of the driver process pool, which
+# start from a fresh interpreter, so it imports no executor module: those
+# import the scheduler through the plugins, which imports them back half
+# initialized
+
+EVENT_LOG = "log"
+EVENT_LISTENER = "listener"
+EVENT_DONE = "done"
+
+# state of a worker process, one driver runs in a worker at a time
+_worker_queue = None
+_worker_token = None
+
+
+class _WorkerListener(IListener):
+    """
+    Sends the events of the driver to the scheduler process
+    """
+
+    def __started__(self, lifecycle, test_result):
+        _put_event(EVENT_LISTENER, "__started__", lifecycle, test_result, {})
+
+    def __ended__(self, lifecycle, test_result=None, **kwargs):
+        _put_event(EVENT_LISTENER, "__ended__", lifecycle, test_result,
+                   kwargs)
+
+    def __skipped__(self, lifecycle, test_result, **kwargs):
+        _put_event(EVENT_LISTENER, "__skipped__", lifecycle, test_result,
+                   kwargs)
+
+    def __failed__(self, lifecycle, test_result, **kwargs):
+        _put_event(EVENT_LISTENER, "__failed__", lifecycle, test_result,
+                   kwargs)
+
+
+class _WorkerLogHandler(QueueHandler):
+
+    def enqueue(self, record):
+        _put_event(EVENT_LOG, record)
+
+
+def _put_event(kind, *args):
+    _worker_queue.put((kind, _worker_token) + args)
+
+
+def init_worker(event_queue, stop_event):
+    global _worker_queue
+    # a spawned worker loads the plugins here, the fork server preloads them
+    import xdevice  # noqa: F401
+    _worker_queue = event_queue
+    handler = _WorkerLogHandler(event_queue)
+    handler.setLevel(logging.DEBUG)
+    for log_type in [LogType.tool, LogType.device]:
+        for log_plugin in get_plugin(Plugin.LOG, log_type):
+            log_plugin.handlers = [handler]
+            for log in getattr(log_plugin, "loggers", {}).values():
+                for old_handler in list(log.platform_log.handlers):
+                    log.del_platform_handler(old_handler)
+                log.add_platform_handler(handler)
+                log.add_platform_level(logging.DEBUG)
+                log.encrypt_log = None
+
+    def stop_when_terminated():
+        stop_event.wait()
+        Context.set_execute_status(False)
+
+    watcher = threading.Thread(target=stop_when_terminated)
+    watcher.daemon = True
+    watcher.start()
+
+
+def ping():
+    return True
+
+
+def _get_driver_state(driver, request):
+    """
+    Returns the attributes of the driver which can be pickled back, but the
+    request objects of the worker, which only make sense in it
+    """
+    worker_objects = [request, request.config, request.listeners]
+    state = {}
+    for name, value in vars(driver).items():
+        if any(value is item for item in worker_objects):
+            continue
+        try:
+            pickle.dumps(value)
+        except Exception as _:
+            continue
+        state[name] = value
+    return state
+
+
+def execute_driver(token, payload):
+    global _worker_token
+    _worker_token = token
+    driver, request = pickle.loads(payload)
+    request.listeners = [_WorkerListener()]
+    result, error = "", None
+    try:
+        driver.__execute__(request)
+        result = driver.__result__() or getattr(driver, "result", "")
+    except Exception as exception:
+        try:
+            pickle.dumps(exception)
+            error = exception
+        except Exception:
+            error = ExecuteTerminate(str(exception))
+    finally:
+        _put_event(EVENT_DONE)
+        _worker_token = None
+    return result, error, _get_driver_state(driver, request)
@@ -16,6 +16,7 @@
 # limitations under the License.
 #
 
+import copy
 import os
 import time
 
@@ -33,7 +34,7 @@ from _core.testkit.json_parser import JsonParser
 from _core.testkit.kit import get_kit_instances
 from _core.utils import get_repeat_round
 
-__all__ = ["Descriptor", "Task", "Request"]
+__all__ = ["Descriptor", "Task", "Request", "RepeatTestDriver"]
 LOG = platform_logger("Request")
 
 
@@ -59,6 +60,53 @@ class Descriptor:
         return self.unique_id
 
 
+class RepeatTestDriver:
+    """
+    A later repeat round of a test driver, used as its (driver, descriptor)
+    pair. It only refers to the driver and descriptor of the first round.
+    The descriptor of the round is a shallow copy with the round's unique
+    id, sharing the source with the other rounds. The driver is copied from
+    a template driver that has not run, on first access, which is when the
+    round is dispatched.
+    """
+    __slots__ = ("template", "test", "unique_id", "_driver", "_desc")
+
+    def __init__(self, template, test, unique_id):
+        self.template = template
+        self.test = test
+        self.unique_id = unique_id
+        self._driver = None
+        self._desc = None
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = copy.deepcopy(self.template)
+        return self._driver
+
+    @property
+    def descriptor(self):
+        if self._desc is None:
+            desc = copy.copy(self.test)
+            desc.unique_id = self.unique_id
+            self._desc = desc
+        return self._desc
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, index):
+        if index in (0, -2):
+            return self.driver
+        if index in (1, -1):
+            return self.descriptor
+        raise IndexError("test driver index out of range")
+
+    def __iter__(self):
+        yield self.driver
+        yield self.descriptor
+
+
 class Task:
     """
     TestTask describes the tree of tests and suites
@@ -52,9 +52,15 @@ from _core.constants import ReportConst
 from _core.executor.concurrent import DriversThread
 from _core.executor.concurrent import ModuleThread
 from _core.executor.concurrent import ExecuteMessage
+from _core.executor.process_pool import DriverProcessPool
+from _core.executor.process_pool import ProcessDriversThread
 from _core.executor.source import TestSetSource
 from _core.executor.source import find_test_descriptors
 from _core.executor.source import find_testdict_descriptors
+from _core.testkit.lookahead import KitLookahead
+from _core.trace import Tracer
+from _core.trace import trace_span
+from _core.trace import traced
 from _core.logger import platform_logger
 from _core.utils import convert_serial
 from _core.report.reporter_helper import ExecInfo
@@ -85,6 +91,8 @@ class Scheduler(BaseScheduler):
     lock = threading.Lock()
     terminate_result = queue.Queue()
     used_devices = {}
+    kit_lookahead = KitLookahead()
+    driver_pool = None
 
     def _do_execute_(self, task):
         Scheduler.used_devices.clear()
@@ -97,6 +105,12 @@ class Scheduler(BaseScheduler):
 
     def __discover__(self, args):
         """Discover task to execute"""
+        if Variables.config.get_trace():
+            Tracer.start()
+        with trace_span("discover"):
+            return self._discover(args)
+
+    def _discover(self, args):
         from _core.executor.request import Task
         repeat = Variables.config.taskargs.get(ConfigConst.repeat)
         if not repeat:
@@ -118,11 +132,22 @@ class Scheduler(BaseScheduler):
         try:
             self.run_in_loop(task, run_func=self.run_dynamic_concurrent)
         finally:
+            Scheduler.kit_lookahead.join()
+            Scheduler.kit_lookahead.reset()
             Scheduler.__reset_environment__(self.used_devices)
 
     def _host_test_execute(self, task, ):
         """Execute host test"""
-        self.run_in_loop(task, run_func=self.run_host_test)
+        workers = Variables.config.get_driver_process_workers()
+        if workers and task.config.scheduler != SchedulerType.module:
+            Scheduler.driver_pool = DriverProcessPool(workers)
+            Scheduler.driver_pool.start()
+        try:
+            self.run_in_loop(task, run_func=self.run_host_test)
+        finally:
+            if Scheduler.driver_pool is not None:
+                Scheduler.driver_pool.shutdown()
+                Scheduler.driver_pool = None
 
     def run_host_test(self, task, test_drivers, current_driver_threads, message_queue):
         # get test driver and device
@@ -176,6 +201,8 @@ class Scheduler(BaseScheduler):
             task_info.user_id = user_id[0]
         return task_info
 
+    @traced("allocate environment", args_getter=lambda self, options,
+            test_driver: {"module": test_driver[1].source.module_name})
     def __allocate_environment__(self, options, test_driver):
         device_options = get_device_options(options, test_driver[1].source)
         environment = None
@@ -202,6 +229,19 @@ class Scheduler(BaseScheduler):
 
         return environment
 
+    def __allocate_idle_environment__(self, device_options):
+        """
+        Applies for the devices of the options which are idle now, without
+        waiting for busy ones. The devices are used devices of the task like
+        the ones of the modules, and are released with __free_environment__.
+        """
+        if not self.is_executing():
+            return None
+        environment = EnvironmentManager().apply_environment(
+            device_options, timeout=0)
+        self._append_used_devices(environment, self.used_devices)
+        return environment
+
     @classmethod
     def __free_environment__(cls, environment):
         env_manager = EnvironmentManager()
@@ -239,6 +279,7 @@ class Scheduler(BaseScheduler):
                 setattr(device, ConfigConst.task_state, False)
                 return
 
+    @traced("decc task setup")
     def _decc_task_setup(self, environment, task):
         config = Config()
         config.update(task.config.__dict__)
@@ -348,10 +389,23 @@ class Scheduler(BaseScheduler):
         # start driver thread
         self._start_driver_thread(current_driver_threads, (
             environment, message_queue, task, test_driver))
+        self._lookahead_next_module(task, test_drivers, environment)
 
         self._do_taskkit_teardown(self.used_devices, task_unused_env)
 
     @classmethod
+    def _lookahead_next_module(cls, task, test_drivers, environment):
+        if len(test_drivers) < 2 or not Variables.config.get_kit_lookahead():
+            return
+        cls.kit_lookahead.submit(
+            task.config, test_drivers[1],
+            device=KitLookahead.predict_device(environment),
+            running_driver=test_drivers[0],
+            bandwidth=Variables.config.get_kit_lookahead_bandwidth())
+
+    @classmethod
+    @traced("append history result", args_getter=lambda cls, task,
+            module_name: {"module": module_name})
     def _append_history_result(cls, task, module_name):
         history_report_path = getattr(
             task.config, ConfigConst.history_report_path, "")
@@ -417,6 +471,10 @@ class Scheduler(BaseScheduler):
         if task.config.scheduler == SchedulerType.module:
             driver_thread = ModuleThread(test_driver, task, environment,
                                          message_queue, self.lock)
+        elif self.driver_pool is not None and environment is None:
+            driver_thread = ProcessDriversThread(
+                test_driver, task, environment, message_queue,
+                self.driver_pool)
         else:
             driver_thread = DriversThread(test_driver, task, environment,
                                           message_queue)
@@ -424,8 +482,10 @@ class Scheduler(BaseScheduler):
         driver_thread.daemon = True
         driver_thread.name = thread_name
         driver_thread.set_listeners(self.__create_listeners__(task))
-        driver_thread.start()
+        # register before start, the queue monitor looks the thread up by
+        # name as soon as its message arrives
         current_driver_threads.setdefault(thread_name, driver_thread)
+        driver_thread.start()
         LOG.info(f"Driver executing in thread {driver_thread.ident}")
         LOG.info(f"Thread {thread_name} execute started")
         return driver_thread
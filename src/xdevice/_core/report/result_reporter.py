@@ -54,6 +54,7 @@ from _core.report.reporter_helper import ReportConstant
 from _core.report.repeater_helper import RepeatHelper
 from _core.context.center import Context
 from _core.context.upload import Uploader
+from _core.trace import trace_span
 
 LOG = platform_logger("ResultReporter")
 
@@ -130,22 +131,28 @@ class ResultReporter(IReporter):
         self._data_reports.clear()
         if self._check_params(report_path, **kwargs):
             # generate data report
-            self._generate_data_report()
+            with trace_span("generate data report", "report"):
+                self._generate_data_report()
 
             # generate vision reports
             if not self._check_mode(ModeType.decc):
-                self._generate_test_report()
+                with trace_span("generate test report", "report"):
+                    self._generate_test_report()
 
             # generate task info record
-            self._generate_task_record()
+            with trace_span("generate task record", "report"):
+                self._generate_task_record()
 
             # generate summary ini
-            self._generate_summary()
+            with trace_span("generate summary", "report"):
+                self._generate_summary()
 
             # copy reports to reports/latest folder
-            self._copy_report()
+            with trace_span("copy report", "report"):
+                self._copy_report()
 
-            self._transact_all()
+            with trace_span("transact all", "report"):
+                self._transact_all()
 
         LOG.info("")
         LOG.info("**************************************************")
@@ -701,6 +708,22 @@ class ResultReporter(IReporter):
         except OSError as _:
             return
 
+    @classmethod
+    def copy_to_latest(cls, src_file):
+        """
+        Copies a file of the report written after the report is copied,
+        such as the trace, to the reports/latest folder
+        """
+        if Uploader.is_enable() or cls._check_mode(ModeType.decc):
+            return
+        dst_path = os.path.join(Variables.temp_dir, "latest")
+        try:
+            os.makedirs(dst_path, exist_ok=True)
+            shutil.copyfile(src_file, os.path.join(
+                dst_path, os.path.basename(src_file)))
+        except OSError as _:
+            return
+
     @classmethod
     def _check_mode(cls, mode):
         return Context.session().mode == mode
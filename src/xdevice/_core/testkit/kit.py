@@ -32,6 +32,9 @@ from _core.constants import DeviceConnectorType
 from _core.constants import DeviceTestType
 from _core.constants import FilePermission
 from _core.context.center import Context
+from _core.environment.affinity import discard_setup
+from _core.environment.affinity import get_kit_setup_tags
+from _core.environment.affinity import record_setup
 from _core.error import ErrorMessage
 from _core.exception import ExecuteTerminate
 from _core.exception import ParamError
@@ -39,6 +42,7 @@ from _core.logger import platform_logger
 from _core.plugin import get_plugin
 from _core.plugin import Plugin
 from _core.testkit.json_parser import JsonParser
+from _core.trace import trace_span
 from _core.utils import get_file_absolute_path
 
 LOG = platform_logger("Kit")
@@ -403,6 +407,7 @@ def init_kit_instances(kits, resource_path="", testcases_path=""):
             test_kit_instance = plugin[0].__class__()
             test_kit_instance.__check_config__(kit)
             setattr(test_kit_instance, "device_name", device_name)
+            setattr(test_kit_instance, "setup_tags", get_kit_setup_tags(kit))
             kit_instances.append(test_kit_instance)
         else:
             raise ParamError(ErrorMessage.Common.Code_0101003.format(kit_type))
@@ -428,7 +433,9 @@ def kit_setup(request, kits, kit_type):
                 kit_copy = copy.deepcopy(kit)
                 module_kits = getattr(device, kit_type)
                 module_kits.append(kit_copy)
-                kit_copy.__setup__(device, request=request)
+                with trace_span(kit_name, "kit"):
+                    kit_copy.__setup__(device, request=request)
+                record_setup(device, getattr(kit, "setup_tags", []))
         if not run_flag:
             err_msg = ErrorMessage.Common.Code_0101004.format(kit_name)
             LOG.error(err_msg)
@@ -443,4 +450,7 @@ def kit_teardown(request, kit_type):
         for kit in getattr(device, kit_type, []):
             if check_device_name(device, kit, step="teardown"):
                 kit.__teardown__(device)
+                # only kits which leave their setup on the device keep tags
+                if not getattr(kit, "keeps_setup", False):
+                    discard_setup(device, getattr(kit, "setup_tags", []))
         setattr(device, kit_type, [])
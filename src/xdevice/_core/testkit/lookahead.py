@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import threading
+import time
+
+from _core.context.center import Context
+from _core.environment.manager_env import EnvironmentManager
+from _core.logger import platform_logger
+from _core.testkit.json_parser import JsonParser
+from _core.testkit.kit import get_kit_instances
+
+__all__ = ["KitLookahead"]
+
+LOG = platform_logger("Lookahead")
+# time (s) a module waits for the preparation of its kits before the setup
+PREPARE_WAIT_TIMEOUT = 10
+# time (s) to wait for a cancelled preparation, that is for the file it is
+# pushing, before the setup goes on
+PREPARE_CANCEL_TIMEOUT = 60
+
+
+class KitLookahead:
+    """
+    Prepares the kits of the next module in the background, while the
+    current module runs. A kit takes part by implementing
+    __prepare__(device=None, running_kits=None, bandwidth=0,
+    should_stop=None). It can do host side work there, such as resolving,
+    hashing and archiving the files to push. When device is not None the
+    next module will run on it, and the kit may also push files which do not
+    conflict with running_kits, the kits of the module running on it, at no
+    more than bandwidth bytes/s, checking should_stop between files.
+    A module calls settle before its setup, so that its kits never run
+    alongside their own preparation.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.preparations = {}
+
+    def submit(self, config, test_driver, device=None, running_driver=None,
+               bandwidth=0):
+        unique_id = test_driver[1].unique_id
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=self._prepare, name="Lookahead-{}".format(
+                test_driver[1].source.module_name),
+            args=(config, test_driver, device, running_driver, bandwidth,
+                  stop_event))
+        thread.daemon = True
+        with self.lock:
+            if unique_id in self.preparations:
+                return None
+            self.preparations[unique_id] = (thread, stop_event)
+        thread.start()
+        return thread
+
+    def settle(self, unique_id, timeout=PREPARE_WAIT_TIMEOUT):
+        """
+        Waits for the preparation of the module up to timeout, then cancels
+        it and waits for the file it is pushing. The setup of the module
+        does what is left.
+        """
+        with self.lock:
+            preparation = self.preparations.get(unique_id)
+        if preparation is None:
+            return
+        thread, stop_event = preparation
+        thread.join(timeout)
+        if not thread.is_alive():
+            return
+        LOG.debug("Cancel preparing {}, not done in {}s".format(
+            thread.name, timeout))
+        stop_event.set()
+        thread.join(PREPARE_CANCEL_TIMEOUT)
+        if thread.is_alive():
+            LOG.warning("{} is still running after it is cancelled".format(
+                thread.name))
+
+    def join(self, timeout=PREPARE_CANCEL_TIMEOUT):
+        """
+        Cancels the preparations and waits for them, when the task ends
+        """
+        with self.lock:
+            preparations = list(self.preparations.values())
+        for thread, stop_event in preparations:
+            stop_event.set()
+            thread.join(timeout)
+
+    def reset(self):
+        with self.lock:
+            self.preparations.clear()
+
+    @staticmethod
+    def predict_device(environment):
+        """
+        Returns the device the next module will run on, when it is the only
+        device there is and the current module runs on it, else None.
+        """
+        if environment is None:
+            return None
+        devices = []
+        for manager in EnvironmentManager().managers.values():
+            devices.extend(getattr(manager, "devices_list", []))
+        if len(devices) == 1 and devices[0] in environment.devices:
+            return devices[0]
+        return None
+
+    @staticmethod
+    def _get_kits(config, test_driver):
+        config_file = test_driver[1].source.config_file
+        if not config_file or not os.path.exists(config_file):
+            return []
+        try:
+            kits = get_kit_instances(
+                JsonParser(config_file),
+                getattr(config, "resource_path", ""),
+                getattr(config, "testcases_path", ""))
+        except Exception as error:
+            LOG.debug("Get kits of {} failed, {}".format(config_file, error))
+            return []
+        return [kit for kit in kits if hasattr(kit, "__prepare__")]
+
+    @classmethod
+    def _prepare(cls, config, test_driver, device, running_driver, bandwidth,
+                 stop_event):
+        def should_stop():
+            return stop_event.is_set() or not Context.is_executing()
+
+        start_time = time.time()
+        module_name = test_driver[1].source.module_name
+        kits = cls._get_kits(config, test_driver)
+        if not kits:
+            return
+        running_kits = cls._get_kits(config, running_driver) \
+            if running_driver else []
+        for kit in kits:
+            if should_stop():
+                return
+            try:
+                kit.__prepare__(
+                    device=device, running_kits=running_kits,
+                    bandwidth=bandwidth, should_stop=should_stop)
+            except Exception as error:
+                LOG.debug("Prepare {} of module {} failed, {}".format(
+                    kit.__class__.__name__, module_name, error))
+        LOG.debug("Prepare kits of module {} in {:.3f}s".format(
+            module_name, time.time() - start_time))
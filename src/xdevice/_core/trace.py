@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2020-2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import functools
+import json
+import os
+import threading
+import time
+
+from _core.constants import FilePermission
+from _core.logger import platform_logger
+
+__all__ = ["Tracer", "trace_span", "traced"]
+
+LOG = platform_logger("Tracer")
+
+
+class Tracer:
+    """
+    Collects the spans of a task, in any thread, and writes them as a trace
+    file in Chrome Trace Event format, which chrome://tracing and Perfetto
+    open. Spans of a thread nest by time, each thread is a row named after
+    the thread. When the tracer is not started, a span costs one attribute
+    check.
+    """
+    file_name = "trace.json"
+    enabled = False
+    lock = threading.Lock()
+    events = []
+    thread_names = {}
+    start_time = 0
+
+    @classmethod
+    def start(cls):
+        with cls.lock:
+            cls.events = []
+            cls.thread_names = {}
+            cls.start_time = time.perf_counter()
+            cls.enabled = True
+
+    @classmethod
+    def stop(cls, report_path):
+        """
+        Stops collecting and writes the trace file into the report path
+        Return the path of the trace file, "" when nothing is written
+        """
+        with cls.lock:
+            if not cls.enabled:
+                return ""
+            cls.enabled = False
+            events, thread_names = cls.events, cls.thread_names
+            cls.events, cls.thread_names = [], {}
+        if not report_path:
+            return ""
+        pid = os.getpid()
+        trace_events = [{"name": "thread_name", "ph": "M", "pid": pid,
+                         "tid": tid, "args": {"name": name}}
+                        for tid, name in thread_names.items()]
+        trace_events.extend(events)
+        trace_file = os.path.join(report_path, cls.file_name)
+        try:
+            os.makedirs(report_path, exist_ok=True)
+            file_fd = os.open(trace_file, os.O_CREAT | os.O_WRONLY |
+                              os.O_TRUNC, FilePermission.mode_644)
+            with os.fdopen(file_fd, mode="w", encoding="utf-8") as json_file:
+                json.dump({"traceEvents": trace_events,
+                           "displayTimeUnit": "ms"}, json_file)
+        except OSError as error:
+            LOG.warning("Write trace to {} failed, {}".format(
+                trace_file, error))
+            return ""
+        LOG.info("Write {} trace events to {}".format(
+            len(events), trace_file))
+        return trace_file
+
+    @classmethod
+    def add_span(cls, name, category, begin, end, args=None):
+        thread = threading.current_thread()
+        event = {"name": name, "cat": category, "ph": "X", "pid": os.getpid(),
+                 "tid": thread.ident,
+                 "ts": round((begin - cls.start_time) * 1000000, 3),
+                 "dur": round((end - begin) * 1000000, 3)}
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+        with cls.lock:
+            if not cls.enabled:
+                return
+            cls.thread_names.setdefault(thread.ident, thread.name)
+            cls.events.append(event)
+
+
+class _Span:
+    __slots__ = ("name", "category", "args", "begin")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.begin = 0
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.args = dict(self.args or {}, error=exc_type.__name__)
+        Tracer.add_span(self.name, self.category, self.begin,
+                        time.perf_counter(), self.args)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def trace_span(name, category="task", **args):
+    """
+    Returns a context manager which records a span named name, with the
+    args shown in the trace viewer
+    """
+    if not Tracer.enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def traced(name=None, category="task", args_getter=None):
+    """
+    Decorator which records a span for each call of the function. The
+    args_getter is called with the arguments of the function, only when the
+    tracer is started, and returns the args of the span.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not Tracer.enabled:
+                return func(*args, **kwargs)
+            span_args = args_getter(*args, **kwargs) if args_getter else None
+            with _Span(span_name, category, span_args):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator